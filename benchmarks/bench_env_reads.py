@@ -0,0 +1,77 @@
+"""
+Count .env file reads per Streamlit rerun.
+
+Run from the project root:
+    python -m benchmarks.bench_env_reads [--reruns 1000]
+
+Each simulated rerun makes the settings lookups the UI makes: one
+load_env_config() from initialize_session_state plus an API key lookup per
+registered model from render_sidebar. The old code parsed the .env file on
+every one of those calls; Settings only re-reads it after it changes.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from dotenv import dotenv_values
+
+from src.agents.registry import AVAILABLE_MODELS
+from src.utils.config import Settings
+
+def legacy_rerun(path: Path) -> int:
+    """Old behaviour: every lookup re-parses the file; returns reads made"""
+    reads = 0
+    dotenv_values(path)  # load_env_config()
+    reads += 1
+    for model in AVAILABLE_MODELS:
+        dotenv_values(path)  # get_api_key() -> load_env_config()
+        reads += 1
+        os.getenv(model.api_key_name)
+    return reads
+
+def cached_rerun(settings: Settings) -> None:
+    settings.refresh()
+    for model in AVAILABLE_MODELS:
+        settings.get(model.api_key_name)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--reruns", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / ".env"
+        path.write_text("".join(f"{model.api_key_name}=bench-key\n" for model in AVAILABLE_MODELS))
+
+        started = time.perf_counter()
+        legacy_reads = sum(legacy_rerun(path) for _ in range(args.reruns))
+        legacy_ms = (time.perf_counter() - started) * 1000
+
+        settings = Settings(path)
+        cached_rerun(settings)  # first rerun loads the file
+        warm_reads = settings.reads
+        started = time.perf_counter()
+        for _ in range(args.reruns):
+            cached_rerun(settings)
+        cached_ms = (time.perf_counter() - started) * 1000
+        steady_reads = settings.reads - warm_reads
+
+        # Key rotation: a changed file is picked up on the next check
+        path.write_text(path.read_text() + "EXTRA_SETTING=1\n")
+        time.sleep(settings.check_interval)
+        cached_rerun(settings)
+        rotation_reads = settings.reads - warm_reads - steady_reads
+
+    print(f"legacy  {legacy_reads / args.reruns:5.1f} reads/rerun  {legacy_ms / args.reruns * 1000:8.1f} us/rerun")
+    print(f"cached  {steady_reads / args.reruns:5.1f} reads/rerun  {cached_ms / args.reruns * 1000:8.1f} us/rerun")
+    print(f"after editing .env: {rotation_reads} read(s)")
+    if steady_reads or rotation_reads != 1:
+        print("FAIL: expected no steady-state reads and one read after the edit")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+Measure cold-start import time of the UI configuration with `-X importtime`.
+
+Run from the project root:
+    python -m benchmarks.bench_import_time [--runs 5]
+
+"eager" also imports every provider agent (and with it each SDK), which is
+what loading src.ui.config used to do. "lazy" imports src.ui.config only, as
+a Streamlit worker does now until an agent is first created.
+"""
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+
+SCENARIOS = {
+    "eager": (
+        "import src.ui.config, src.agents.openai, src.agents.anthropic, "
+        "src.agents.gemini, src.agents.together, src.agents.openrouter"
+    ),
+    "lazy": "import src.ui.config",
+}
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+def measure(code: str) -> Tuple[int, Dict[str, int]]:
+    """Total import time (us) and cumulative time per top-level module"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    total = 0
+    top_level: Dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, module = match.groups()
+        total += int(self_us)
+        if len(indent) == 1:
+            top_level[module] = int(cumulative_us)
+    return total, top_level
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8, help="slowest top-level imports to list")
+    args = parser.parse_args()
+
+    medians = {}
+    for name, code in SCENARIOS.items():
+        totals: List[int] = []
+        slowest: Dict[str, int] = {}
+        for _ in range(args.runs):
+            try:
+                total, top_level = measure(code)
+            except RuntimeError as e:
+                print(f"{name}: import failed ({e}); install the requirements first")
+                return 1
+            totals.append(total)
+            slowest = top_level
+        medians[name] = statistics.median(totals)
+        print(f"{name:<6} median {medians[name] / 1000:8.1f} ms over {args.runs} runs")
+        for module, cumulative in sorted(slowest.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"         {cumulative / 1000:8.1f} ms  {module}")
+
+    saved = medians["eager"] - medians["lazy"]
+    print(f"lazy registry saves {saved / 1000:.1f} ms ({saved / medians['eager']:.0%}) of cold start")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""
+Compare per-chunk cost of the cumulative-string protocol with delta events.
+
+Run from the project root:
+    python -m benchmarks.bench_stream_protocol [--tokens 50000]
+
+The old protocol re-yields the whole accumulated response on every chunk, so
+per-chunk cost grows with the answer length. With delta events the cost of
+the last chunks should match the first ones.
+"""
+import argparse
+import asyncio
+import sys
+import time
+from typing import AsyncIterator, Dict, List
+
+from src.agents.base import Done, StreamAccumulator, TextDelta
+
+TOKEN = "token "  # ~1 token per word
+
+
+async def cumulative_stream(tokens: int) -> AsyncIterator[Dict[str, str]]:
+    """Old protocol: yield the full response after every chunk"""
+    response = ""
+    for _ in range(tokens):
+        response += TOKEN
+        yield {"thinking": "", "response": response}
+
+
+async def delta_stream(tokens: int):
+    """New protocol: yield only the new piece"""
+    for _ in range(tokens):
+        yield TextDelta(TOKEN)
+    yield Done()
+
+
+async def time_cumulative(tokens: int) -> List[float]:
+    timings = []
+    response = ""
+    last = time.perf_counter()
+    async for chunk in cumulative_stream(tokens):
+        response = chunk["response"]
+        now = time.perf_counter()
+        timings.append(now - last)
+        last = now
+    assert len(response) == tokens * len(TOKEN)
+    return timings
+
+
+async def time_delta(tokens: int) -> List[float]:
+    timings = []
+    stream = StreamAccumulator()
+    last = time.perf_counter()
+    async for event in delta_stream(tokens):
+        stream.feed(event)
+        now = time.perf_counter()
+        timings.append(now - last)
+        last = now
+    assert len(stream.response) == tokens * len(TOKEN)
+    return timings
+
+
+def summarize(name: str, timings: List[float]) -> float:
+    """Print per-chunk cost for the first and last 10% of the stream"""
+    window = max(1, len(timings) // 10)
+    head = sum(timings[:window]) / window
+    tail = sum(timings[-window:]) / window
+    growth = tail / head if head else float("inf")
+    print(
+        f"{name:<12} total {sum(timings) * 1000:9.1f} ms | "
+        f"first 10% {head * 1e6:8.2f} us/chunk | "
+        f"last 10% {tail * 1e6:8.2f} us/chunk | growth x{growth:.2f}"
+    )
+    return growth
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tokens", type=int, default=50_000)
+    parser.add_argument("--max-growth", type=float, default=3.0,
+                        help="fail if delta per-chunk cost grows more than this")
+    args = parser.parse_args()
+
+    print(f"Synthetic stream of {args.tokens} tokens")
+    summarize("cumulative", asyncio.run(time_cumulative(args.tokens)))
+    growth = summarize("delta", asyncio.run(time_delta(args.tokens)))
+
+    if growth > args.max_growth:
+        print(f"FAIL: delta per-chunk cost grew x{growth:.2f} (limit x{args.max_growth})")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""
+Time a Streamlit rerun with a long chat history.
+
+Run from the project root:
+    python -m benchmarks.bench_transcript [--messages 2000]
+
+Uses Streamlit's AppTest to run the transcript against a synthetic history,
+once the way it used to be rendered (every message on every rerun) and once
+through render_transcript, which only emits the most recent page.
+"""
+import argparse
+import statistics
+import sys
+import time
+from dataclasses import dataclass
+
+from streamlit.testing.v1 import AppTest
+
+from src.ui.config import TRANSCRIPT_PAGE_SIZE
+
+@dataclass
+class _Model:
+    supports_thinking: bool = True
+
+def full_transcript():
+    import streamlit as st
+    for msg in st.session_state.chat_history:
+        with st.chat_message(msg["role"]):
+            if msg.get("thinking") and st.session_state.selected_model.supports_thinking:
+                with st.expander("Thinking Process"):
+                    st.write(msg["thinking"])
+            st.write(msg["content"])
+
+def paged_transcript():
+    from src.ui.components import render_transcript
+    render_transcript()
+
+def synthetic_history(messages: int):
+    history = []
+    for i in range(messages):
+        if i % 2 == 0:
+            history.append({"role": "user", "content": f"Question {i}: " + "lorem ipsum " * 20})
+        else:
+            history.append({
+                "role": "assistant",
+                "content": f"Answer {i}:\n\n" + "- a point worth making\n" * 15,
+                "thinking": "considering the question " * 40,
+            })
+    return history
+
+def time_rerun(script, history, runs: int):
+    timings = []
+    elements = 0
+    for _ in range(runs):
+        app = AppTest.from_function(script, default_timeout=120)
+        app.session_state.chat_history = history
+        app.session_state.selected_model = _Model()
+        app.session_state.transcript_limit = TRANSCRIPT_PAGE_SIZE
+        app.session_state.history_total = len(history)
+        app.session_state.conversation_id = None
+        started = time.perf_counter()
+        app.run()
+        timings.append(time.perf_counter() - started)
+        elements = len(app.chat_message)
+    return statistics.median(timings), elements
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    history = synthetic_history(args.messages)
+    print(f"Rerun with {args.messages} messages in history (median of {args.runs})")
+    full_time, full_messages = time_rerun(full_transcript, history, args.runs)
+    paged_time, paged_messages = time_rerun(paged_transcript, history, args.runs)
+    print(f"full   {full_time * 1000:9.1f} ms  {full_messages:5d} chat messages rendered")
+    print(f"paged  {paged_time * 1000:9.1f} ms  {paged_messages:5d} chat messages rendered")
+    print(f"speedup x{full_time / paged_time:.1f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,244 @@
+"""
+Load-test concurrent chat sessions through the agent stack and the UI streaming path.
+
+Run from the project root:
+    python -m benchmarks.load_test [--target mock] [--sessions 50] [--turns 3]
+                                   [--baseline benchmarks/baseline.json] [--update-baseline]
+
+Every simulated session runs on its own thread with its own event loop, as
+Streamlit script runs do, and streams each turn through ``build_agent``'s
+wrappers, ``iterate_on_io_loop`` and ``StreamRenderer``. ``--target mock``
+uses the in-process MockAgent; the other targets run the real agent class
+against an in-process mock server (needs aiohttp) via its base URL setting.
+
+Reports p50/p95/p99 time to first token and total time, CPU time per stream
+and memory growth over the run. With ``--baseline`` the run fails when any
+figure is worse than the stored one by more than ``--tolerance``. The
+committed baseline.json was recorded on one development machine; record
+your own with ``--update-baseline`` before comparing against it.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import aclosing
+from typing import Dict, List, Optional
+
+from src.agents.base import Done
+from src.agents.registry import BUILTIN_MODELS, ModelConfig
+from src.ui.rendering import StreamRenderer
+from src.utils.aio import get_io_loop, iterate_on_io_loop
+from src.utils.factory import build_agent, get_client_pool
+
+# target -> (model name, environment prefix, base URL path on the mock server)
+TARGETS = {
+    "mock": ("Mock", "MOCK", None),
+    "openai": ("GPT-4 Turbo", "OPENAI", "/v1"),
+    "anthropic": ("Claude 3 Opus", "ANTHROPIC", ""),
+    "together": ("Mixtral-8x7B", "TOGETHER", "/v1"),
+    "openrouter": ("OpenRouter Hub", "OPENROUTER", "/v1"),
+    "gemini": ("Gemini Pro", "GOOGLE", ""),
+}
+
+# Absolute slack added to the relative tolerance, so near-zero figures do not flap
+SLACK = {"latency": 0.05, "cpu_ms_per_stream": 0.5, "memory_growth_mb": 8.0}
+
+PROMPT = "Summarize the trade-offs of streaming responses in a chat UI."
+
+class NullPlaceholder:
+    """Stands in for ``st.empty()``: accepts writes and keeps nothing"""
+
+    def write(self, *args, **kwargs) -> None:
+        pass
+
+    caption = write
+    markdown = write
+
+    def empty(self) -> None:
+        pass
+
+def rss_mb() -> float:
+    """Resident set size of this process"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        # Peak rather than current RSS, which is still fine for spotting growth
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+class LoadTest:
+    """Run ``sessions`` concurrent sessions of ``turns`` streamed answers each"""
+
+    def __init__(self, model: ModelConfig, sessions: int, turns: int):
+        self.model = model
+        self.sessions = sessions
+        self.turns = turns
+        self.ttft: List[float] = []
+        self.durations: List[float] = []
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    async def _session(self, index: int) -> None:
+        agent = build_agent(self.model, failover=False, session=f"load-{index}")
+        history: List[Dict[str, str]] = []
+        for turn in range(self.turns):
+            renderer = StreamRenderer(NullPlaceholder())
+            error = None
+            stream = agent.stream_chat(PROMPT, history=history, bypass_cache=True)
+            async with aclosing(iterate_on_io_loop(stream)) as events:
+                async for event in events:
+                    renderer.feed(event)
+                    if event.__class__ is Done:
+                        error = event.error
+            renderer.close()
+            metrics = renderer.metrics()
+            with self._lock:
+                if error is not None or "time_to_first_token" not in metrics:
+                    self.errors += 1
+                    continue
+                self.ttft.append(metrics["time_to_first_token"])
+                self.durations.append(metrics["duration"])
+            history += [
+                {"role": "user", "content": PROMPT},
+                {"role": "assistant", "content": renderer.stream.response},
+            ]
+
+    def _run_session(self, index: int) -> None:
+        asyncio.run(self._session(index))
+
+    def run(self) -> float:
+        threads = [
+            threading.Thread(target=self._run_session, args=(index,), name=f"session-{index}")
+            for index in range(self.sessions)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started
+
+def measure(model: ModelConfig, sessions: int, turns: int) -> Dict[str, float]:
+    # Warm-up: imports, pooled clients and the I/O loop are one-off costs
+    LoadTest(model, min(sessions, 4), 1).run()
+    gc.collect()
+    memory_before = rss_mb()
+    cpu_before = time.process_time()
+    test = LoadTest(model, sessions, turns)
+    elapsed = test.run()
+    cpu = time.process_time() - cpu_before
+    gc.collect()
+    streams = len(test.durations) + test.errors
+    return {
+        "streams": streams,
+        "errors": test.errors,
+        "elapsed": round(elapsed, 3),
+        "ttft_p50": round(percentile(test.ttft, 0.50), 4),
+        "ttft_p95": round(percentile(test.ttft, 0.95), 4),
+        "ttft_p99": round(percentile(test.ttft, 0.99), 4),
+        "duration_p50": round(percentile(test.durations, 0.50), 4),
+        "duration_p95": round(percentile(test.durations, 0.95), 4),
+        "duration_p99": round(percentile(test.durations, 0.99), 4),
+        "cpu_ms_per_stream": round(cpu * 1000 / streams, 3) if streams else 0.0,
+        "memory_growth_mb": round(rss_mb() - memory_before, 2),
+    }
+
+def regressions(result: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> List[str]:
+    """Figures worse than the baseline by more than the tolerance (plus slack)"""
+    failures = []
+    for name, expected in baseline.items():
+        if name in ("streams", "elapsed", "sessions", "turns") or name not in result:
+            continue
+        if name == "errors":
+            limit = expected
+        else:
+            slack = SLACK.get(name, SLACK["latency"])
+            limit = expected * (1 + tolerance) + slack
+        if result[name] > limit:
+            failures.append(f"{name} {result[name]} > {limit:.4g} (baseline {expected})")
+    return failures
+
+async def _start_mock_server() -> str:
+    from benchmarks.mock_server import server_url, start_server
+    from src.agents.mock import MockProfile
+
+    return server_url(await start_server(MockProfile.from_environ()))
+
+def configure_target(target: str) -> ModelConfig:
+    """Point the target's settings at the mock provider and return its model"""
+    name, prefix, path = TARGETS[target]
+    os.environ.setdefault(f"{prefix}_API_KEY", "load-test")
+    if target != "mock":
+        # The server shares the agents' I/O loop, like a local provider would
+        url = asyncio.run_coroutine_threadsafe(_start_mock_server(), get_io_loop()).result()
+        os.environ[f"{prefix}_BASE_URL"] = url + path
+    # Load tests measure the stack, not the response cache
+    os.environ["RESPONSE_CACHE"] = "0"
+    return next(model for model in BUILTIN_MODELS if model.name == name)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--target", choices=sorted(TARGETS), default="mock")
+    parser.add_argument("--sessions", type=int, default=50, help="concurrent simulated sessions")
+    parser.add_argument("--turns", type=int, default=3, help="answers streamed per session")
+    parser.add_argument("--baseline", help="JSON file of stored results per target")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression")
+    parser.add_argument("--update-baseline", action="store_true", help="store this run as the baseline")
+    args = parser.parse_args()
+
+    # Defaults for a quick run; MOCK_* settings from the environment still apply
+    os.environ.setdefault("MOCK_TIME_TO_FIRST_TOKEN", "0.2")
+    os.environ.setdefault("MOCK_TOKENS_PER_SECOND", "200")
+    os.environ.setdefault("MOCK_ANSWER_TOKENS", "100")
+    model = configure_target(args.target)
+    try:
+        result = measure(model, args.sessions, args.turns)
+    finally:
+        # Pooled sessions live on the I/O loop and are closed there
+        asyncio.run_coroutine_threadsafe(get_client_pool().aclose(), get_io_loop()).result()
+    result["sessions"] = args.sessions
+    result["turns"] = args.turns
+    print(
+        f"{args.target}: {result['streams']} streams ({result['errors']} failed) in {result['elapsed']:.1f}s | "
+        f"first token p50 {result['ttft_p50']:.3f}s p95 {result['ttft_p95']:.3f}s p99 {result['ttft_p99']:.3f}s | "
+        f"total p50 {result['duration_p50']:.3f}s p95 {result['duration_p95']:.3f}s p99 {result['duration_p99']:.3f}s | "
+        f"CPU {result['cpu_ms_per_stream']:.2f} ms/stream | memory +{result['memory_growth_mb']:.1f} MB"
+    )
+    if not args.baseline:
+        return 0
+
+    try:
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+    except FileNotFoundError:
+        baselines = {}
+    if args.update_baseline:
+        baselines[args.target] = result
+        with open(args.baseline, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline for {args.target} written to {args.baseline}")
+        return 0
+    baseline: Optional[Dict[str, float]] = baselines.get(args.target)
+    if baseline is None:
+        print(f"No baseline for {args.target} in {args.baseline}; run with --update-baseline", file=sys.stderr)
+        return 1
+    if (baseline.get("sessions"), baseline.get("turns")) != (args.sessions, args.turns):
+        print("Warning: baseline was recorded with a different --sessions/--turns", file=sys.stderr)
+    failures = regressions(result, baseline, args.tolerance)
+    for failure in failures:
+        print(f"REGRESSION {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,257 @@
+"""
+Mock LLM provider speaking the OpenAI, Anthropic and Gemini streaming wire formats.
+
+Run from the project root:
+    python -m benchmarks.mock_server [--port 8089] [--ttft 0.3] [--rate 50] [--jitter 0.2]
+                                     [--error-rate 0.0] [--rate-limit-rate 0.0]
+
+Point the real agents at it with their base URL settings, e.g.:
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1        (also TOGETHER_ and OPENROUTER_)
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8089
+    GOOGLE_BASE_URL=http://127.0.0.1:8089
+
+Endpoints: ``POST /v1/chat/completions`` (OpenAI, Together, OpenRouter),
+``POST /v1/messages`` (Anthropic) and
+``POST /v1beta/models/{model}:streamGenerateContent`` (Gemini). Responses are
+paced by a MockProfile, so the agents' parsing, pooling, retries and rate
+limiting run exactly as against a provider. Simulated 429s carry Retry-After.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from aiohttp import web
+
+from src.agents.mock import MockProfile, MockStream
+
+def _prompt_tokens(messages: Any) -> int:
+    # Same rough 4-characters-per-token estimate the context builder uses
+    return max(1, len(json.dumps(messages)) // 4)
+
+def _error(status: int, message: str, profile: MockProfile) -> web.Response:
+    headers = {"Retry-After": str(profile.retry_after)} if status == 429 else None
+    body = {"error": {"message": message, "type": "rate_limit_error" if status == 429 else "api_error"}}
+    return web.json_response(body, status=status, headers=headers)
+
+class MockProvider:
+    """aiohttp handlers sharing one profile and random stream"""
+
+    def __init__(self, profile: MockProfile):
+        self.profile = profile
+        self._rng = random.Random(profile.seed)
+        self.requests = 0
+
+    async def _open(self, request: web.Request, content_type: str = "text/event-stream") -> web.StreamResponse:
+        response = web.StreamResponse(headers={"Content-Type": content_type, "Cache-Control": "no-cache"})
+        await response.prepare(request)
+        return response
+
+    async def _fail(self, stream: MockStream) -> Optional[web.Response]:
+        failure = stream.failure()
+        if failure is None:
+            return None
+        await asyncio.sleep(stream.jittered(self.profile.time_to_first_token))
+        return _error(*failure, self.profile)
+
+    async def openai_chat(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        body = await request.json()
+        stream = MockStream(self.profile, self._rng)
+        failed = await self._fail(stream)
+        if failed is not None:
+            return failed
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        model = body.get("model", "mock-model")
+
+        def chunk(delta: Dict[str, Any], finish_reason=None) -> bytes:
+            payload = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            return b"data: " + json.dumps(payload).encode() + b"\n\n"
+
+        response = await self._open(request)
+        await response.write(chunk({"role": "assistant", "content": ""}))
+        output_tokens = 0
+        for delay, thinking, text in stream.tokens():
+            await asyncio.sleep(delay)
+            output_tokens += 1
+            await response.write(chunk({"reasoning_content": text} if thinking else {"content": text}))
+        await response.write(chunk({}, "stop"))
+        if (body.get("stream_options") or {}).get("include_usage"):
+            prompt_tokens = _prompt_tokens(body.get("messages"))
+            usage = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": output_tokens,
+                    "total_tokens": prompt_tokens + output_tokens,
+                    "completion_tokens_details": {"reasoning_tokens": min(output_tokens, self.profile.thinking_tokens)},
+                },
+            }
+            await response.write(b"data: " + json.dumps(usage).encode() + b"\n\n")
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def anthropic_messages(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        body = await request.json()
+        stream = MockStream(self.profile, self._rng)
+        failed = await self._fail(stream)
+        if failed is not None:
+            return failed
+
+        def event(name: str, payload: Dict[str, Any]) -> bytes:
+            payload["type"] = name
+            return f"event: {name}\ndata: {json.dumps(payload)}\n\n".encode()
+
+        response = await self._open(request)
+        await response.write(event("message_start", {"message": {
+            "id": f"msg_{uuid.uuid4().hex}", "type": "message", "role": "assistant", "content": [],
+            "model": body.get("model", "mock-model"), "stop_reason": None, "stop_sequence": None,
+            "usage": {"input_tokens": _prompt_tokens(body.get("messages")), "output_tokens": 1},
+        }}))
+        block = -1
+        block_type = None
+        output_tokens = 0
+        for delay, thinking, text in stream.tokens():
+            kind = "thinking" if thinking else "text"
+            if kind != block_type:
+                if block_type is not None:
+                    await response.write(event("content_block_stop", {"index": block}))
+                block += 1
+                block_type = kind
+                await response.write(event("content_block_start", {"index": block, "content_block": {"type": kind, kind: ""}}))
+            await asyncio.sleep(delay)
+            output_tokens += 1
+            delta = {"type": "thinking_delta", "thinking": text} if thinking else {"type": "text_delta", "text": text}
+            await response.write(event("content_block_delta", {"index": block, "delta": delta}))
+        if block_type is not None:
+            await response.write(event("content_block_stop", {"index": block}))
+        await response.write(event("message_delta", {
+            "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+            "usage": {"output_tokens": output_tokens},
+        }))
+        await response.write(event("message_stop", {}))
+        await response.write_eof()
+        return response
+
+    async def gemini_stream(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        body = await request.json()
+        stream = MockStream(self.profile, self._rng)
+        failed = await self._fail(stream)
+        if failed is not None:
+            return failed
+        prompt_tokens = _prompt_tokens(body.get("contents"))
+        output_tokens = 0
+        thought_tokens = 0
+
+        # With ?alt=sse chunks are SSE events; otherwise (the SDK's REST transport)
+        # the body is one JSON array, streamed element by element
+        sse = request.query.get("alt") == "sse"
+        separator = b"["
+
+        def chunk(text: str, finish_reason: Optional[str] = None, thought: bool = False) -> bytes:
+            nonlocal separator
+            part: Dict[str, Any] = {"text": text, "thought": True} if thought else {"text": text}
+            candidate: Dict[str, Any] = {"content": {"parts": [part], "role": "model"}, "index": 0}
+            if finish_reason:
+                candidate["finishReason"] = finish_reason
+            payload = {
+                "candidates": [candidate],
+                "usageMetadata": {
+                    "promptTokenCount": prompt_tokens,
+                    "candidatesTokenCount": output_tokens,
+                    "thoughtsTokenCount": thought_tokens,
+                    "totalTokenCount": prompt_tokens + output_tokens + thought_tokens,
+                },
+            }
+            if sse:
+                return b"data: " + json.dumps(payload).encode() + b"\r\n\r\n"
+            framed, separator = separator + json.dumps(payload).encode(), b",\r\n"
+            return framed
+
+        response = await self._open(request, "text/event-stream" if sse else "application/json")
+        for delay, thinking, text in stream.tokens():
+            await asyncio.sleep(delay)
+            if thinking:
+                thought_tokens += 1
+            else:
+                output_tokens += 1
+            await response.write(chunk(text, thought=thinking))
+        await response.write(chunk("", "STOP"))
+        if not sse:
+            await response.write(b"]")
+        await response.write_eof()
+        return response
+
+# The app's MockProvider, for callers holding the app or its runner
+PROVIDER_KEY = web.AppKey("provider", MockProvider)
+
+def create_app(profile: MockProfile) -> web.Application:
+    provider = MockProvider(profile)
+    app = web.Application()
+    app[PROVIDER_KEY] = provider
+    app.router.add_post("/v1/chat/completions", provider.openai_chat)
+    app.router.add_post("/chat/completions", provider.openai_chat)
+    app.router.add_post("/v1/messages", provider.anthropic_messages)
+    app.router.add_post("/v1beta/models/{model}:streamGenerateContent", provider.gemini_stream)
+    return app
+
+async def start_server(profile: MockProfile, host: str = "127.0.0.1", port: int = 0) -> web.AppRunner:
+    """Run the mock provider on this loop; ``port=0`` picks a free port"""
+    runner = web.AppRunner(create_app(profile), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+def server_url(runner: web.AppRunner) -> str:
+    host, port = runner.addresses[0][:2]
+    return f"http://{host}:{port}"
+
+def add_profile_arguments(parser: argparse.ArgumentParser) -> None:
+    defaults = MockProfile()
+    parser.add_argument("--ttft", type=float, default=defaults.time_to_first_token, help="seconds to first token")
+    parser.add_argument("--rate", type=float, default=defaults.tokens_per_second, help="tokens per second")
+    parser.add_argument("--jitter", type=float, default=defaults.jitter, help="relative delay jitter, 0-1")
+    parser.add_argument("--tokens", type=int, default=defaults.answer_tokens, help="answer tokens per response")
+    parser.add_argument("--thinking-tokens", type=int, default=defaults.thinking_tokens)
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate, help="share of requests failing with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=defaults.rate_limit_rate, help="share of requests failing with 429")
+    parser.add_argument("--retry-after", type=float, default=defaults.retry_after)
+    parser.add_argument("--seed", type=int)
+
+def profile_from_args(args: argparse.Namespace) -> MockProfile:
+    return MockProfile(
+        time_to_first_token=args.ttft,
+        tokens_per_second=args.rate,
+        jitter=args.jitter,
+        answer_tokens=args.tokens,
+        thinking_tokens=args.thinking_tokens,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    print(f"Mock provider on http://{args.host}:{args.port}", file=sys.stderr)
+    web.run_app(create_app(profile_from_args(args)), host=args.host, port=args.port, access_log=None)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,4 +4,10 @@ setup(
     name="llm-streamlit-modular",
     version="0.1",
     packages=find_packages(),
-)
\ No newline at end of file
+    # Add-on packages register extra agents under this group, e.g.
+    #   entry_points={"llm_streamlit_modular.models": ["mistral = my_addon.models:MODEL"]}
+    # where MODEL is a src.agents.registry.ModelConfig.
+    entry_points={
+        "llm_streamlit_modular.models": [],
+    },
+)
@@ -1,4 +1,40 @@
-from .base import BaseAgent
-from .gemini import GeminiAgent
+import importlib
+from .base import (
+    BaseAgent, Done, ProviderError, Queued, StreamAccumulator, StreamBuffer, StreamEvent, TextDelta,
+    ThinkingDelta, Usage
+)
+from .catalog import ModelCatalog, ModelSpec
 
-__all__ = ['BaseAgent', 'GeminiAgent']
\ No newline at end of file
+# Provider agents import their SDKs, so they are only loaded on first access
+_LAZY_AGENTS = {
+    'OpenAIAgent': '.openai',
+    'AnthropicAgent': '.anthropic',
+    'GeminiAgent': '.gemini',
+    'TogetherAgent': '.together',
+    'OpenRouterAgent': '.openrouter',
+}
+
+def __getattr__(name):
+    if name in _LAZY_AGENTS:
+        return getattr(importlib.import_module(_LAZY_AGENTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+__all__ = [
+    'BaseAgent',
+    'OpenAIAgent',
+    'AnthropicAgent',
+    'GeminiAgent',
+    'TogetherAgent',
+    'OpenRouterAgent',
+    'StreamEvent',
+    'ThinkingDelta',
+    'TextDelta',
+    'Usage',
+    'Done',
+    'Queued',
+    'ProviderError',
+    'StreamBuffer',
+    'StreamAccumulator',
+    'ModelSpec',
+    'ModelCatalog',
+]
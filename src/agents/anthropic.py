@@ -1,56 +1,137 @@
-from typing import AsyncIterator, Dict
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 import anthropic
-from .base import BaseAgent
+from .base import BaseAgent, Done, StreamEvent, TextDelta, ThinkingDelta, Usage
+from .catalog import ModelSpec
+from .context import TruncatePolicy, estimate_tokens, to_anthropic
+
+logger = logging.getLogger(__name__)
+
+ANTHROPIC_BASE_URL = "https://api.anthropic.com"
+# Prefixes shorter than this are not cached by the API, so no breakpoint is spent on them
+MIN_CACHE_TOKENS = 1024
+# Smallest extended-thinking budget the API accepts
+MIN_THINKING_BUDGET = 1024
+_CACHE_CONTROL = {"type": "ephemeral"}
+
+def with_cache_breakpoints(
+    messages: List[Dict[str, Any]],
+    system_prompt: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[List[Dict[str, Any]]]]:
+    """Mark the stable prefix (system prompt, earlier turns) as cacheable.
+
+    Returns the messages and the system blocks with ``cache_control`` set on
+    the system prompt and on the last turn before the new prompt.
+    """
+    system = None
+    prefix_tokens = 0
+    if system_prompt:
+        prefix_tokens = estimate_tokens(system_prompt)
+        system = [{"type": "text", "text": system_prompt}]
+        if prefix_tokens >= MIN_CACHE_TOKENS:
+            system[0]["cache_control"] = _CACHE_CONTROL
+    if len(messages) > 1:
+        prefix_tokens += sum(estimate_tokens(message["content"]) for message in messages[:-1])
+        if prefix_tokens >= MIN_CACHE_TOKENS:
+            messages = list(messages)
+            last = messages[-2]
+            messages[-2] = {
+                "role": last["role"],
+                "content": [{"type": "text", "text": last["content"], "cache_control": _CACHE_CONTROL}]
+            }
+    return messages, system
 
 class AnthropicAgent(BaseAgent):
+    system_prompt = None
+    default_model = "claude-3-opus-20240229"
+    context_window = 200000
+    base_url = ANTHROPIC_BASE_URL
+    
     def _initialize(self) -> None:
-        self.client = anthropic.AsyncAnthropic(api_key=self.api_key)
-        self._model = "claude-3-opus-20240229"  # Default to latest model
+        self.client = self.pool.get(
+            "anthropic", self.api_key, self.base_url,
+            lambda: anthropic.AsyncAnthropic(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                http_client=self.pool.httpx_client(self.base_url, anthropic.DefaultAsyncHttpxClient),
+                # Retries and backoff are handled by ResilientAgent
+                max_retries=0
+            )
+        )
         
-    async def stream_chat(self, prompt: str, **kwargs) -> AsyncIterator[Dict[str, str]]:
-        thinking = ""
-        response = ""
-        processing_thinking = True
+    def _configure_context(self) -> None:
+        # Start the history window on 8-turn steps where the budget allows, for the cached prefix
+        self.context.policy = TruncatePolicy(align=8)
         
+    async def stream_chat(
+        self,
+        prompt: str,
+        history: Optional[List[Dict[str, Any]]] = None,
+        **kwargs
+    ) -> AsyncIterator[StreamEvent]:
+        usage = Usage()
+        debug = logger.isEnabledFor(logging.DEBUG)
+        message = None
         try:
+            request = dict(self.params)
+            # Required by the API
+            request.setdefault("max_tokens", self.max_output)
+            if "stop" in request:
+                stop = request.pop("stop")
+                request["stop_sequences"] = [stop] if isinstance(stop, str) else stop
+            budget = min(self.reasoning_budget, request["max_tokens"] - 1)
+            if self.reasoning and budget >= MIN_THINKING_BUDGET:
+                # Extended thinking; its budget counts towards max_tokens, and it rules out temperature
+                request["thinking"] = {"type": "enabled", "budget_tokens": budget}
+                request.pop("temperature", None)
+            messages, system = with_cache_breakpoints(
+                to_anthropic(self.context.build(history or [], prompt, self.system_prompt)),
+                self.system_prompt
+            )
+            if system:
+                request["system"] = system
             message = await self.client.messages.create(
                 model=self._model,
-                max_tokens=4096,
-                messages=[{"role": "user", "content": prompt}],
-                stream=True
+                messages=messages,
+                stream=True,
+                **request
             )
             
             async for chunk in message:
-                print(f"Received chunk: {chunk}")  # Debug log
+                if debug:
+                    logger.debug("Received chunk: %s", chunk)
                 # Handle message content based on event type
                 if chunk.type == "message_start":
-                    print("Message started")
-                elif chunk.type == "content_block_start":
-                    print("Content block started")
+                    start_usage = chunk.message.usage
+                    usage.cache_read_tokens = getattr(start_usage, "cache_read_input_tokens", None) or 0
+                    usage.cache_write_tokens = getattr(start_usage, "cache_creation_input_tokens", None) or 0
+                    # input_tokens excludes the cached part; report the whole prompt
+                    usage.input_tokens = (
+                        start_usage.input_tokens + usage.cache_read_tokens + usage.cache_write_tokens
+                    )
                 elif chunk.type == "content_block_delta":
-                    if hasattr(chunk.delta, 'text'):
-                        text = chunk.delta.text
-                        print(f"Extracted content: {text}")  # Debug log
-                        response += text
-                        yield {
-                            "thinking": "",
-                            "response": response
-                        }
+                    # Signature deltas, which only verify the thinking, are skipped
+                    if chunk.delta.type == "text_delta":
+                        yield TextDelta(chunk.delta.text)
+                    elif chunk.delta.type == "thinking_delta":
+                        yield ThinkingDelta(chunk.delta.thinking)
                 elif chunk.type == "message_delta":
-                    if hasattr(chunk.delta, 'text'):
-                        text = chunk.delta.text
-                        print(f"Extracted content from delta: {text}")  # Debug log
-                        response += text
-                        yield {
-                            "thinking": "",
-                            "response": response
-                        }
+                    # Final usage arrives with the closing message delta
+                    usage.output_tokens = chunk.usage.output_tokens
+                    yield usage
+            yield Done()
                     
         except Exception as e:
-            yield {
-                "thinking": f"Error in thinking process: {str(e)}",
-                "response": f"Error generating response: {str(e)}"
-            }
+            for event in self._error_events(e):
+                yield event
+        finally:
+            # Release the HTTP response now on cancellation or aclose(), not at garbage collection
+            if message is not None:
+                await message.close()
+    
+    async def list_models(self) -> List[ModelSpec]:
+        # The listing has ids only; limits and prices come from the built-in catalog
+        return [ModelSpec(model.id) async for model in self.client.models.list()]
     
     @property
     def model_name(self) -> str:
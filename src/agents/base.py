@@ -1,29 +1,451 @@
+import asyncio
+import copy
+import threading
 from abc import ABC, abstractmethod
-from typing import AsyncIterator, Dict, Optional
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple, Union
+from .catalog import ModelSpec
+from .context import ContextBuilder
+from .pool import ClientPool, get_default_pool
+
+
+class ThinkingDelta:
+    """New piece of the model's thinking process (reasoning), from any provider that streams it"""
+    __slots__ = ("text",)
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def __repr__(self) -> str:
+        return f"ThinkingDelta({self.text!r})"
+
+
+class TextDelta:
+    """New piece of the final response"""
+    __slots__ = ("text",)
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def __repr__(self) -> str:
+        return f"TextDelta({self.text!r})"
+
+
+class Usage:
+    """Token usage reported by the provider.
+
+    ``input_tokens`` counts the whole prompt; ``cache_read_tokens`` and
+    ``cache_write_tokens`` are the parts of it served from / written to the
+    provider's prompt cache. ``output_tokens`` includes the
+    ``reasoning_tokens`` spent thinking, whether or not the text was streamed.
+    """
+    __slots__ = ("input_tokens", "output_tokens", "cache_read_tokens", "cache_write_tokens", "reasoning_tokens")
+
+    def __init__(
+        self,
+        input_tokens: int = 0,
+        output_tokens: int = 0,
+        cache_read_tokens: int = 0,
+        cache_write_tokens: int = 0,
+        reasoning_tokens: int = 0
+    ):
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+        self.cache_read_tokens = cache_read_tokens
+        self.cache_write_tokens = cache_write_tokens
+        self.reasoning_tokens = reasoning_tokens
+
+    def as_dict(self) -> Dict[str, int]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)}" for name in self.__slots__)
+        return f"Usage({fields})"
+
+
+class Done:
+    """End of the stream; ``error`` is set when generation failed, ``cancelled`` when it was stopped"""
+    __slots__ = ("error", "cancelled")
+
+    def __init__(self, error: Optional[Exception] = None, cancelled: bool = False):
+        self.error = error
+        self.cancelled = cancelled
+
+    def __repr__(self) -> str:
+        if self.error:
+            return f"Done(error={self.error!r})"
+        return "Done(cancelled=True)" if self.cancelled else "Done()"
+
+
+class Queued:
+    """Waiting for a rate-limit slot; ``position`` 0 means the request was let through"""
+    __slots__ = ("position",)
+
+    def __init__(self, position: int):
+        self.position = position
+
+    def __repr__(self) -> str:
+        return f"Queued({self.position})"
+
+
+StreamEvent = Union[ThinkingDelta, TextDelta, Usage, Done, Queued]
+
+
+class ProviderError(Exception):
+    """HTTP error returned by a provider endpoint"""
+
+    def __init__(self, status: int, message: str, retry_after: Optional[str] = None):
+        super().__init__(f"API Error {status}: {message}")
+        self.status = status
+        # Raw Retry-After header value, if the provider sent one
+        self.retry_after = retry_after
+
+
+# Why a stream was cancelled: a user's stop, or a wrapper giving up on it
+CANCEL_STOPPED = "stopped"
+CANCEL_TIMEOUT = "timeout"
+CANCEL_HEDGE_LOST = "hedge_lost"
+
+
+class CancellationToken:
+    """Stop signal for a stream, safe to set from any thread (e.g. a Stop button).
+
+    Passed as ``stream_chat(..., cancel=token)``; see ``cancellable``.
+    ``reason`` is one of the CANCEL_* values once cancelled.
+    """
+
+    def __init__(self):
+        self._cancelled = False
+        self.reason: Optional[str] = None
+        self._callbacks: Dict[int, Tuple[asyncio.AbstractEventLoop, Callable[[], None]]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def cancel(self, reason: str = CANCEL_STOPPED) -> None:
+        with self._lock:
+            if self._cancelled:
+                return
+            self._cancelled = True
+            self.reason = reason
+            callbacks = list(self._callbacks.values())
+        for loop, callback in callbacks:
+            try:
+                loop.call_soon_threadsafe(callback)
+            except RuntimeError:
+                # Loop already closed; nothing left to stop there
+                pass
+
+    def add_callback(self, loop: asyncio.AbstractEventLoop, callback: Callable[[], None]) -> int:
+        """Run ``callback`` on ``loop`` once cancelled; returns a handle for ``remove_callback``"""
+        with self._lock:
+            handle = self._next_id
+            self._next_id += 1
+            self._callbacks[handle] = (loop, callback)
+            cancelled = self._cancelled
+        if cancelled:
+            loop.call_soon_threadsafe(callback)
+        return handle
+
+    def remove_callback(self, handle: int) -> None:
+        with self._lock:
+            self._callbacks.pop(handle, None)
+
+
+async def cancellable(
+    events: AsyncIterator[StreamEvent],
+    cancel: Optional[CancellationToken]
+) -> AsyncIterator[StreamEvent]:
+    """Relay ``events`` until ``cancel`` is set, then close them and end with ``Done(cancelled=True)``.
+
+    A pending read is interrupted rather than waited for: cancelling the token
+    cancels the task while it awaits the next event, so the provider stream
+    is closed at once even when no token is arriving.
+    """
+    async with aclosing(events):
+        if cancel is None:
+            async for event in events:
+                yield event
+            return
+        waiting: Optional[asyncio.Task] = None
+
+        def interrupt() -> None:
+            # Only while awaiting ``events``; otherwise the loop below notices the flag
+            if waiting is not None:
+                waiting.cancel()
+
+        handle = cancel.add_callback(asyncio.get_running_loop(), interrupt)
+        try:
+            while not cancel.cancelled:
+                # Callers may drive each step from a different task (see iterate_on_io_loop)
+                waiting = asyncio.current_task()
+                try:
+                    event = await events.__anext__()
+                except StopAsyncIteration:
+                    return
+                except asyncio.CancelledError:
+                    if not cancel.cancelled:
+                        raise
+                    waiting.uncancel()
+                    break
+                finally:
+                    waiting = None
+                yield event
+            yield Done(cancelled=True)
+        finally:
+            cancel.remove_callback(handle)
+
+
+class StreamBuffer:
+    """List-backed text accumulator; appends are O(1), the parts are joined on read"""
+    __slots__ = ("_parts", "_length")
+
+    def __init__(self):
+        self._parts: List[str] = []
+        self._length = 0
+
+    def append(self, text: str) -> None:
+        self._parts.append(text)
+        self._length += len(text)
+
+    def getvalue(self) -> str:
+        # Collapse into a single part so repeated reads don't re-join
+        if len(self._parts) > 1:
+            self._parts[:] = ["".join(self._parts)]
+        return self._parts[0] if self._parts else ""
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __bool__(self) -> bool:
+        return self._length > 0
+
+
+class StreamAccumulator:
+    """Collects a delta-event stream into thinking, response and usage"""
+    __slots__ = ("thinking_buffer", "response_buffer", "usage", "done", "cancelled")
+
+    def __init__(self):
+        self.thinking_buffer = StreamBuffer()
+        self.response_buffer = StreamBuffer()
+        self.usage: Optional[Usage] = None
+        self.done = False
+        self.cancelled = False
+
+    def feed(self, event: StreamEvent) -> None:
+        cls = event.__class__
+        if cls is TextDelta:
+            self.response_buffer.append(event.text)
+        elif cls is ThinkingDelta:
+            self.thinking_buffer.append(event.text)
+        elif cls is Usage:
+            self.usage = event
+        elif cls is Done:
+            self.done = True
+            self.cancelled = event.cancelled
+
+    @property
+    def thinking(self) -> str:
+        return self.thinking_buffer.getvalue()
+
+    @property
+    def response(self) -> str:
+        return self.response_buffer.getvalue()
+
 
 class BaseAgent(ABC):
-    def __init__(self, api_key: str):
+    # Instruction sent ahead of the conversation; None sends no system prompt
+    system_prompt: Optional[str] = "You are a helpful AI assistant."
+    # Provider model id used unless another one is given or set_model() switches
+    default_model: str = ""
+    # Model context window, longest answer and the share of the window earlier turns may use
+    context_window: int = 8192
+    max_output: int = 4096
+    max_history_tokens: int = 8000
+    # Ask the model to reason first (where the provider makes that optional), and
+    # the tokens it may spend on it where the provider takes a budget
+    reasoning: bool = False
+    reasoning_budget: int = 2048
+    # When False, failures end the stream with Done(error) only, without error text
+    report_errors: bool = True
+    # Provider endpoint; overridable per instance, e.g. to point at a mock server
+    base_url: Optional[str] = None
+
+    def __init__(
+        self,
+        api_key: str,
+        pool: Optional[ClientPool] = None,
+        base_url: Optional[str] = None,
+        model: Optional[str] = None
+    ):
         self.api_key = api_key
+        if base_url:
+            self.base_url = base_url
+        # Clients and connections come from a shared pool so they outlive this agent
+        self.pool = pool or get_default_pool()
+        self._model = model or self.default_model
+        # Sampling parameters sent with every request, by their OpenAI names
+        # (temperature, top_p, max_tokens, stop) where the provider's differ
+        self.params: Dict[str, Any] = {}
         self._initialize()
-    
+        self.context = ContextBuilder(self._history_budget())
+        self._configure_context()
+
     @abstractmethod
     def _initialize(self) -> None:
         """Initialize the agent with provider-specific setup"""
         pass
-    
+
+    def _configure_context(self) -> None:
+        """Hook for provider-specific context policies"""
+        pass
+
+    def _history_budget(self) -> int:
+        reserved = self.params.get("max_tokens", self.max_output)
+        return max(0, min(self.max_history_tokens, self.context_window - reserved))
+
+    def fit_context(self) -> None:
+        """Resize the history budget after the model, ``max_tokens`` or ``max_history_tokens`` changed"""
+        self.context = ContextBuilder(self._history_budget(), self.context.policy, self.context.counter)
+
+    def _model_changed(self) -> None:
+        """Hook for provider objects bound to the model id"""
+        pass
+
+    def set_model(self, spec: ModelSpec) -> None:
+        """Switch to another model of the same provider, keeping the pooled client.
+
+        Limits the spec leaves unset go back to the agent class defaults.
+        """
+        self._model = spec.id
+        self.context_window = spec.context_window or type(self).context_window
+        self.max_output = spec.max_output or type(self).max_output
+        self.reasoning = spec.reasoning
+        self._model_changed()
+        self.fit_context()
+
+    def with_model(self, spec: ModelSpec) -> "BaseAgent":
+        """Copy of this agent switched to ``spec``; this one is left as it is"""
+        agent = copy.copy(self)
+        # Changing the copy's params must not reach back into this agent
+        agent.params = copy.copy(self.params)
+        agent.set_model(spec)
+        return agent
+
+    def with_params(self, params: Dict[str, Any]) -> "BaseAgent":
+        """Copy of this agent sending ``params`` over its own; this one is left as it is"""
+        agent = copy.copy(self)
+        agent.params = {**self.params, **params}
+        agent.fit_context()
+        return agent
+
+    async def list_models(self) -> List[ModelSpec]:
+        """Models offered by the provider's model-list endpoint; none if it has no such endpoint"""
+        return []
+
     @abstractmethod
-    async def stream_chat(self, 
+    async def stream_chat(self,
         prompt: str,
         **kwargs
-    ) -> AsyncIterator[Dict[str, str]]:
+    ) -> AsyncIterator[StreamEvent]:
         """
-        Stream response with thinking process and final response
-        Returns: AsyncIterator yielding dicts with 'thinking' and 'response' keys
+        Stream the thinking process and final response as delta events
+        Earlier turns are passed as ``history=[{"role": ..., "content": ...}]``
+        and fitted into the model's budget by ``self.context``. A
+        ``cancel=CancellationToken()`` stops the stream early; agent stacks
+        from ``build_agent`` then close the provider stream at once and end
+        with ``Done(cancelled=True)``
+        Returns: AsyncIterator yielding ThinkingDelta/TextDelta pieces, an
+        optional Usage, and a final Done
         """
         pass
-    
+
     @property
     @abstractmethod
     def model_name(self) -> str:
         """Return the name of the current model"""
-        pass
\ No newline at end of file
+        pass
+
+    def _error_events(self, error: Exception) -> Iterable[StreamEvent]:
+        """Events reporting a failed generation to the caller"""
+        if not self.report_errors:
+            return (Done(error),)
+        return (
+            ThinkingDelta(f"Error in thinking process: {str(error)}"),
+            TextDelta(f"Error generating response: {str(error)}"),
+            Done(error),
+        )
+
+
+def _forwarded(name: str) -> property:
+    """Attribute read from and written to the wrapped agent"""
+    return property(
+        lambda self: getattr(self.agent, name),
+        lambda self, value: setattr(self.agent, name, value)
+    )
+
+
+class AgentWrapper(BaseAgent):
+    """Base for agents that add behaviour around another agent's stream"""
+
+    # BaseAgent's class defaults would otherwise hide the wrapped agent's settings
+    reasoning = _forwarded("reasoning")
+    reasoning_budget = _forwarded("reasoning_budget")
+    max_output = _forwarded("max_output")
+
+    def __init__(self, agent: BaseAgent):
+        self.agent = agent
+        self.api_key = agent.api_key
+        self.pool = agent.pool
+
+    def _initialize(self) -> None:
+        pass
+
+    async def stream_chat(self, prompt: str, **kwargs) -> AsyncIterator[StreamEvent]:
+        async for event in self.agent.stream_chat(prompt, **kwargs):
+            yield event
+
+    @property
+    def system_prompt(self) -> Optional[str]:
+        return self.agent.system_prompt
+
+    @property
+    def params(self) -> Dict[str, Any]:
+        return self.agent.params
+
+    @property
+    def model_name(self) -> str:
+        return self.agent.model_name
+
+    def set_model(self, spec: ModelSpec) -> None:
+        self.agent.set_model(spec)
+
+    def with_model(self, spec: ModelSpec) -> "BaseAgent":
+        wrapper = copy.copy(self)
+        wrapper.agent = self.agent.with_model(spec)
+        return wrapper
+
+    def with_params(self, params: Dict[str, Any]) -> "BaseAgent":
+        wrapper = copy.copy(self)
+        wrapper.agent = self.agent.with_params(params)
+        return wrapper
+
+    async def list_models(self) -> List[ModelSpec]:
+        return await self.agent.list_models()
+
+    @property
+    def report_errors(self) -> bool:
+        return self.agent.report_errors
+
+    @report_errors.setter
+    def report_errors(self, value: bool) -> None:
+        self.agent.report_errors = value
+
+    def __getattr__(self, name: str):
+        # Anything else (client, _model, ...) comes from the wrapped agent
+        if name == "agent":
+            raise AttributeError(name)
+        return getattr(self.agent, name)
@@ -0,0 +1,312 @@
+import asyncio
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from contextlib import aclosing
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional
+from .base import (
+    AgentWrapper, BaseAgent, CancellationToken, Done, StreamAccumulator, StreamEvent, TextDelta, ThinkingDelta, Usage,
+    cancellable
+)
+
+_WHITESPACE = re.compile(r"\s+")
+
+def _normalize_text(text: Optional[str]) -> str:
+    # Prompts that only differ in Unicode form or whitespace hit the same entry
+    if not text:
+        return ""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+def cache_key(
+    model_name: str,
+    system_prompt: Optional[str],
+    messages: List[Dict[str, Any]],
+    params: Dict[str, Any],
+    settings: Optional[Dict[str, Any]] = None
+) -> str:
+    """Stable hash of everything that determines a model's answer.
+
+    ``settings`` are agent options that shape the request besides ``params``
+    (reasoning, output and history limits).
+    """
+    payload = {
+        "model": model_name,
+        "system": _normalize_text(system_prompt),
+        "messages": [
+            {"role": message["role"], "content": _normalize_text(message["content"])}
+            for message in messages
+        ],
+        "params": params,
+        "settings": settings or {},
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+@dataclass
+class CachedResponse:
+    response: str
+    thinking: str
+    created: float
+    # Usage of the generation that produced it, replayed with hits
+    usage: Optional[Usage] = None
+
+    @property
+    def size(self) -> int:
+        return len(self.response.encode("utf-8")) + len(self.thinking.encode("utf-8"))
+
+class ResponseCache:
+    """In-memory LRU of finished responses with an optional SQLite backing store.
+
+    Entries older than ``ttl`` seconds are ignored and evicted. The memory tier
+    holds at most ``max_entries`` responses; the disk tier is trimmed to
+    ``max_disk_bytes`` by dropping the least recently used rows. ``aget`` and
+    ``aput`` run disk I/O on a worker thread, off the event loop.
+    """
+
+    # Once over max_disk_bytes, trim to this share of it so trims stay rare
+    TRIM_TO = 0.9
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl: Optional[float] = 24 * 3600,
+        path: Optional[str] = None,
+        max_disk_bytes: int = 64 * 1024 * 1024
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Serializes the SQLite connection; never taken while holding _lock
+        self._db_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        # Running size of the disk tier, re-read from the table when it is trimmed
+        self._disk_bytes = 0
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, response TEXT, thinking TEXT, "
+                "created REAL, accessed REAL, size INTEGER, usage TEXT)"
+            )
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(responses)")}
+            if "usage" not in columns:
+                self._db.execute("ALTER TABLE responses ADD COLUMN usage TEXT")
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses (created)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+            self._db.commit()
+            self._disk_bytes = self._stored_bytes()
+
+    def _expired(self, entry: CachedResponse, now: float) -> bool:
+        return self.ttl is not None and now - entry.created > self.ttl
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        now = time.time()
+        entry = self._from_memory(key, now)
+        if entry is None and self._db is not None:
+            entry = self._from_disk(key, now)
+        return self._counted(key, entry)
+
+    async def aget(self, key: str) -> Optional[CachedResponse]:
+        """``get`` with the disk lookup on a worker thread"""
+        now = time.time()
+        entry = self._from_memory(key, now)
+        if entry is None and self._db is not None:
+            entry = await asyncio.to_thread(self._from_disk, key, now)
+        return self._counted(key, entry)
+
+    def put(self, key: str, entry: CachedResponse) -> None:
+        with self._lock:
+            self._remember(key, entry)
+        if self._db is not None:
+            self._store(key, entry)
+
+    async def aput(self, key: str, entry: CachedResponse) -> None:
+        """``put`` with the disk write on a worker thread"""
+        with self._lock:
+            self._remember(key, entry)
+        if self._db is not None:
+            await asyncio.to_thread(self._store, key, entry)
+
+    def _from_memory(self, key: str, now: float) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and self._expired(entry, now):
+                del self._memory[key]
+                entry = None
+            return entry
+
+    def _from_disk(self, key: str, now: float) -> Optional[CachedResponse]:
+        with self._db_lock:
+            entry = self._load(key, now)
+        if entry is not None:
+            with self._lock:
+                self._remember(key, entry)
+        return entry
+
+    def _counted(self, key: str, entry: Optional[CachedResponse]) -> Optional[CachedResponse]:
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            if key in self._memory:
+                self._memory.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def _remember(self, key: str, entry: CachedResponse) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _stored_bytes(self) -> int:
+        return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def _store(self, key: str, entry: CachedResponse) -> None:
+        usage = json.dumps(entry.usage.as_dict()) if entry.usage is not None else None
+        with self._db_lock:
+            row = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, response, thinking, created, accessed, size, usage) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, entry.response, entry.thinking, entry.created, entry.created, entry.size, usage)
+            )
+            self._disk_bytes += entry.size - (row[0] if row else 0)
+            self._evict_disk()
+            self._db.commit()
+
+    def _load(self, key: str, now: float) -> Optional[CachedResponse]:
+        row = self._db.execute(
+            "SELECT response, thinking, created, size, usage FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        response, thinking, created, size, usage = row
+        entry = CachedResponse(response, thinking, created, Usage(**json.loads(usage)) if usage else None)
+        if self._expired(entry, now):
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._db.commit()
+            self._disk_bytes -= size
+            return None
+        self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        self._db.commit()
+        return entry
+
+    def _evict_disk(self) -> None:
+        if self._disk_bytes <= self.max_disk_bytes:
+            return
+        if self.ttl is not None:
+            self._db.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+        # Other processes may share the file, so trim against the real total
+        total = self._stored_bytes()
+        target = int(self.max_disk_bytes * self.TRIM_TO)
+        freed = 0
+        stale = []
+        if total > self.max_disk_bytes:
+            for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY accessed"):
+                stale.append((key,))
+                freed += size
+                if total - freed <= target:
+                    break
+            self._db.executemany("DELETE FROM responses WHERE key = ?", stale)
+        self._disk_bytes = total - freed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+            }
+        if self._db is not None:
+            with self._db_lock:
+                stats["disk_entries"] = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+                stats["disk_bytes"] = self._disk_bytes
+        return stats
+
+class CachedAgent(AgentWrapper):
+    """Serve repeated prompts from a ResponseCache instead of the provider.
+
+    Hits are replayed as a normal event stream in ``replay_chunk_chars``
+    pieces, ``replay_delay`` seconds apart (0 replays instantly), with the
+    original generation's Usage. Pass ``bypass_cache=True`` to ``stream_chat``
+    to force a fresh generation.
+    """
+
+    def __init__(
+        self,
+        agent: BaseAgent,
+        cache: ResponseCache,
+        replay_chunk_chars: int = 32,
+        replay_delay: float = 0.0
+    ):
+        super().__init__(agent)
+        self.cache = cache
+        self.replay_chunk_chars = replay_chunk_chars
+        self.replay_delay = replay_delay
+
+    def _key(self, prompt: str, history: List[Dict[str, Any]]) -> str:
+        messages = list(history) + [{"role": "user", "content": prompt}]
+        settings = {
+            "reasoning": self.reasoning,
+            "reasoning_budget": self.reasoning_budget,
+            "max_output": self.max_output,
+            # Which earlier turns are actually sent
+            "history_budget": self.context.budget,
+            "history_policy": type(self.context.policy).__name__,
+        }
+        return cache_key(self.model_name, self.system_prompt, messages, self.params, settings)
+
+    async def _replay(self, entry: CachedResponse) -> AsyncIterator[StreamEvent]:
+        step = self.replay_chunk_chars
+        for delta_class, text in ((ThinkingDelta, entry.thinking), (TextDelta, entry.response)):
+            for start in range(0, len(text), step):
+                if self.replay_delay:
+                    await asyncio.sleep(self.replay_delay)
+                yield delta_class(text[start:start + step])
+        if entry.usage is not None:
+            yield entry.usage
+        yield Done()
+
+    async def stream_chat(
+        self,
+        prompt: str,
+        bypass_cache: bool = False,
+        cancel: Optional[CancellationToken] = None,
+        **kwargs
+    ) -> AsyncIterator[StreamEvent]:
+        key = self._key(prompt, kwargs.get("history", []))
+        if not bypass_cache:
+            entry = await self.cache.aget(key)
+            if entry is not None:
+                # The Stop button ends a replay between chunks like a live stream
+                async with aclosing(cancellable(self._replay(entry), cancel)) as events:
+                    async for event in events:
+                        yield event
+                return
+
+        stream = StreamAccumulator()
+        async with aclosing(self.agent.stream_chat(prompt, cancel=cancel, **kwargs)) as events:
+            async for event in events:
+                stream.feed(event)
+                # A stopped answer is partial; only complete ones are reused
+                if (
+                    event.__class__ is Done and event.error is None and not event.cancelled
+                    and stream.response_buffer
+                ):
+                    await self.cache.aput(
+                        key, CachedResponse(stream.response, stream.thinking, time.time(), stream.usage)
+                    )
+                yield event
@@ -0,0 +1,201 @@
+import dataclasses
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Latency classes, fastest first
+LATENCY_CLASSES = ("fast", "standard", "slow")
+
+@dataclass(frozen=True)
+class ModelSpec:
+    """One provider model: its id, limits, list price and how quickly it answers.
+
+    Limits left as None fall back to the agent's defaults. Prices are USD per
+    million tokens. ``latency_class`` is one of LATENCY_CLASSES; models
+    without one are never picked by the auto-router. ``reasoning`` models
+    think before answering; agents ask for their reasoning to be streamed
+    where the provider offers that.
+    """
+    id: str
+    context_window: Optional[int] = None
+    max_output: Optional[int] = None
+    input_price: Optional[float] = None
+    output_price: Optional[float] = None
+    latency_class: Optional[str] = None
+    reasoning: bool = False
+
+    @property
+    def latency_rank(self) -> int:
+        if self.latency_class in LATENCY_CLASSES:
+            return LATENCY_CLASSES.index(self.latency_class)
+        return len(LATENCY_CLASSES)
+
+    def cost(self, input_tokens: int, output_tokens: int) -> Optional[float]:
+        """Price of one request in USD, if the model's prices are known"""
+        if self.input_price is None or self.output_price is None:
+            return None
+        return (input_tokens * self.input_price + output_tokens * self.output_price) / 1_000_000
+
+    def label(self) -> str:
+        """``id · latency class · prices`` for model pickers"""
+        parts = [self.id]
+        if self.latency_class:
+            parts.append(self.latency_class)
+        if self.reasoning:
+            parts.append("reasoning")
+        if self.input_price is not None and self.output_price is not None:
+            parts.append(f"${self.input_price:g}/${self.output_price:g} per 1M tokens")
+        return " · ".join(parts)
+
+# List prices at the time of writing; refresh() updates them where a provider's
+# model list reports them. The first model of each provider is its default.
+BUILTIN_SPECS: Dict[str, List[ModelSpec]] = {
+    "OpenAI": [
+        ModelSpec("gpt-4-turbo-preview", 128000, 4096, 10.0, 30.0, "slow"),
+        ModelSpec("gpt-4o", 128000, 16384, 2.5, 10.0, "standard"),
+        ModelSpec("gpt-4o-mini", 128000, 16384, 0.15, 0.6, "fast"),
+        ModelSpec("gpt-3.5-turbo", 16385, 4096, 0.5, 1.5, "fast"),
+        # Reasoning is not streamed, only counted
+        ModelSpec("o3-mini", 200000, 100000, 1.1, 4.4, "slow", reasoning=True),
+    ],
+    "Anthropic": [
+        ModelSpec("claude-3-opus-20240229", 200000, 4096, 15.0, 75.0, "slow"),
+        ModelSpec("claude-3-7-sonnet-20250219", 200000, 64000, 3.0, 15.0, "slow", reasoning=True),
+        ModelSpec("claude-3-5-sonnet-20241022", 200000, 8192, 3.0, 15.0, "standard"),
+        ModelSpec("claude-3-5-haiku-20241022", 200000, 8192, 0.8, 4.0, "fast"),
+        ModelSpec("claude-3-haiku-20240307", 200000, 4096, 0.25, 1.25, "fast"),
+    ],
+    "Google": [
+        ModelSpec("gemini-2.0-flash-thinking-exp", 32767, 8192, latency_class="slow", reasoning=True),
+        ModelSpec("gemini-1.5-pro", 2097152, 8192, 1.25, 5.0, "standard"),
+        ModelSpec("gemini-1.5-flash", 1048576, 8192, 0.075, 0.3, "fast"),
+    ],
+    "Together AI": [
+        ModelSpec("mistralai/Mixtral-8x7B-Instruct-v0.1", 32768, 4096, 0.6, 0.6, "standard"),
+        ModelSpec("meta-llama/Meta-Llama-3.1-70B-Instruct-Turbo", 131072, 4096, 0.88, 0.88, "standard"),
+        ModelSpec("meta-llama/Meta-Llama-3.1-8B-Instruct-Turbo", 131072, 4096, 0.18, 0.18, "fast"),
+        ModelSpec("deepseek-ai/DeepSeek-R1", 163840, 32768, 3.0, 7.0, "slow", reasoning=True),
+    ],
+    "OpenRouter": [
+        ModelSpec("mistralai/mistral-nemo", 128000, 4096, 0.13, 0.13, "fast"),
+        ModelSpec("openai/gpt-4o-mini", 128000, 16384, 0.15, 0.6, "fast"),
+        ModelSpec("anthropic/claude-3.5-sonnet", 200000, 8192, 3.0, 15.0, "standard"),
+        ModelSpec("deepseek/deepseek-r1", 163840, 32768, 0.55, 2.19, "slow", reasoning=True),
+    ],
+    "Mock": [
+        ModelSpec("mock-model", 128000, 4096, 0.0, 0.0, "fast", reasoning=True),
+    ],
+}
+
+def _merge(known: ModelSpec, listed: ModelSpec) -> ModelSpec:
+    # Listed limits and prices are newer; the latency class is only ever ours,
+    # and most listings do not say whether a model reasons
+    updates = {
+        field.name: getattr(listed, field.name)
+        for field in dataclasses.fields(ModelSpec)
+        if field.name not in ("id", "latency_class", "reasoning") and getattr(listed, field.name) is not None
+    }
+    return dataclasses.replace(known, reasoning=known.reasoning or listed.reasoning, **updates)
+
+class ModelCatalog:
+    """Models per provider: the built-in specs plus the provider's own model list.
+
+    ``refresh`` asks an agent for its provider's models (``list_models()``)
+    at most once per ``ttl`` seconds; with ``path`` the listings are also
+    kept in a JSON file, so restarts and other processes skip the request.
+    """
+
+    def __init__(
+        self,
+        builtin: Optional[Dict[str, List[ModelSpec]]] = None,
+        path: Optional[str] = None,
+        ttl: float = 86400.0
+    ):
+        self.builtin = BUILTIN_SPECS if builtin is None else builtin
+        self.path = Path(path) if path else None
+        self.ttl = ttl
+        self.refreshes = 0
+        # provider -> (fetched at, listed specs)
+        self._listed: Dict[str, Tuple[float, List[ModelSpec]]] = {}
+        self._lock = threading.Lock()
+        if self.path is not None:
+            self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable model catalog %s: %s", self.path, e)
+            return
+        for provider, entry in data.items():
+            self._listed[provider] = (entry["fetched"], [ModelSpec(**spec) for spec in entry["models"]])
+
+    def _save(self) -> None:
+        # Caller holds the lock
+        data = {
+            provider: {"fetched": fetched, "models": [dataclasses.asdict(spec) for spec in specs]}
+            for provider, (fetched, specs) in self._listed.items()
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.path.with_suffix(".tmp")
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        temporary.replace(self.path)
+
+    def models(self, provider: str) -> List[ModelSpec]:
+        """Built-in models first (updated from the listing), then the other listed ones"""
+        with self._lock:
+            listed = {spec.id: spec for spec in self._listed.get(provider, (0.0, []))[1]}
+        specs = []
+        for known in self.builtin.get(provider, []):
+            update = listed.pop(known.id, None)
+            specs.append(known if update is None else _merge(known, update))
+        return specs + sorted(listed.values(), key=lambda spec: spec.id)
+
+    def get(self, provider: str, model_id: str) -> Optional[ModelSpec]:
+        return next((spec for spec in self.models(provider) if spec.id == model_id), None)
+
+    def fetched_at(self, provider: str) -> Optional[float]:
+        """When the provider's model list was last fetched (epoch seconds)"""
+        with self._lock:
+            entry = self._listed.get(provider)
+        return entry[0] if entry else None
+
+    async def refresh(self, provider: str, agent: Any, force: bool = False) -> List[ModelSpec]:
+        """Update the provider's models from ``agent.list_models()`` unless fetched within ``ttl``.
+
+        A failed listing keeps the previous models.
+        """
+        fetched = self.fetched_at(provider)
+        if not force and fetched is not None and time.time() - fetched < self.ttl:
+            return self.models(provider)
+        try:
+            listed = await agent.list_models()
+        except Exception as e:
+            logger.warning("Listing %s models failed: %s", provider, e)
+            return self.models(provider)
+        with self._lock:
+            self._listed[provider] = (time.time(), list(listed))
+            self.refreshes += 1
+            if self.path is not None:
+                try:
+                    self._save()
+                except OSError as e:
+                    logger.warning("Could not write model catalog %s: %s", self.path, e)
+        return self.models(provider)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "refreshes": self.refreshes,
+                "listed": {provider: len(specs) for provider, (_, specs) in self._listed.items()},
+            }
@@ -0,0 +1,154 @@
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional
+from .base import BaseAgent, Done, ProviderError, StreamEvent, TextDelta, ThinkingDelta, Usage
+from .catalog import ModelSpec
+from .context import to_openai
+from .sse import iter_sse_json
+
+logger = logging.getLogger(__name__)
+
+_OPEN_TAG = "<think>"
+_CLOSE_TAG = "</think>"
+
+def _partial_tag(text: str, tag: str) -> int:
+    """Length of the longest end of ``text`` that starts ``tag``"""
+    for length in range(min(len(text), len(tag) - 1), 0, -1):
+        if tag.startswith(text[-length:]):
+            return length
+    return 0
+
+class ThinkTagSplitter:
+    """Turn content that opens with ``<think>...</think>`` into ThinkingDelta events.
+
+    Models such as DeepSeek-R1 stream their reasoning inline this way. Only a
+    tag at the very start of the answer counts; tags cut across chunks are
+    held back until the next chunk settles them. After the reasoning,
+    content passes straight through.
+    """
+    __slots__ = ("_state", "_held")
+
+    def __init__(self):
+        self._state = "start"  # then "thinking" and "answer"
+        self._held = ""
+
+    def feed(self, text: str) -> List[StreamEvent]:
+        if self._state == "answer":
+            return [TextDelta(text)]
+        text = self._held + text
+        self._held = ""
+        if self._state == "start":
+            stripped = text.lstrip()
+            if len(stripped) < len(_OPEN_TAG) and _OPEN_TAG.startswith(stripped):
+                self._held = text
+                return []
+            if not stripped.startswith(_OPEN_TAG):
+                self._state = "answer"
+                return [TextDelta(text)]
+            self._state = "thinking"
+            text = stripped[len(_OPEN_TAG):]
+        end = text.find(_CLOSE_TAG)
+        if end < 0:
+            held = _partial_tag(text, _CLOSE_TAG)
+            self._held = text[len(text) - held:] if held else ""
+            text = text[:len(text) - held]
+            return [ThinkingDelta(text)] if text else []
+        self._state = "answer"
+        events: List[StreamEvent] = [ThinkingDelta(text[:end])] if end else []
+        answer = text[end + len(_CLOSE_TAG):]
+        if answer:
+            events.append(TextDelta(answer))
+        return events
+
+    def flush(self) -> List[StreamEvent]:
+        """Whatever is still held back once the stream has ended"""
+        held, self._held = self._held, ""
+        if not held:
+            return []
+        return [ThinkingDelta(held) if self._state == "thinking" else TextDelta(held)]
+
+class OpenAICompatibleAgent(BaseAgent):
+    """Agent for any endpoint speaking the OpenAI chat-completions SSE format.
+
+    Subclasses set ``base_url`` and ``default_model``; requests go through
+    the pooled aiohttp session and the SSE decoder. Reasoning arrives as
+    ``reasoning_content`` or ``reasoning`` deltas, or inline in ``<think>``
+    tags, and is streamed as ThinkingDelta events.
+    """
+
+    def _initialize(self) -> None:
+        self._api_url = f"{self.base_url.rstrip('/')}/chat/completions"
+        self._headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+
+    def _request_body(self, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "model": self._model,
+            "messages": messages,
+            **self.params,
+            "stream": True
+        }
+
+    async def stream_chat(
+        self,
+        prompt: str,
+        history: Optional[List[Dict[str, Any]]] = None,
+        **kwargs
+    ) -> AsyncIterator[StreamEvent]:
+        try:
+            messages = to_openai(self.context.build(history or [], prompt, self.system_prompt), self.system_prompt)
+            session = self.pool.aiohttp_session(self._api_url)
+            async with session.post(self._api_url, headers=self._headers, json=self._request_body(messages)) as resp:
+                if resp.status != 200:
+                    error_text = await resp.text()
+                    raise ProviderError(resp.status, error_text, resp.headers.get("Retry-After"))
+                
+                splitter = ThinkTagSplitter()
+                async for chunk in iter_sse_json(resp.content.iter_any()):
+                    choices = chunk.get("choices")
+                    if choices:
+                        delta = choices[0].get("delta")
+                        if delta:
+                            reasoning = delta.get("reasoning_content") or delta.get("reasoning")
+                            if reasoning:
+                                yield ThinkingDelta(reasoning)
+                            content = delta.get("content")
+                            if content:
+                                for event in splitter.feed(content):
+                                    yield event
+                    usage = chunk.get("usage")
+                    if usage:
+                        output_details = usage.get("completion_tokens_details") or {}
+                        yield Usage(
+                            usage.get("prompt_tokens", 0),
+                            usage.get("completion_tokens", 0),
+                            reasoning_tokens=output_details.get("reasoning_tokens") or 0
+                        )
+                for event in splitter.flush():
+                    yield event
+            yield Done()
+        
+        except Exception as e:
+            logger.warning("Error in %s: %s", type(self).__name__, e)
+            for event in self._error_events(e):
+                yield event
+
+    async def list_models(self) -> List[ModelSpec]:
+        url = f"{self.base_url.rstrip('/')}/models"
+        session = self.pool.aiohttp_session(url)
+        async with session.get(url, headers=self._headers) as resp:
+            if resp.status != 200:
+                raise ProviderError(resp.status, await resp.text(), resp.headers.get("Retry-After"))
+            listing = await resp.json()
+        # OpenAI-style {"data": [...]}, or a bare list (Together)
+        items = listing.get("data", []) if isinstance(listing, dict) else listing
+        return [spec for spec in map(self._listed_spec, items) if spec is not None]
+
+    def _listed_spec(self, item: Dict[str, Any]) -> Optional[ModelSpec]:
+        """Catalog entry for one model-list item; None skips it"""
+        return ModelSpec(item["id"], context_window=item.get("context_length"))
+
+    @property
+    def model_name(self) -> str:
+        return self._model
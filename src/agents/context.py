@@ -0,0 +1,189 @@
+import re
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+Message = Dict[str, Any]
+
+# Per-message framing overhead (role markers, separators) in chat formats
+MESSAGE_OVERHEAD_TOKENS = 4
+
+def estimate_tokens(text: str) -> int:
+    """Cheap provider-agnostic token estimate (~4 characters per token)"""
+    return (len(text) + 3) // 4
+
+def select_turns(history: List[Message], agent: Optional[str] = None) -> List[Message]:
+    """User turns plus the assistant turns that belong to ``agent``.
+
+    Compare mode tags each assistant answer with the agent that wrote it;
+    untagged answers are shared by every agent.
+    """
+    return [
+        message for message in history
+        if message["role"] == "user"
+        or (message["role"] == "assistant" and message.get("agent") in (None, agent))
+    ]
+
+class HistoryPolicy(ABC):
+    """Decides which earlier turns are sent when they exceed the budget"""
+
+    @abstractmethod
+    def fit(self, turns: List[Message], budget: int, count: Callable[[Message], int]) -> List[Message]:
+        """Return the turns to send; their counted total must not exceed budget"""
+        pass
+
+def _newest_within(turns: List[Message], budget: int, count: Callable[[Message], int]) -> int:
+    """Index of the oldest turn in the longest suffix of turns that fits the budget"""
+    used = 0
+    start = len(turns)
+    while start > 0:
+        tokens = count(turns[start - 1])
+        if used + tokens > budget:
+            break
+        used += tokens
+        start -= 1
+    return start
+
+class TruncatePolicy(HistoryPolicy):
+    """Drop the oldest turns.
+
+    With ``align`` > 1 the window start is moved back to a multiple of that
+    many turns, keeping the prompt prefix that providers cache, when the
+    extra turns still fit the budget. It is never moved forward: the window
+    always holds every turn that fits.
+    """
+
+    def __init__(self, align: int = 1):
+        self.align = max(1, align)
+
+    def fit(self, turns: List[Message], budget: int, count: Callable[[Message], int]) -> List[Message]:
+        start = _newest_within(turns, budget, count)
+        if start and self.align > 1:
+            aligned = start // self.align * self.align
+            if sum(count(turn) for turn in turns[aligned:]) <= budget:
+                start = aligned
+        return turns[start:]
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+def first_sentences(turns: List[Message], max_chars: int = 200) -> str:
+    """Extractive summary: the opening sentence of every turn"""
+    lines = []
+    for turn in turns:
+        text = _SENTENCE_END.split(turn["content"].strip(), maxsplit=1)[0][:max_chars]
+        lines.append(f"{turn['role']}: {text}")
+    return "\n".join(lines)
+
+class SummarizePolicy(HistoryPolicy):
+    """Replace the dropped turns with a single summary message.
+
+    ``summarizer`` turns the dropped messages into text; the default keeps the
+    first sentence of each, but any callable (e.g. a call to a small model)
+    can be plugged in. ``summary_tokens`` is reserved out of the budget.
+    """
+
+    def __init__(
+        self,
+        summarizer: Callable[[List[Message]], str] = first_sentences,
+        summary_tokens: int = 512
+    ):
+        self.summarizer = summarizer
+        self.summary_tokens = summary_tokens
+
+    def fit(self, turns: List[Message], budget: int, count: Callable[[Message], int]) -> List[Message]:
+        if sum(count(turn) for turn in turns) <= budget:
+            return turns
+        start = _newest_within(turns, max(0, budget - self.summary_tokens), count)
+        summary = self.summarizer(turns[:start])
+        max_chars = self.summary_tokens * 4
+        if len(summary) > max_chars:
+            # Keep the most recent whole lines
+            summary = summary[-max_chars:].split("\n", 1)[-1]
+        return [{"role": "user", "content": f"Summary of the earlier conversation:\n{summary}"}] + turns[start:]
+
+class ContextBuilder:
+    """Turn chat history into the messages sent for a new prompt.
+
+    Token counts are cached on each history message under ``"tokens"``, so a
+    message is only counted once however many turns it is sent with.
+    """
+
+    def __init__(
+        self,
+        budget: int,
+        policy: Optional[HistoryPolicy] = None,
+        counter: Callable[[str], int] = estimate_tokens
+    ):
+        self.budget = budget
+        self.policy = policy or TruncatePolicy()
+        self.counter = counter
+
+    def count(self, message: Message) -> int:
+        tokens = message.get("tokens")
+        if tokens is None:
+            tokens = self.counter(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+            message["tokens"] = tokens
+        return tokens
+
+    def build(
+        self,
+        history: List[Message],
+        prompt: str,
+        system_prompt: Optional[str] = None
+    ) -> List[Dict[str, str]]:
+        """Provider-neutral role/content messages ending with the prompt"""
+        prompt_message = {"role": "user", "content": prompt}
+        budget = self.budget - self.count(dict(prompt_message))
+        if system_prompt:
+            budget -= self.counter(system_prompt) + MESSAGE_OVERHEAD_TOKENS
+        turns = [
+            message for message in history
+            if message["role"] in ("user", "assistant") and message.get("content")
+        ]
+        kept = self.policy.fit(turns, max(0, budget), self.count)
+        return [{"role": message["role"], "content": message["content"]} for message in kept] + [prompt_message]
+
+def to_openai(messages: List[Dict[str, str]], system_prompt: Optional[str] = None) -> List[Dict[str, str]]:
+    """Chat Completions format: optional system message first"""
+    if system_prompt:
+        return [{"role": "system", "content": system_prompt}] + messages
+    return messages
+
+def from_openai(messages: List[Dict[str, Any]]) -> Tuple[str, List[Dict[str, str]]]:
+    """Split Chat Completions messages into the prompt (last user message) and history.
+
+    System messages are dropped, since every agent keeps its own system prompt.
+    """
+    turns = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, list):
+            # Content parts: only text is supported
+            content = "".join(part.get("text", "") for part in content if part.get("type") == "text")
+        if message.get("role") in ("user", "assistant") and content:
+            turns.append({"role": message["role"], "content": content})
+    if not turns or turns[-1]["role"] != "user":
+        raise ValueError("messages must end with a user message")
+    return turns[-1]["content"], turns[:-1]
+
+def _merge_roles(messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    # Strictly alternating providers reject consecutive turns with the same role
+    merged: List[Dict[str, str]] = []
+    for message in messages:
+        if merged and merged[-1]["role"] == message["role"]:
+            merged[-1] = {"role": message["role"], "content": f"{merged[-1]['content']}\n\n{message['content']}"}
+        else:
+            merged.append(dict(message))
+    while merged and merged[0]["role"] != "user":
+        merged.pop(0)
+    return merged
+
+def to_anthropic(messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """Messages API format: alternating turns starting with the user"""
+    return _merge_roles(messages)
+
+def to_gemini(messages: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+    """Gemini ``contents`` format with user/model roles"""
+    return [
+        {"role": "model" if message["role"] == "assistant" else "user", "parts": [{"text": message["content"]}]}
+        for message in _merge_roles(messages)
+    ]
@@ -0,0 +1,99 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
+from .base import BaseAgent, Done, StreamEvent, TextDelta, ThinkingDelta
+
+@dataclass
+class StreamTiming:
+    started: float
+    first_token: Optional[float] = None
+    finished: Optional[float] = None
+    cancelled: bool = False
+
+    @property
+    def time_to_first_token(self) -> Optional[float]:
+        return None if self.first_token is None else self.first_token - self.started
+
+    @property
+    def total(self) -> Optional[float]:
+        return None if self.finished is None else self.finished - self.started
+
+_FINISHED = object()
+
+class FanOut:
+    """Send one prompt to several agents and merge their event streams.
+
+    Events are yielded as ``(name, event)`` in arrival order, so a slow agent
+    never holds back a fast one. With ``first_wins`` the remaining streams are
+    cancelled as soon as one agent finishes successfully; failed streams do
+    not win.
+    """
+
+    def __init__(
+        self,
+        agents: Dict[str, BaseAgent],
+        prompt: str,
+        first_wins: bool = False,
+        clock: Callable[[], float] = time.monotonic,
+        agent_kwargs: Optional[Dict[str, Dict[str, Any]]] = None,
+        **kwargs
+    ):
+        self.agents = agents
+        self.prompt = prompt
+        self.first_wins = first_wins
+        # Shared stream_chat arguments, plus per-agent ones such as history
+        self.kwargs = kwargs
+        self.agent_kwargs = agent_kwargs or {}
+        self._clock = clock
+        self.timings: Dict[str, StreamTiming] = {}
+        self.winner: Optional[str] = None
+
+    async def _pump(self, name: str, agent: BaseAgent, queue: asyncio.Queue) -> None:
+        timing = self.timings[name]
+        try:
+            kwargs = {**self.kwargs, **self.agent_kwargs.get(name, {})}
+            async for event in agent.stream_chat(self.prompt, **kwargs):
+                if timing.first_token is None and event.__class__ in (TextDelta, ThinkingDelta):
+                    timing.first_token = self._clock()
+                elif event.__class__ is Done:
+                    timing.finished = self._clock()
+                queue.put_nowait((name, event))
+        except Exception as e:
+            for event in agent._error_events(e):
+                queue.put_nowait((name, event))
+        finally:
+            if timing.finished is None:
+                timing.finished = self._clock()
+            queue.put_nowait((name, _FINISHED))
+
+    async def events(self) -> AsyncIterator[Tuple[str, StreamEvent]]:
+        queue: asyncio.Queue = asyncio.Queue()
+        started = self._clock()
+        tasks = {}
+        for name, agent in self.agents.items():
+            self.timings[name] = StreamTiming(started=started)
+            tasks[name] = asyncio.create_task(self._pump(name, agent, queue))
+        remaining = set(tasks)
+        try:
+            while remaining:
+                name, event = await queue.get()
+                if event is _FINISHED:
+                    remaining.discard(name)
+                    continue
+                yield name, event
+                if (
+                    self.first_wins and self.winner is None and event.__class__ is Done
+                    and event.error is None and not event.cancelled
+                ):
+                    self.winner = name
+                    for other in remaining - {name}:
+                        tasks[other].cancel()
+                        self.timings[other].cancelled = True
+                        self.timings[other].finished = self._clock()
+                        yield other, Done(cancelled=True)
+                    remaining &= {name}
+        finally:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
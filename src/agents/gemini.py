@@ -1,45 +1,123 @@
-import google.generativeai as genai
-from typing import AsyncIterator, Dict
-from .base import BaseAgent
+from contextlib import aclosing
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, List, Optional
+import httpx
+from google import genai
+from google.genai import types
+from .base import BaseAgent, Done, StreamEvent, TextDelta, ThinkingDelta, Usage
+from .catalog import ModelSpec
+from .context import to_gemini
+
+GEMINI_BASE_URL = "https://generativelanguage.googleapis.com"
+
+# HTTP responses opened by the stream read in the current step. The SDK closes
+# them only once the garbage collector breaks its generator cycles, so streams
+# close them themselves
+_opened_responses: ContextVar[Optional[List[httpx.Response]]] = ContextVar("gemini_responses", default=None)
+
+async def _track_response(response: httpx.Response) -> None:
+    opened = _opened_responses.get()
+    if opened is not None:
+        opened.append(response)
+
+def _http_client(pool, base_url: str) -> httpx.AsyncClient:
+    client = pool.httpx_client(base_url, httpx.AsyncClient)
+    hooks = client.event_hooks
+    if _track_response not in hooks["response"]:
+        client.event_hooks = {**hooks, "response": hooks["response"] + [_track_response]}
+    return client
 
 class GeminiAgent(BaseAgent):
+    system_prompt = None
+    default_model = "gemini-2.0-flash-thinking-exp"
+    context_window = 32767
+    base_url = GEMINI_BASE_URL
+
     def _initialize(self) -> None:
-        genai.configure(api_key=self.api_key)
-        self._model = genai.GenerativeModel('gemini-2.0-flash-thinking-exp')
-
-    async def stream_chat(self, prompt: str, **kwargs) -> AsyncIterator[Dict[str, str]]:
-        thinking = ""
-        response = ""
-        processing_thinking = True
-        
+        # A client per key and endpoint: credentials live on the client, not the process
+        self.client = self.pool.get(
+            "gemini", self.api_key, self.base_url,
+            lambda: genai.Client(
+                api_key=self.api_key,
+                http_options=types.HttpOptions(
+                    base_url=self.base_url,
+                    httpx_async_client=_http_client(self.pool, self.base_url)
+                )
+            )
+        )
+
+    async def stream_chat(
+        self,
+        prompt: str,
+        history: Optional[List[Dict[str, Any]]] = None,
+        **kwargs
+    ) -> AsyncIterator[StreamEvent]:
+        usage = None
+        opened: List[httpx.Response] = []
+
         try:
-            response_stream = self._model.generate_content(prompt, stream=True)
-            for chunk in response_stream:
-                if chunk.parts:
-                    if len(chunk.parts) > 1:
-                        if processing_thinking:
-                            thinking += chunk.parts[0].text
-                            response += "".join(part.text for part in chunk.parts[1:] if part.text)
-                            processing_thinking = False
-                        else:
-                            response += "".join(part.text for part in chunk.parts if part.text)
-                    else:
-                        if processing_thinking:
-                            thinking += chunk.parts[0].text
-                        else:
-                            response += chunk.parts[0].text
-                    
-                    yield {
-                        "thinking": thinking,
-                        "response": response
-                    }
-                    
+            contents = to_gemini(self.context.build(history or [], prompt))
+            stop = self.params.get("stop")
+            config = types.GenerateContentConfig(
+                temperature=self.params.get("temperature"),
+                top_p=self.params.get("top_p"),
+                max_output_tokens=self.params.get("max_tokens"),
+                stop_sequences=[stop] if isinstance(stop, str) else stop,
+                # Thought parts are only sent when asked for
+                thinking_config=types.ThinkingConfig(include_thoughts=True) if self.reasoning else None
+            )
+            chunks = await self.client.aio.models.generate_content_stream(
+                model=self._model, contents=contents, config=config
+            )
+            async with aclosing(chunks):
+                while True:
+                    # The request goes out on the first read; set and reset within
+                    # the read, so no other stream's steps are recorded here
+                    token = _opened_responses.set(opened)
+                    try:
+                        chunk = await anext(chunks, None)
+                    finally:
+                        _opened_responses.reset(token)
+                    if chunk is None:
+                        break
+                    # Chunks without a candidate, such as a final usage-only one, carry no parts
+                    content = chunk.candidates[0].content if chunk.candidates else None
+                    for part in (content.parts or ()) if content is not None else ():
+                        if part.text:
+                            yield ThinkingDelta(part.text) if part.thought else TextDelta(part.text)
+                    if chunk.usage_metadata:
+                        # Thought tokens are counted apart from the candidates
+                        thoughts = chunk.usage_metadata.thoughts_token_count or 0
+                        usage = Usage(
+                            chunk.usage_metadata.prompt_token_count or 0,
+                            (chunk.usage_metadata.candidates_token_count or 0) + thoughts,
+                            cache_read_tokens=chunk.usage_metadata.cached_content_token_count or 0,
+                            reasoning_tokens=thoughts
+                        )
+
+            if usage:
+                yield usage
+            yield Done()
+
         except Exception as e:
-            yield {
-                "thinking": f"Error in thinking process: {str(e)}",
-                "response": f"Error generating response: {str(e)}"
-            }
+            for event in self._error_events(e):
+                yield event
+        finally:
+            # Runs on completion, cancellation and aclose() alike, so the server stops generating
+            for response in opened:
+                await response.aclose()
+
+    async def list_models(self) -> List[ModelSpec]:
+        return [
+            ModelSpec(
+                model.name.removeprefix("models/"),
+                context_window=model.input_token_limit,
+                max_output=model.output_token_limit
+            )
+            async for model in await self.client.aio.models.list()
+            if "generateContent" in (model.supported_actions or ())
+        ]
 
     @property
     def model_name(self) -> str:
-        return "Gemini-2.0-Flash-Thinking"
\ No newline at end of file
+        return self._model
@@ -0,0 +1,332 @@
+import bisect
+import threading
+import time
+from collections import deque
+from contextlib import aclosing
+from dataclasses import asdict, dataclass
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+from .base import (
+    CANCEL_HEDGE_LOST, CANCEL_TIMEOUT, AgentWrapper, BaseAgent, Done, StreamEvent, TextDelta, ThinkingDelta, Usage
+)
+
+try:
+    from opentelemetry import trace
+except ImportError:  # optional span export
+    trace = None
+
+# Histogram bucket upper bounds (the +Inf bucket is implicit)
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0, 64.0)
+THROUGHPUT_BUCKETS = (1.0, 5.0, 10.0, 20.0, 40.0, 80.0, 160.0, 320.0)
+
+@dataclass
+class StreamMetrics:
+    """Latency, throughput and usage of one ``stream_chat`` call"""
+    provider: str
+    model: str
+    started: float
+    duration: float
+    time_to_first_token: Optional[float] = None
+    inter_token_latency: Optional[float] = None
+    max_inter_token_latency: Optional[float] = None
+    tokens_per_second: Optional[float] = None
+    chunks: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_read_tokens: int = 0
+    # Part of output_tokens spent thinking, and the time from the first thought to the first answer token
+    reasoning_tokens: int = 0
+    reasoning_time: Optional[float] = None
+    error: Optional[str] = None
+    cancelled: bool = False
+    # Cancelled streams: estimated output tokens not generated thanks to stopping early
+    tokens_saved: int = 0
+    # Closed because a hedge to another provider answered first
+    hedge_lost: bool = False
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+class Histogram:
+    """Cumulative fixed-bucket histogram in the Prometheus layout"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """``(le, count)`` pairs including the +Inf bucket"""
+        pairs = []
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            pairs.append(("+Inf" if bound == float("inf") else repr(bound), total))
+        return pairs
+
+def _column(records: List[StreamMetrics], field: str) -> List[float]:
+    # Failed, cancelled and abandoned streams would skew the latency figures
+    return [
+        getattr(m, field) for m in records
+        if getattr(m, field) is not None and not m.error and not m.cancelled and not m.hedge_lost
+    ]
+
+def _quantile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+_HISTOGRAMS = {
+    "time_to_first_token": ("llm_time_to_first_token_seconds", LATENCY_BUCKETS),
+    "inter_token_latency": ("llm_inter_token_latency_seconds", LATENCY_BUCKETS),
+    "duration": ("llm_stream_duration_seconds", LATENCY_BUCKETS),
+    "reasoning_time": ("llm_reasoning_seconds", LATENCY_BUCKETS),
+    "tokens_per_second": ("llm_tokens_per_second", THROUGHPUT_BUCKETS),
+}
+
+class MetricsRegistry:
+    """Ring buffer of recent stream metrics plus per-provider histograms.
+
+    The newest ``capacity`` records are kept for exact recent percentiles;
+    histograms and counters cover the whole process lifetime and are what
+    ``to_prometheus`` exports. With ``otel=True`` (and opentelemetry
+    installed) each record is also emitted as a span.
+    """
+
+    def __init__(self, capacity: int = 1000, otel: bool = False):
+        self.capacity = capacity
+        self._records: Deque[StreamMetrics] = deque(maxlen=capacity)
+        self._histograms: Dict[Tuple[str, str], Histogram] = {}
+        self._counters: Dict[Tuple[str, str, str], float] = {}
+        self._lock = threading.Lock()
+        self._tracer = trace.get_tracer(__name__) if otel and trace is not None else None
+
+    def record(self, metrics: StreamMetrics) -> None:
+        with self._lock:
+            self._records.append(metrics)
+            provider = metrics.provider
+            for field, (name, buckets) in _HISTOGRAMS.items():
+                value = getattr(metrics, field)
+                if value is None:
+                    continue
+                histogram = self._histograms.get((name, provider))
+                if histogram is None:
+                    histogram = self._histograms[(name, provider)] = Histogram(buckets)
+                histogram.observe(value)
+            outcome = "cancelled" if metrics.cancelled else "hedge_lost" if metrics.hedge_lost else metrics.error or "ok"
+            self._count("llm_requests_total", provider, outcome, 1)
+            self._count("llm_input_tokens_total", provider, "", metrics.input_tokens)
+            self._count("llm_output_tokens_total", provider, "", metrics.output_tokens)
+            self._count("llm_cache_read_tokens_total", provider, "", metrics.cache_read_tokens)
+            self._count("llm_reasoning_tokens_total", provider, "", metrics.reasoning_tokens)
+            if metrics.cancelled:
+                self._count("llm_cancelled_tokens_saved_total", provider, "", metrics.tokens_saved)
+        if self._tracer is not None:
+            self._export_span(metrics)
+
+    def _count(self, name: str, provider: str, outcome: str, value: float) -> None:
+        key = (name, provider, outcome)
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def _export_span(self, metrics: StreamMetrics) -> None:
+        start_ns = int(metrics.started * 1e9)
+        span = self._tracer.start_span(
+            "llm.stream_chat",
+            start_time=start_ns,
+            attributes={
+                f"llm.{name}": value for name, value in metrics.as_dict().items()
+                if value is not None and name != "started"
+            }
+        )
+        if metrics.error:
+            span.set_status(trace.Status(trace.StatusCode.ERROR, metrics.error))
+        span.end(end_time=start_ns + int(metrics.duration * 1e9))
+
+    def recent(self, provider: Optional[str] = None) -> List[StreamMetrics]:
+        with self._lock:
+            return [m for m in self._records if provider is None or m.provider == provider]
+
+    def quantile(self, provider: str, field: str, q: float) -> Optional[float]:
+        """Exact quantile of ``field`` over the buffered records of a provider"""
+        return _quantile(_column(self.recent(provider), field), q)
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """One row per provider over the buffered records, for display"""
+        by_provider: Dict[str, List[StreamMetrics]] = {}
+        for m in self.recent():
+            by_provider.setdefault(m.provider, []).append(m)
+        rows = []
+        for provider, records in sorted(by_provider.items()):
+            rows.append({
+                "provider": provider,
+                "requests": len(records),
+                "errors": sum(1 for m in records if m.error),
+                "cancelled": sum(1 for m in records if m.cancelled),
+                "hedges_lost": sum(1 for m in records if m.hedge_lost),
+                "tokens_saved": sum(m.tokens_saved for m in records),
+                "reasoning_tokens": sum(m.reasoning_tokens for m in records),
+                "reasoning_p50": _quantile(_column(records, "reasoning_time"), 0.5),
+                "ttft_p50": _quantile(_column(records, "time_to_first_token"), 0.5),
+                "ttft_p95": _quantile(_column(records, "time_to_first_token"), 0.95),
+                "itl_p50": _quantile(_column(records, "inter_token_latency"), 0.5),
+                "tokens_per_s_p50": _quantile(_column(records, "tokens_per_second"), 0.5),
+                "duration_p95": _quantile(_column(records, "duration"), 0.95),
+            })
+        return rows
+
+    def to_prometheus(self) -> str:
+        """Counters and histograms in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name in sorted({key[0] for key in self._counters}):
+                lines.append(f"# TYPE {name} counter")
+                for (counter, provider, outcome), value in sorted(self._counters.items()):
+                    if counter != name:
+                        continue
+                    labels = f'provider="{_escape(provider)}"'
+                    if outcome:
+                        labels += f',outcome="{_escape(outcome)}"'
+                    lines.append(f"{name}{{{labels}}} {value:g}")
+            for name in sorted({key[0] for key in self._histograms}):
+                lines.append(f"# TYPE {name} histogram")
+                for (histogram_name, provider), histogram in sorted(self._histograms.items()):
+                    if histogram_name != name:
+                        continue
+                    label = f'provider="{_escape(provider)}"'
+                    for le, count in histogram.cumulative():
+                        lines.append(f'{name}_bucket{{{label},le="{le}"}} {count}')
+                    lines.append(f"{name}_sum{{{label}}} {histogram.sum:g}")
+                    lines.append(f"{name}_count{{{label}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+_default_registry: Optional[MetricsRegistry] = None
+
+def get_default_registry() -> MetricsRegistry:
+    """Process-wide registry used when an agent is instrumented without one"""
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = MetricsRegistry()
+    return _default_registry
+
+class InstrumentedAgent(AgentWrapper):
+    """Record a StreamMetrics entry for every ``stream_chat`` call.
+
+    Inter-token latency is the mean gap between consecutive deltas; tokens per
+    second is output tokens over the time after the first token. Output and
+    reasoning tokens come from the provider's Usage, or are estimated from the
+    text where it has none. Reasoning time runs from the first thinking delta
+    to the first answer delta.
+    A stream closed before its Done counts as cancelled, saving the tokens a
+    typical (median) complete answer of this provider would still have had,
+    unless its ``cancel`` token says a wrapper gave up on it: a timeout is
+    recorded as a TimeoutError, a lost hedge race as ``hedge_lost``.
+    """
+
+    def __init__(
+        self,
+        agent: BaseAgent,
+        registry: Optional[MetricsRegistry] = None,
+        provider: Optional[str] = None,
+        clock: Callable[[], float] = time.perf_counter
+    ):
+        super().__init__(agent)
+        self.registry = registry or get_default_registry()
+        self.provider = provider or type(agent).__name__
+        self._clock = clock
+
+    async def stream_chat(self, prompt: str, **kwargs) -> AsyncIterator[StreamEvent]:
+        clock = self._clock
+        started_wall = time.time()
+        started = clock()
+        first = last = None
+        gaps = 0.0
+        max_gap = 0.0
+        chunks = 0
+        text_chars = 0
+        thinking_chars = 0
+        first_thought = first_text = None
+        usage: Optional[Usage] = None
+        error: Optional[str] = None
+        finished = False
+        cancel = kwargs.get("cancel")
+        try:
+            async with aclosing(self.agent.stream_chat(prompt, **kwargs)) as events:
+                async for event in events:
+                    cls = event.__class__
+                    if cls is TextDelta or cls is ThinkingDelta:
+                        now = clock()
+                        if first is None:
+                            first = now
+                        else:
+                            gap = now - last
+                            gaps += gap
+                            if gap > max_gap:
+                                max_gap = gap
+                        last = now
+                        chunks += 1
+                        text_chars += len(event.text)
+                        if cls is ThinkingDelta:
+                            thinking_chars += len(event.text)
+                            if first_thought is None:
+                                first_thought = now
+                        elif first_text is None:
+                            first_text = now
+                    elif cls is Usage:
+                        usage = event
+                    elif cls is Done:
+                        finished = not event.cancelled
+                        if event.error is not None:
+                            error = type(event.error).__name__
+                    yield event
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            end = clock()
+            output_tokens = usage.output_tokens if usage else (text_chars + 3) // 4
+            reasoning_tokens = (thinking_chars + 3) // 4
+            if usage and usage.reasoning_tokens:
+                reasoning_tokens = usage.reasoning_tokens
+            reasoning_time = None
+            if first_thought is not None and first_text is not None:
+                reasoning_time = first_text - first_thought
+            generation = (last - first) if first is not None and last is not None else 0.0
+            reason = cancel.reason if cancel is not None else None
+            closed = not finished and error is None
+            if closed and reason == CANCEL_TIMEOUT:
+                error = "TimeoutError"
+            hedge_lost = closed and reason == CANCEL_HEDGE_LOST
+            cancelled = closed and not error and not hedge_lost
+            tokens_saved = 0
+            if cancelled:
+                typical = self.registry.quantile(self.provider, "output_tokens", 0.5)
+                tokens_saved = max(0, int(typical or 0) - output_tokens)
+            self.registry.record(StreamMetrics(
+                provider=self.provider,
+                model=self.model_name,
+                started=started_wall,
+                duration=end - started,
+                time_to_first_token=None if first is None else first - started,
+                inter_token_latency=gaps / (chunks - 1) if chunks > 1 else None,
+                max_inter_token_latency=max_gap if chunks > 1 else None,
+                tokens_per_second=output_tokens / generation if generation > 0 and not error else None,
+                chunks=chunks,
+                input_tokens=usage.input_tokens if usage else 0,
+                output_tokens=output_tokens,
+                cache_read_tokens=usage.cache_read_tokens if usage else 0,
+                reasoning_tokens=reasoning_tokens,
+                reasoning_time=reasoning_time,
+                error=error,
+                cancelled=cancelled,
+                tokens_saved=tokens_saved,
+                hedge_lost=hedge_lost
+            ))
@@ -0,0 +1,119 @@
+import asyncio
+import os
+import random
+from dataclasses import dataclass, fields
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from .base import BaseAgent, Done, ProviderError, StreamEvent, TextDelta, ThinkingDelta, Usage
+
+_WORDS = (
+    "the", "model", "stream", "token", "latency", "answer", "request", "provider",
+    "cache", "context", "budget", "window", "session", "prompt", "response", "agent"
+)
+
+@dataclass
+class MockProfile:
+    """Timing and failure behaviour of a simulated provider.
+
+    Tokens arrive ``tokens_per_second`` apart after ``time_to_first_token``,
+    each delay scaled by a random factor within ±``jitter``. ``error_rate``
+    and ``rate_limit_rate`` are the chances that a request fails with a 500
+    or a 429 (carrying ``retry_after``).
+    """
+    time_to_first_token: float = 0.3
+    tokens_per_second: float = 50.0
+    jitter: float = 0.2
+    answer_tokens: int = 200
+    thinking_tokens: int = 0
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after: float = 1.0
+    seed: Optional[int] = None
+
+    @classmethod
+    def from_environ(cls, prefix: str = "MOCK_") -> "MockProfile":
+        """Profile from MOCK_TIME_TO_FIRST_TOKEN, MOCK_TOKENS_PER_SECOND, ... where set"""
+        values: Dict[str, Any] = {}
+        for field in fields(cls):
+            value = os.environ.get(prefix + field.name.upper())
+            if value:
+                values[field.name] = int(value) if field.name in ("answer_tokens", "thinking_tokens", "seed") else float(value)
+        return cls(**values)
+
+class MockStream:
+    """Pacing and failure decisions for one simulated response"""
+
+    def __init__(self, profile: MockProfile, rng: random.Random):
+        self.profile = profile
+        self._rng = rng
+
+    def jittered(self, delay: float) -> float:
+        jitter = self.profile.jitter
+        return max(0.0, delay * (1 + self._rng.uniform(-jitter, jitter))) if jitter else delay
+
+    def failure(self) -> Optional[Tuple[int, str]]:
+        """``(status, message)`` if this request should fail, else None"""
+        roll = self._rng.random()
+        if roll < self.profile.rate_limit_rate:
+            return 429, "Rate limit exceeded (simulated)"
+        if roll < self.profile.rate_limit_rate + self.profile.error_rate:
+            return 500, "Internal server error (simulated)"
+        return None
+
+    def tokens(self) -> Iterator[Tuple[float, bool, str]]:
+        """``(delay before it, is thinking, text)`` for every token of the response"""
+        interval = 1.0 / self.profile.tokens_per_second if self.profile.tokens_per_second > 0 else 0.0
+        total = self.profile.thinking_tokens + self.profile.answer_tokens
+        for index in range(total):
+            delay = self.profile.time_to_first_token if index == 0 else interval
+            word = self._rng.choice(_WORDS)
+            yield self.jittered(delay), index < self.profile.thinking_tokens, word if index in (0, self.profile.thinking_tokens) else f" {word}"
+
+class MockAgent(BaseAgent):
+    """Offline agent producing a synthetic stream with a MockProfile's timing.
+
+    Useful for load tests and for running the UI without API keys; the
+    profile is read from MOCK_* environment variables unless one is given.
+    """
+    system_prompt = None
+    default_model = "mock-model"
+    context_window = 128000
+
+    def __init__(self, api_key: str = "mock", profile: Optional[MockProfile] = None, **kwargs):
+        self.profile = profile or MockProfile.from_environ()
+        super().__init__(api_key, **kwargs)
+
+    def _initialize(self) -> None:
+        self._rng = random.Random(self.profile.seed)
+
+    async def stream_chat(
+        self,
+        prompt: str,
+        history: Optional[List[Dict[str, Any]]] = None,
+        **kwargs
+    ) -> AsyncIterator[StreamEvent]:
+        try:
+            messages = self.context.build(history or [], prompt)
+            stream = MockStream(self.profile, self._rng)
+            failure = stream.failure()
+            if failure is not None:
+                await asyncio.sleep(stream.jittered(self.profile.time_to_first_token))
+                status, message = failure
+                raise ProviderError(status, message, str(self.profile.retry_after) if status == 429 else None)
+            output_tokens = 0
+            for delay, thinking, text in stream.tokens():
+                await asyncio.sleep(delay)
+                output_tokens += 1
+                yield ThinkingDelta(text) if thinking else TextDelta(text)
+            yield Usage(
+                sum(self.context.count(message) for message in messages),
+                output_tokens,
+                reasoning_tokens=min(output_tokens, self.profile.thinking_tokens)
+            )
+            yield Done()
+        except Exception as e:
+            for event in self._error_events(e):
+                yield event
+
+    @property
+    def model_name(self) -> str:
+        return self._model
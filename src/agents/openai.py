@@ -1,42 +1,86 @@
-from typing import AsyncIterator, Dict
+from typing import Any, AsyncIterator, Dict, List, Optional
 import openai
-from .base import BaseAgent
+from .base import BaseAgent, Done, StreamEvent, TextDelta, Usage
+from .catalog import ModelSpec
+from .context import TruncatePolicy, to_openai
+
+OPENAI_BASE_URL = "https://api.openai.com/v1"
+# Listed models that are not chat-completion models
+_NON_CHAT_MODELS = ("instruct", "audio", "realtime", "transcribe", "tts", "search", "image")
 
 class OpenAIAgent(BaseAgent):
-    def _initialize(self) -> None:
-        self.client = openai.AsyncOpenAI(api_key=self.api_key)
-        self._model = "gpt-4-turbo-preview"  # Default model
+    default_model = "gpt-4-turbo-preview"
+    context_window = 128000
+    base_url = OPENAI_BASE_URL
+    
+    def _configure_context(self) -> None:
+        # Start the history window on 8-turn steps where the budget allows, for the cached prefix
+        self.context.policy = TruncatePolicy(align=8)
         
-    async def stream_chat(self, prompt: str, **kwargs) -> AsyncIterator[Dict[str, str]]:
-        thinking = ""
-        response = ""
-        processing_thinking = True
+    def _initialize(self) -> None:
+        self.client = self.pool.get(
+            "openai", self.api_key, self.base_url,
+            lambda: openai.AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                http_client=self.pool.httpx_client(self.base_url, openai.DefaultAsyncHttpxClient),
+                # Retries and backoff are handled by ResilientAgent
+                max_retries=0
+            )
+        )
         
+    async def stream_chat(
+        self,
+        prompt: str,
+        history: Optional[List[Dict[str, Any]]] = None,
+        **kwargs
+    ) -> AsyncIterator[StreamEvent]:
+        stream = None
         try:
-            messages = [
-                {"role": "system", "content": "You are a helpful AI assistant."},
-                {"role": "user", "content": prompt}
-            ]
+            messages = to_openai(self.context.build(history or [], prompt, self.system_prompt), self.system_prompt)
             
+            request = dict(self.params)
+            # Usage arrives in a final chunk only when asked for
+            request["stream_options"] = {**(request.get("stream_options") or {}), "include_usage": True}
             stream = await self.client.chat.completions.create(
                 model=self._model,
                 messages=messages,
-                stream=True
+                stream=True,
+                **request
             )
             
+            # Reasoning models think before answering, but only report how many tokens that took
             async for chunk in stream:
-                if chunk.choices[0].delta.content:
-                    response += chunk.choices[0].delta.content
-                    yield {
-                        "thinking": "",
-                        "response": response
-                    }
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield TextDelta(chunk.choices[0].delta.content)
+                if chunk.usage:
+                    # Prefix caching is automatic; cached tokens are reported in the usage
+                    details = getattr(chunk.usage, "prompt_tokens_details", None)
+                    output_details = getattr(chunk.usage, "completion_tokens_details", None)
+                    yield Usage(
+                        chunk.usage.prompt_tokens,
+                        chunk.usage.completion_tokens,
+                        cache_read_tokens=getattr(details, "cached_tokens", None) or 0,
+                        reasoning_tokens=getattr(output_details, "reasoning_tokens", None) or 0
+                    )
+            yield Done()
                     
         except Exception as e:
-            yield {
-                "thinking": f"Error in thinking process: {str(e)}",
-                "response": f"Error generating response: {str(e)}"
-            }
+            for event in self._error_events(e):
+                yield event
+        finally:
+            # Release the HTTP response now on cancellation or aclose(), not at garbage collection
+            if stream is not None:
+                await stream.close()
+    
+    async def list_models(self) -> List[ModelSpec]:
+        # The listing has ids only; limits and prices come from the built-in catalog
+        return [
+            ModelSpec(model.id)
+            async for model in self.client.models.list()
+            if model.id.startswith(("gpt-", "chatgpt-", "o1", "o3"))
+            and not any(word in model.id for word in _NON_CHAT_MODELS)
+        ]
     
     @property
     def model_name(self) -> str:
@@ -1,49 +1,108 @@
-from typing import AsyncIterator, Dict
+from typing import Any, AsyncIterator, Dict, List, Optional
 import openai  # OpenRouter uses OpenAI's client library
-from .base import BaseAgent
+from .base import BaseAgent, Done, StreamEvent, TextDelta, ThinkingDelta, Usage
+from .catalog import ModelSpec
+from .context import TruncatePolicy, to_openai
+
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+
+def _per_million(price: Optional[str]) -> Optional[float]:
+    # OpenRouter prices are USD per token, as strings; negative means "varies"
+    if price is None or float(price) < 0:
+        return None
+    return float(price) * 1_000_000
 
 class OpenRouterAgent(BaseAgent):
+    default_model = "mistralai/mistral-nemo"
+    context_window = 128000
+    base_url = OPENROUTER_BASE_URL
+    
+    def _configure_context(self) -> None:
+        # Start the history window on 8-turn steps where the budget allows, for the cached prefix
+        self.context.policy = TruncatePolicy(align=8)
+        
     def _initialize(self) -> None:
-        self.client = openai.AsyncOpenAI(
-            api_key=self.api_key,
-            base_url="https://openrouter.ai/api/v1",
-            default_headers={
-                "HTTP-Referer": "https://github.com/your-username/llm-streamlit-modular",
-                "X-Title": "LLM Streamlit Modular"
-            }
+        self.client = self.pool.get(
+            "openrouter", self.api_key, self.base_url,
+            lambda: openai.AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                default_headers={
+                    "HTTP-Referer": "https://github.com/your-username/llm-streamlit-modular",
+                    "X-Title": "LLM Streamlit Modular"
+                },
+                http_client=self.pool.httpx_client(self.base_url, openai.DefaultAsyncHttpxClient),
+                # Retries and backoff are handled by ResilientAgent
+                max_retries=0
+            )
         )
-        self._model = "mistralai/mistral-nemo"  # Default model
-        
-    async def stream_chat(self, prompt: str, **kwargs) -> AsyncIterator[Dict[str, str]]:
-        thinking = ""
-        response = ""
-        processing_thinking = True
         
+    async def stream_chat(
+        self,
+        prompt: str,
+        history: Optional[List[Dict[str, Any]]] = None,
+        **kwargs
+    ) -> AsyncIterator[StreamEvent]:
+        stream = None
         try:
-            messages = [
-                {"role": "system", "content": "You are a helpful AI assistant."},
-                {"role": "user", "content": prompt}
-            ]
+            messages = to_openai(self.context.build(history or [], prompt, self.system_prompt), self.system_prompt)
             
+            request = dict(self.params)
+            request["stream_options"] = {**(request.get("stream_options") or {}), "include_usage": True}
+            if self.reasoning:
+                # Stream the reasoning of models that think before answering
+                request["extra_body"] = {**(request.get("extra_body") or {}), "include_reasoning": True}
             stream = await self.client.chat.completions.create(
                 model=self._model,
                 messages=messages,
-                stream=True
+                stream=True,
+                **request
             )
             
             async for chunk in stream:
-                if chunk.choices[0].delta.content:
-                    response += chunk.choices[0].delta.content
-                    yield {
-                        "thinking": "",
-                        "response": response
-                    }
+                if chunk.choices:
+                    delta = chunk.choices[0].delta
+                    # OpenRouter's addition to the OpenAI delta
+                    reasoning = getattr(delta, "reasoning", None)
+                    if reasoning:
+                        yield ThinkingDelta(reasoning)
+                    if delta.content:
+                        yield TextDelta(delta.content)
+                if chunk.usage:
+                    # Prefix caching is automatic; cached tokens are reported in the usage
+                    details = getattr(chunk.usage, "prompt_tokens_details", None)
+                    output_details = getattr(chunk.usage, "completion_tokens_details", None)
+                    yield Usage(
+                        chunk.usage.prompt_tokens,
+                        chunk.usage.completion_tokens,
+                        cache_read_tokens=getattr(details, "cached_tokens", None) or 0,
+                        reasoning_tokens=getattr(output_details, "reasoning_tokens", None) or 0
+                    )
+            yield Done()
                     
         except Exception as e:
-            yield {
-                "thinking": f"Error in thinking process: {str(e)}",
-                "response": f"Error generating response: {str(e)}"
-            }
+            for event in self._error_events(e):
+                yield event
+        finally:
+            # Release the HTTP response now on cancellation or aclose(), not at garbage collection
+            if stream is not None:
+                await stream.close()
+    
+    async def list_models(self) -> List[ModelSpec]:
+        specs = []
+        async for model in self.client.models.list():
+            # OpenRouter adds context_length, pricing and top_provider to the OpenAI fields
+            pricing = getattr(model, "pricing", None) or {}
+            top_provider = getattr(model, "top_provider", None) or {}
+            specs.append(ModelSpec(
+                model.id,
+                context_window=getattr(model, "context_length", None),
+                max_output=top_provider.get("max_completion_tokens"),
+                input_price=_per_million(pricing.get("prompt")),
+                output_price=_per_million(pricing.get("completion")),
+                reasoning="include_reasoning" in (getattr(model, "supported_parameters", None) or ())
+            ))
+        return specs
     
     @property
     def model_name(self) -> str:
@@ -0,0 +1,184 @@
+import hashlib
+import importlib
+import importlib.util
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+@dataclass
+class PoolConfig:
+    max_connections: int = 100
+    max_connections_per_host: int = 20
+    keepalive_expiry: float = 60.0
+    http2: bool = True
+    connect_timeout: float = 10.0
+
+class _ConnectionCounter:
+    """Requests sent vs. connections opened for one host"""
+
+    def __init__(self):
+        self.requests = 0
+        self.connections_opened = 0
+
+    @property
+    def connections_reused(self) -> int:
+        return max(0, self.requests - self.connections_opened)
+
+    async def httpx_trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            self.connections_opened += 1
+        elif event_name.endswith(".send_request_headers.started"):
+            self.requests += 1
+
+    async def on_request_start(self, session, ctx, params) -> None:
+        self.requests += 1
+
+    async def on_connection_create_end(self, session, ctx, params) -> None:
+        self.connections_opened += 1
+
+def _origin(base_url: str) -> str:
+    parts = urlsplit(base_url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+def _httpx_package(client_class: Optional[type]) -> str:
+    # The package of the AsyncClient an SDK's default client derives from:
+    # newer SDKs are built on the httpx2 fork and reject plain httpx clients
+    for base in (client_class.__mro__ if client_class is not None else ()):
+        if base.__name__ == "AsyncClient":
+            return base.__module__.split(".")[0]
+    return "httpx"
+
+class ClientPool:
+    """Registry of SDK clients and HTTP connection pools shared by all agents.
+
+    SDK clients are keyed by (provider, base URL, API key); the underlying
+    HTTP clients are shared per origin so connections are kept alive and
+    reused across agents, sessions and Streamlit reruns.
+    """
+
+    def __init__(self, config: Optional[PoolConfig] = None):
+        self.config = config or PoolConfig()
+        self._clients: Dict[Tuple[str, str, str], Any] = {}
+        self._http_clients: Dict[Tuple[str, str], Any] = {}
+        self._sessions: Dict[str, Any] = {}
+        self._counters: Dict[str, _ConnectionCounter] = {}
+        self._lookups: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, provider: str, api_key: str, base_url: str, factory: Callable[[], Any]) -> Any:
+        """Return the pooled client for this provider/base URL/key, creating it once.
+
+        ``factory`` runs outside the lock, since factories ask the pool for
+        their HTTP client; if two threads race, the first client stored wins.
+        """
+        key_hash = hashlib.sha256(api_key.encode()).hexdigest()[:16]
+        key = (provider, base_url, key_hash)
+        with self._lock:
+            lookups = self._lookups.setdefault(provider, {"hits": 0, "misses": 0})
+            client = self._clients.get(key)
+            if client is not None:
+                lookups["hits"] += 1
+                return client
+            lookups["misses"] += 1
+        client = factory()
+        with self._lock:
+            return self._clients.setdefault(key, client)
+
+    def _counter(self, origin: str) -> _ConnectionCounter:
+        return self._counters.setdefault(origin, _ConnectionCounter())
+
+    def httpx_client(self, base_url: str, client_class: Optional[type] = None):
+        """Shared ``httpx.AsyncClient`` for the origin of ``base_url``.
+
+        ``client_class`` is the SDK's default client (``DefaultAsyncHttpxClient``);
+        the pooled client comes from the same httpx package it is built on.
+        """
+        package = _httpx_package(client_class)
+        httpx = importlib.import_module(package)
+
+        origin = _origin(base_url)
+        with self._lock:
+            client = self._http_clients.get((origin, package))
+            if client is None:
+                counter = self._counter(origin)
+
+                async def attach_trace(request):
+                    request.extensions["trace"] = counter.httpx_trace
+
+                client = httpx.AsyncClient(
+                    http2=self.config.http2 and importlib.util.find_spec("h2") is not None,
+                    limits=httpx.Limits(
+                        max_connections=self.config.max_connections,
+                        max_keepalive_connections=self.config.max_connections_per_host,
+                        keepalive_expiry=self.config.keepalive_expiry
+                    ),
+                    timeout=httpx.Timeout(600.0, connect=self.config.connect_timeout),
+                    event_hooks={"request": [attach_trace]}
+                )
+                self._http_clients[(origin, package)] = client
+            return client
+
+    def aiohttp_session(self, base_url: str):
+        """Shared ``aiohttp.ClientSession`` for the origin of ``base_url``.
+
+        Must be called from the loop the session will be used on.
+        """
+        import aiohttp
+
+        origin = _origin(base_url)
+        with self._lock:
+            session = self._sessions.get(origin)
+            if session is None or session.closed:
+                counter = self._counter(origin)
+                trace = aiohttp.TraceConfig()
+                trace.on_request_start.append(counter.on_request_start)
+                trace.on_connection_create_end.append(counter.on_connection_create_end)
+                session = aiohttp.ClientSession(
+                    connector=aiohttp.TCPConnector(
+                        limit=self.config.max_connections,
+                        limit_per_host=self.config.max_connections_per_host,
+                        keepalive_timeout=self.config.keepalive_expiry
+                    ),
+                    timeout=aiohttp.ClientTimeout(total=None, sock_connect=self.config.connect_timeout),
+                    trace_configs=[trace]
+                )
+                self._sessions[origin] = session
+            return session
+
+    def stats(self) -> Dict[str, Dict[str, Dict[str, int]]]:
+        """Client lookups per provider and connection reuse per host"""
+        with self._lock:
+            return {
+                "clients": {provider: dict(lookups) for provider, lookups in self._lookups.items()},
+                "connections": {
+                    origin: {
+                        "requests": counter.requests,
+                        "opened": counter.connections_opened,
+                        "reused": counter.connections_reused
+                    }
+                    for origin, counter in self._counters.items()
+                }
+            }
+
+    async def aclose(self) -> None:
+        """Close every pooled connection"""
+        with self._lock:
+            http_clients = list(self._http_clients.values())
+            sessions = list(self._sessions.values())
+            self._clients.clear()
+            self._http_clients.clear()
+            self._sessions.clear()
+        for client in http_clients:
+            await client.aclose()
+        for session in sessions:
+            await session.close()
+
+_default_pool: Optional[ClientPool] = None
+
+def get_default_pool() -> ClientPool:
+    """Process-wide pool used when an agent is created without one"""
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = ClientPool()
+    return _default_pool
@@ -0,0 +1,405 @@
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import aclosing, contextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+from .base import AgentWrapper, BaseAgent, Queued, StreamEvent, Usage
+from .context import estimate_tokens
+
+# Longest a queued request sleeps before re-checking (slots freed by other processes)
+POLL_INTERVAL = 0.5
+
+@dataclass
+class RateLimits:
+    """Limits for one provider/API key; None leaves that dimension unlimited"""
+    requests_per_minute: Optional[float] = None
+    tokens_per_minute: Optional[float] = None
+    max_concurrent: Optional[int] = None
+
+class TokenBucket:
+    """Bucket holding up to one minute of budget, refilled continuously"""
+    __slots__ = ("capacity", "rate", "level", "updated")
+
+    def __init__(self, per_minute: float, now: float, level: Optional[float] = None):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = per_minute if level is None else level
+        self.updated = now
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` is available (requests above capacity wait for a full bucket)"""
+        self.refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        # Negative amounts refund an over-estimate; the level may go below zero
+        self.level = min(self.capacity, self.level - min(amount, self.capacity))
+
+class LocalLimitStore:
+    """Bucket and concurrency state shared by the sessions of this process"""
+    # Calls are quick and in memory, fine to make on the event loop
+    blocking = False
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._active: Dict[str, int] = {}
+
+    def _bucket(self, key: str, kind: str, per_minute: float) -> TokenBucket:
+        bucket = self._buckets.get((key, kind))
+        if bucket is None or bucket.capacity != per_minute:
+            bucket = self._buckets[(key, kind)] = TokenBucket(per_minute, self._clock())
+        return bucket
+
+    def try_acquire(self, key: str, limits: RateLimits, tokens: int) -> Tuple[float, Optional[int]]:
+        """``(0, lease)`` when a slot was taken, else ``(seconds to wait, None)``"""
+        if limits.max_concurrent is not None and self._active.get(key, 0) >= limits.max_concurrent:
+            return float("inf"), None
+        now = self._clock()
+        wait = 0.0
+        if limits.requests_per_minute:
+            wait = max(wait, self._bucket(key, "requests", limits.requests_per_minute).wait_time(1, now))
+        if limits.tokens_per_minute:
+            wait = max(wait, self._bucket(key, "tokens", limits.tokens_per_minute).wait_time(tokens, now))
+        if wait > 0:
+            return wait, None
+        if limits.requests_per_minute:
+            self._bucket(key, "requests", limits.requests_per_minute).take(1)
+        if limits.tokens_per_minute:
+            self._bucket(key, "tokens", limits.tokens_per_minute).take(tokens)
+        self._active[key] = self._active.get(key, 0) + 1
+        return 0.0, None
+
+    def charge(self, key: str, limits: RateLimits, tokens: int) -> None:
+        if limits.tokens_per_minute:
+            bucket = self._bucket(key, "tokens", limits.tokens_per_minute)
+            bucket.refill(self._clock())
+            bucket.take(tokens)
+
+    def release(self, key: str, lease: Optional[int]) -> None:
+        self._active[key] = max(0, self._active.get(key, 0) - 1)
+
+class SQLiteLimitStore:
+    """Bucket and concurrency state shared by every process using the same file.
+
+    Each acquire runs in an immediate (write-locking) transaction, so the
+    database doubles as the cross-process lock. Concurrency slots are leases
+    that expire after ``lease_ttl`` seconds in case a process dies mid-stream.
+    Calls may wait up to ``timeout`` seconds for another process's lock.
+    """
+    # Calls may wait on the file lock, so RateLimiter makes them off the event loop
+    blocking = True
+
+    def __init__(self, path: str, lease_ttl: float = 600.0, timeout: float = 30.0):
+        self.lease_ttl = lease_ttl
+        self._db = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "key TEXT, kind TEXT, level REAL, updated REAL, PRIMARY KEY (key, kind))"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS leases (id INTEGER PRIMARY KEY, key TEXT, expires REAL)")
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _transaction(self):
+        # Caller holds the lock. A failed BEGIN raises as is; a failed body is rolled back
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    def _load(self, key: str, kind: str, per_minute: float, now: float) -> TokenBucket:
+        row = self._db.execute(
+            "SELECT level, updated FROM buckets WHERE key = ? AND kind = ?", (key, kind)
+        ).fetchone()
+        if row is None:
+            return TokenBucket(per_minute, now)
+        return TokenBucket(per_minute, row[1], min(per_minute, row[0]))
+
+    def _save(self, key: str, kind: str, bucket: TokenBucket) -> None:
+        self._db.execute(
+            "INSERT OR REPLACE INTO buckets VALUES (?, ?, ?, ?)", (key, kind, bucket.level, bucket.updated)
+        )
+
+    def try_acquire(self, key: str, limits: RateLimits, tokens: int) -> Tuple[float, Optional[int]]:
+        now = time.time()
+        with self._lock, self._transaction():
+            self._db.execute("DELETE FROM leases WHERE expires < ?", (now,))
+            if limits.max_concurrent is not None:
+                active = self._db.execute("SELECT COUNT(*) FROM leases WHERE key = ?", (key,)).fetchone()[0]
+                if active >= limits.max_concurrent:
+                    return float("inf"), None
+            buckets = []
+            if limits.requests_per_minute:
+                buckets.append(("requests", self._load(key, "requests", limits.requests_per_minute, now), 1))
+            if limits.tokens_per_minute:
+                buckets.append(("tokens", self._load(key, "tokens", limits.tokens_per_minute, now), tokens))
+            wait = max([bucket.wait_time(amount, now) for _, bucket, amount in buckets], default=0.0)
+            if wait > 0:
+                return wait, None
+            for kind, bucket, amount in buckets:
+                bucket.take(amount)
+                self._save(key, kind, bucket)
+            cursor = self._db.execute(
+                "INSERT INTO leases (key, expires) VALUES (?, ?)", (key, now + self.lease_ttl)
+            )
+            return 0.0, cursor.lastrowid
+
+    def charge(self, key: str, limits: RateLimits, tokens: int) -> None:
+        if not limits.tokens_per_minute:
+            return
+        now = time.time()
+        with self._lock, self._transaction():
+            bucket = self._load(key, "tokens", limits.tokens_per_minute, now)
+            bucket.refill(now)
+            bucket.take(tokens)
+            self._save(key, "tokens", bucket)
+
+    def release(self, key: str, lease: Optional[int]) -> None:
+        if lease is None:
+            return
+        with self._lock:
+            self._db.execute("DELETE FROM leases WHERE id = ?", (lease,))
+
+class Ticket:
+    """A request's place in a RateLimiter queue"""
+    __slots__ = ("session", "tokens", "granted", "lease", "_loop", "_event")
+
+    def __init__(self, session: str, tokens: int):
+        self.session = session
+        self.tokens = tokens
+        self.granted = False
+        self.lease: Optional[int] = None
+        self._loop = asyncio.get_running_loop()
+        self._event = asyncio.Event()
+
+    def _notify(self) -> None:
+        # Grants can happen on another session's thread or loop
+        self._loop.call_soon_threadsafe(self._event.set)
+
+    async def wait(self, timeout: float) -> None:
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._event.clear()
+
+class RateLimiter:
+    """Token buckets and a concurrency cap for one provider/API key.
+
+    Waiting requests are queued per session and served round-robin, so one
+    session sending many requests cannot starve the others. The ``a*``
+    methods are for the event loop: with a blocking store they run in a
+    worker thread.
+    """
+
+    def __init__(self, key: str, limits: RateLimits, store: Any):
+        self.key = key
+        self.limits = limits
+        self.store = store
+        self.granted = 0
+        self.queued = 0
+        self._queues: "OrderedDict[str, Deque[Ticket]]" = OrderedDict()
+        # Guards the queues, only ever briefly
+        self._lock = threading.Lock()
+        # Serializes this limiter's store calls, which may wait on disk
+        self._store_lock = threading.Lock()
+
+    def enqueue(self, session: str, tokens: int) -> Ticket:
+        ticket = Ticket(session, tokens)
+        with self._lock:
+            self._queues.setdefault(session, deque()).append(ticket)
+        return ticket
+
+    def dispatch(self) -> float:
+        """Grant slots in fair order; returns how long until the next one may free up"""
+        with self._store_lock:
+            while True:
+                with self._lock:
+                    if not self._queues:
+                        return 0.0
+                    session, queue = next(iter(self._queues.items()))
+                    ticket = queue[0]
+                wait, lease = self.store.try_acquire(self.key, self.limits, ticket.tokens)
+                if wait > 0:
+                    return wait
+                with self._lock:
+                    if not (queue and queue[0] is ticket and self._queues.get(session) is queue):
+                        # Cancelled while the slot was taken: hand it back
+                        ticket = None
+                    else:
+                        queue.popleft()
+                        # Served sessions go to the back of the rotation
+                        del self._queues[session]
+                        if queue:
+                            self._queues[session] = queue
+                        ticket.granted = True
+                        ticket.lease = lease
+                        self.granted += 1
+                if ticket is None:
+                    self.store.release(self.key, lease)
+                else:
+                    ticket._notify()
+
+    async def _offload(self, method: Callable[..., Any], *args) -> Any:
+        if not self.store.blocking:
+            return method(*args)
+        # Shielded: a cancelled caller must not cancel a release before it ran
+        return await asyncio.shield(asyncio.to_thread(method, *args))
+
+    async def adispatch(self) -> float:
+        return await self._offload(self.dispatch)
+
+    def position(self, ticket: Ticket) -> int:
+        """1-based place in the order the queue will be served"""
+        with self._lock:
+            queues = [list(queue) for queue in self._queues.values()]
+        order: List[Ticket] = []
+        depth = 0
+        while True:
+            layer = [queue[depth] for queue in queues if depth < len(queue)]
+            if not layer:
+                return 0
+            for queued in layer:
+                order.append(queued)
+                if queued is ticket:
+                    return len(order)
+            depth += 1
+
+    def count_queued(self) -> None:
+        """Count a request that had to wait for its slot"""
+        with self._lock:
+            self.queued += 1
+
+    def cancel(self, ticket: Ticket) -> bool:
+        """Leave the queue; False if the ticket was granted (its slot must be released)"""
+        with self._lock:
+            queue = self._queues.get(ticket.session)
+            if queue is None or ticket not in queue:
+                return False
+            queue.remove(ticket)
+            if not queue:
+                del self._queues[ticket.session]
+            return True
+
+    def release(self, ticket: Ticket) -> None:
+        with self._store_lock:
+            self.store.release(self.key, ticket.lease)
+        self.dispatch()
+
+    async def arelease(self, ticket: Ticket) -> None:
+        await self._offload(self.release, ticket)
+
+    def charge(self, tokens: int) -> None:
+        """Correct the token budget once the real usage is known"""
+        with self._store_lock:
+            self.store.charge(self.key, self.limits, tokens)
+
+    async def acharge(self, tokens: int) -> None:
+        await self._offload(self.charge, tokens)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "granted": self.granted,
+                "queued": self.queued,
+                "waiting": sum(len(queue) for queue in self._queues.values()),
+            }
+
+class RateScheduler:
+    """Process-wide RateLimiters keyed by provider and API key"""
+
+    def __init__(self, store: Any = None):
+        self.store = store or LocalLimitStore()
+        self._limiters: Dict[str, RateLimiter] = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, provider: str, api_key: str, limits: RateLimits) -> RateLimiter:
+        key = f"{provider}:{hashlib.sha256(api_key.encode()).hexdigest()[:16]}"
+        with self._lock:
+            limiter = self._limiters.get(key)
+            if limiter is None:
+                limiter = self._limiters[key] = RateLimiter(key, limits, self.store)
+            limiter.limits = limits
+            return limiter
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            limiters = list(self._limiters.items())
+        return {key.split(":")[0]: limiter.stats() for key, limiter in limiters}
+
+_default_scheduler: Optional[RateScheduler] = None
+
+def get_default_scheduler() -> RateScheduler:
+    global _default_scheduler
+    if _default_scheduler is None:
+        _default_scheduler = RateScheduler()
+    return _default_scheduler
+
+class RateLimitedAgent(AgentWrapper):
+    """Wait for a rate-limit slot before each stream.
+
+    The token cost is estimated up front (prompt, history within the context
+    budget and ``max_tokens``, else the model's output limit) and corrected
+    from the provider's Usage. While
+    waiting, ``Queued(position)`` events report the place in the queue, and a
+    final ``Queued(0)`` marks the request being let through.
+    """
+
+    def __init__(self, agent: BaseAgent, limiter: RateLimiter, session: Optional[str] = None):
+        super().__init__(agent)
+        self.limiter = limiter
+        self.session = session or uuid.uuid4().hex
+
+    def estimate_tokens(self, prompt: str, history: List[Dict[str, Any]]) -> int:
+        context = self.context
+        history_tokens = sum(context.count(message) for message in history)
+        return (
+            estimate_tokens(prompt)
+            + min(history_tokens, context.budget)
+            + self.params.get("max_tokens", self.max_output)
+        )
+
+    async def stream_chat(self, prompt: str, session: Optional[str] = None, **kwargs) -> AsyncIterator[StreamEvent]:
+        limiter = self.limiter
+        estimate = self.estimate_tokens(prompt, kwargs.get("history") or [])
+        # Shared agents (API server, batch runner) name the session per call
+        ticket = limiter.enqueue(session or self.session, estimate)
+        try:
+            last_position = None
+            while True:
+                wait = await limiter.adispatch()
+                if ticket.granted:
+                    break
+                position = limiter.position(ticket)
+                if position and position != last_position:
+                    if last_position is None:
+                        limiter.count_queued()
+                    yield Queued(position)
+                    last_position = position
+                await ticket.wait(min(wait, POLL_INTERVAL) if wait > 0 else POLL_INTERVAL)
+            if last_position is not None:
+                yield Queued(0)
+
+            async with aclosing(self.agent.stream_chat(prompt, **kwargs)) as events:
+                async for event in events:
+                    if event.__class__ is Usage:
+                        await limiter.acharge(event.input_tokens + event.output_tokens - estimate)
+                    yield event
+        finally:
+            if not limiter.cancel(ticket):
+                # Granted, possibly by another session's dispatch just now
+                await limiter.arelease(ticket)
@@ -0,0 +1,109 @@
+import importlib
+import logging
+from dataclasses import dataclass, field
+from importlib.metadata import entry_points
+from typing import Any, Dict, List, Optional, Type, Union
+from .base import BaseAgent
+
+logger = logging.getLogger(__name__)
+
+# setup.py entry point group for add-on agents
+ENTRY_POINT_GROUP = "llm_streamlit_modular.models"
+
+@dataclass
+class ModelConfig:
+    name: str
+    provider: str
+    api_key_name: str
+    description: str
+    # Agent class, or its "package.module:ClassName" path so the provider SDK
+    # is only imported when the agent is first created
+    agent: Union[str, Type[BaseAgent]]
+    # Unused: reasoning is streamed from any model that produces it and
+    # ModelSpec.reasoning marks the models that do. Kept for add-on configs
+    supports_thinking: bool = False
+    # Provider model id; None uses the agent's default_model. Limits and
+    # prices come from the model catalog (src.agents.catalog)
+    model_id: Optional[str] = None
+    # Generation parameters sent with every request (temperature, max_tokens, ...)
+    params: Dict[str, Any] = field(default_factory=dict)
+    # Tokens of earlier turns sent with each prompt; None uses the agent default
+    history_budget: Optional[int] = None
+    _agent_class: Optional[Type[BaseAgent]] = field(default=None, init=False, repr=False, compare=False)
+
+    @property
+    def agent_class(self) -> Type[BaseAgent]:
+        """The agent class, imported on first use"""
+        if self._agent_class is None:
+            if isinstance(self.agent, str):
+                module_name, _, class_name = self.agent.partition(":")
+                self._agent_class = getattr(importlib.import_module(module_name), class_name)
+            else:
+                self._agent_class = self.agent
+        return self._agent_class
+
+BUILTIN_MODELS: List[ModelConfig] = [
+    ModelConfig(
+        name="GPT-4 Turbo",
+        provider="OpenAI",
+        api_key_name="OPENAI_API_KEY",
+        description="Latest GPT-4 model with improved performance",
+        agent="src.agents.openai:OpenAIAgent"
+    ),
+    ModelConfig(
+        name="Claude 3 Opus",
+        provider="Anthropic",
+        api_key_name="ANTHROPIC_API_KEY",
+        description="Most capable Claude model for complex tasks",
+        agent="src.agents.anthropic:AnthropicAgent",
+        params={"max_tokens": 4096}
+    ),
+    ModelConfig(
+        name="Gemini Pro",
+        provider="Google",
+        api_key_name="GOOGLE_API_KEY",
+        description="Google's latest language model with thinking process",
+        agent="src.agents.gemini:GeminiAgent"
+    ),
+    ModelConfig(
+        name="Mixtral-8x7B",
+        provider="Together AI",
+        api_key_name="TOGETHER_API_KEY",
+        description="Open source large language model by Meta",
+        agent="src.agents.together:TogetherAgent",
+        params={"temperature": 0.7, "max_tokens": 1024}
+    ),
+    ModelConfig(
+        name="OpenRouter Hub",
+        provider="OpenRouter",
+        api_key_name="OPENROUTER_API_KEY",
+        description="Access to multiple LLM providers through a single API",
+        agent="src.agents.openrouter:OpenRouterAgent"
+    ),
+    ModelConfig(
+        name="Mock",
+        provider="Mock",
+        api_key_name="MOCK_API_KEY",
+        description="Offline simulated model for load tests and demos (timing set by MOCK_* settings)",
+        agent="src.agents.mock:MockAgent"
+    )
+]
+
+def discover_plugin_models() -> List[ModelConfig]:
+    """Models registered by installed add-ons.
+
+    Each entry point in ``ENTRY_POINT_GROUP`` names a ``ModelConfig`` (or a
+    list of them). Keep that module light and give ``agent`` as a dotted path
+    so loading the entry point does not import the provider SDK.
+    """
+    models = []
+    for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+        try:
+            loaded = entry_point.load()
+        except Exception as e:
+            logger.warning("Error loading agent plugin %s: %s", entry_point.name, e)
+            continue
+        models.extend(loaded if isinstance(loaded, (list, tuple)) else [loaded])
+    return models
+
+AVAILABLE_MODELS: List[ModelConfig] = BUILTIN_MODELS + discover_plugin_models()
@@ -0,0 +1,332 @@
+import asyncio
+import logging
+import random
+import time
+from contextlib import aclosing
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+from .base import (
+    CANCEL_HEDGE_LOST, CANCEL_TIMEOUT, AgentWrapper, BaseAgent, CancellationToken, Done, Queued, StreamBuffer,
+    StreamEvent, TextDelta, ThinkingDelta, cancellable
+)
+from .catalog import ModelSpec
+from .metrics import MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+# Sent to the next attempt when a stream broke after part of the answer was shown
+RESUME_PROMPT = "Continue your previous answer exactly where it stopped. Do not repeat anything."
+
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504, 529}
+# SDK exceptions that carry no status code but are transient
+_TRANSIENT_ERRORS = {
+    "APIConnectionError", "APITimeoutError", "ServerDisconnectedError",
+    "ServiceUnavailable", "ResourceExhausted", "DeadlineExceeded", "InternalServerError"
+}
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 3
+    base_delay: float = 0.5
+    # A Retry-After longer than this fails over instead of waiting
+    max_delay: float = 20.0
+    first_token_timeout: float = 30.0
+    # Longest silence allowed between events once the answer is streaming
+    idle_timeout: float = 60.0
+    # Hedge deadline: p95 time to first token of the primary, once enough samples exist
+    hedge_quantile: float = 0.95
+    hedge_min_samples: int = 20
+    hedge_default_delay: float = 8.0
+
+def error_status(error: Exception) -> Optional[int]:
+    """HTTP status of a provider error, whatever SDK raised it"""
+    for name in ("status_code", "status", "code"):
+        status = getattr(error, name, None)
+        if isinstance(status, int):
+            return status
+    return None
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Delay requested by the provider through Retry-After, in seconds"""
+    value = getattr(error, "retry_after", None)
+    if value is None:
+        headers = getattr(getattr(error, "response", None), "headers", None)
+        if headers is not None:
+            milliseconds = headers.get("retry-after-ms")
+            if milliseconds:
+                try:
+                    return float(milliseconds) / 1000
+                except ValueError:
+                    pass
+            value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    status = error_status(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    return type(error).__name__ in _TRANSIENT_ERRORS
+
+_END = object()
+
+class _Attempt:
+    """One provider stream, pumped by its own task so it can be raced and cancelled"""
+
+    def __init__(self, index: int, agent: BaseAgent, prompt: str, kwargs: Dict[str, Any]):
+        self.index = index
+        self.agent = agent
+        self._queue: asyncio.Queue = asyncio.Queue()
+        # Waiting in a rate-limit queue is not the provider being slow
+        self.queued = False
+        # Tells the agents below why the attempt was given up, for their metrics
+        self._cancel = CancellationToken()
+        self._task = asyncio.ensure_future(self._pump(agent.stream_chat(prompt, cancel=self._cancel, **kwargs)))
+
+    async def _pump(self, stream: AsyncIterator[StreamEvent]) -> None:
+        try:
+            async with aclosing(stream):
+                async for event in stream:
+                    self._queue.put_nowait(event)
+        except Exception as e:
+            self._queue.put_nowait(e)
+        self._queue.put_nowait(_END)
+
+    async def next(self, timeout: Optional[float]) -> StreamEvent:
+        """Next event; failures, including Done(error), are raised"""
+        item = await asyncio.wait_for(self._queue.get(), None if self.queued else timeout)
+        if item is _END:
+            return Done()
+        if isinstance(item, Exception):
+            raise item
+        if item.__class__ is Done and item.error is not None:
+            raise item.error
+        if item.__class__ is Queued:
+            self.queued = item.position > 0
+        return item
+
+    async def cancel(self, reason: Optional[str] = None) -> None:
+        """Stop the stream; ``reason`` is a CANCEL_* value when this wrapper gives up on it"""
+        if reason is not None and not self._task.done():
+            self._cancel.cancel(reason)
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+class ResilientAgent(AgentWrapper):
+    """Retry, hedge and fail over between agents behind one event stream.
+
+    Each agent in the chain (``agent`` followed by ``fallbacks``) gets up to
+    ``policy.max_attempts`` tries. Retryable failures (timeouts, connection
+    errors, 429/5xx) back off with full jitter, or for as long as the
+    provider's Retry-After asks; other failures move straight to the next
+    agent. With ``hedge`` the next agent is also started when the first token
+    is later than the primary's recent p95, and the faster one is kept
+    (streams waiting in a rate-limit queue are neither timed out nor hedged).
+
+    Text already streamed is never taken back: if a stream breaks mid-answer,
+    the next attempt is asked to continue it and only its text is appended.
+    A ``cancel`` token stops everything in flight, including backoff waits.
+    """
+
+    def __init__(
+        self,
+        agent: BaseAgent,
+        fallbacks: Sequence[BaseAgent] = (),
+        policy: Optional[RetryPolicy] = None,
+        hedge: bool = False,
+        registry: Optional[MetricsRegistry] = None,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep
+    ):
+        super().__init__(agent)
+        self.chain: List[BaseAgent] = [agent] + list(fallbacks)
+        self.policy = policy or RetryPolicy()
+        self.hedge = hedge
+        self.registry = registry
+        self._sleep = sleep
+        self._report_errors = True
+        self.retries = 0
+        self.failovers = 0
+        self.hedges = 0
+        self.resumes = 0
+        # Failures are reported once, by this wrapper, after every attempt is used up
+        for chained in self.chain:
+            chained.report_errors = False
+
+    def with_model(self, spec: ModelSpec) -> BaseAgent:
+        # Only the primary switches; fallbacks are other providers' models
+        wrapper = super().with_model(spec)
+        wrapper.chain = [wrapper.agent] + self.chain[1:]
+        return wrapper
+
+    def with_params(self, params: Dict[str, Any]) -> BaseAgent:
+        # Unlike the model, sampling parameters hold for the fallbacks too
+        wrapper = super().with_params(params)
+        wrapper.chain = [wrapper.agent] + [agent.with_params(params) for agent in self.chain[1:]]
+        return wrapper
+
+    @property
+    def report_errors(self) -> bool:
+        return self._report_errors
+
+    @report_errors.setter
+    def report_errors(self, value: bool) -> None:
+        self._report_errors = value
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "retries": self.retries,
+            "failovers": self.failovers,
+            "hedges": self.hedges,
+            "resumes": self.resumes,
+        }
+
+    def retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying the same agent, or None to move on"""
+        if not is_retryable(error) or attempt + 1 >= self.policy.max_attempts:
+            return None
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            return retry_after if retry_after <= self.policy.max_delay else None
+        return random.uniform(0, min(self.policy.max_delay, self.policy.base_delay * 2 ** attempt))
+
+    def hedge_delay(self, agent: BaseAgent) -> float:
+        provider = getattr(agent, "provider", None)
+        if self.registry is None or provider is None:
+            return self.policy.hedge_default_delay
+        if len(self.registry.recent(provider)) < self.policy.hedge_min_samples:
+            return self.policy.hedge_default_delay
+        deadline = self.registry.quantile(provider, "time_to_first_token", self.policy.hedge_quantile)
+        return self.policy.hedge_default_delay if deadline is None else deadline
+
+    async def _start(self, index: int, prompt: str, kwargs: Dict[str, Any]) -> Tuple[_Attempt, StreamEvent]:
+        """Open the stream at ``index`` (and maybe a hedge) and wait for its first event"""
+        timeout = self.policy.first_token_timeout
+        primary = _Attempt(index, self.chain[index], prompt, kwargs)
+        if not self.hedge or index + 1 >= len(self.chain):
+            try:
+                return primary, await primary.next(timeout)
+            except asyncio.TimeoutError:
+                await primary.cancel(CANCEL_TIMEOUT)
+                raise
+            except BaseException:
+                await primary.cancel()
+                raise
+
+        waiters = {asyncio.ensure_future(primary.next(timeout)): primary}
+        done, _ = await asyncio.wait(waiters, timeout=self.hedge_delay(self.chain[index]))
+        if not done:
+            self.hedges += 1
+            logger.info("Hedging %s with %s", self.chain[index].model_name, self.chain[index + 1].model_name)
+            hedge = _Attempt(index + 1, self.chain[index + 1], prompt, kwargs)
+            waiters[asyncio.ensure_future(hedge.next(timeout))] = hedge
+        error: Optional[BaseException] = None
+        # Set once an attempt has won; the others then lost the race
+        reason = None
+        try:
+            while waiters:
+                done, _ = await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+                for waiter in done:
+                    attempt = waiters.pop(waiter)
+                    if waiter.exception() is None:
+                        event = waiter.result()
+                        if event.__class__ is Queued and attempt is not primary:
+                            # A queued hedge has not answered yet; keep racing
+                            waiters[asyncio.ensure_future(attempt.next(timeout))] = attempt
+                            continue
+                        reason = CANCEL_HEDGE_LOST
+                        return attempt, event
+                    error = waiter.exception()
+                    await attempt.cancel(CANCEL_TIMEOUT if isinstance(error, asyncio.TimeoutError) else None)
+            raise error
+        finally:
+            # The loser, or everything when this task itself is cancelled
+            for waiter, attempt in waiters.items():
+                waiter.cancel()
+                await attempt.cancel(reason)
+
+    def stream_chat(
+        self,
+        prompt: str,
+        history: Optional[List[Dict[str, Any]]] = None,
+        cancel: Optional[CancellationToken] = None,
+        **kwargs
+    ) -> AsyncIterator[StreamEvent]:
+        # A plain function, so the cancellation wrapper is the only layer around the retry loop
+        return cancellable(self._stream(prompt, history or [], kwargs), cancel)
+
+    async def _stream(
+        self,
+        prompt: str,
+        history: List[Dict[str, Any]],
+        kwargs: Dict[str, Any]
+    ) -> AsyncIterator[StreamEvent]:
+        partial = StreamBuffer()
+        index = 0
+        tries = 0
+        error: Optional[Exception] = None
+        while index < len(self.chain):
+            resumed = bool(partial)
+            if resumed:
+                call = dict(kwargs, history=history + [
+                    {"role": "user", "content": prompt},
+                    {"role": "assistant", "content": partial.getvalue()}
+                ])
+                attempt_prompt = RESUME_PROMPT
+            else:
+                call = dict(kwargs, history=history)
+                attempt_prompt = prompt
+            try:
+                attempt, event = await self._start(index, attempt_prompt, call)
+                if resumed:
+                    self.resumes += 1
+                try:
+                    index = attempt.index
+                    timeout = self.policy.idle_timeout
+                    while True:
+                        cls = event.__class__
+                        if cls is Queued:
+                            # Still before the first token
+                            timeout = self.policy.first_token_timeout
+                        elif cls is TextDelta or cls is ThinkingDelta:
+                            timeout = self.policy.idle_timeout
+                        if cls is Done:
+                            yield event
+                            return
+                        if cls is TextDelta:
+                            partial.append(event.text)
+                            yield event
+                        elif cls is not ThinkingDelta or not resumed:
+                            # A continuation's reasoning would be out of place mid-answer
+                            yield event
+                        event = await attempt.next(timeout)
+                except asyncio.TimeoutError:
+                    await attempt.cancel(CANCEL_TIMEOUT)
+                    raise
+                finally:
+                    await attempt.cancel()
+            except Exception as e:
+                error = e
+                delay = self.retry_delay(e, tries)
+                logger.warning("%s failed (%s: %s)", self.chain[index].model_name, type(e).__name__, e)
+                if delay is None:
+                    index += 1
+                    tries = 0
+                    if index < len(self.chain):
+                        self.failovers += 1
+                    continue
+                tries += 1
+                self.retries += 1
+                await self._sleep(delay)
+        for event in self._error_events(error):
+            yield event
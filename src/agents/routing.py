@@ -0,0 +1,73 @@
+import logging
+import re
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+from .base import AgentWrapper, BaseAgent, StreamEvent
+from .catalog import ModelSpec
+from .context import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Prompts asking for code, proofs or multi-step analysis stay on the configured model
+_COMPLEX_PROMPT = re.compile(
+    r"```|\b(step[- ]by[- ]step|prove|proof|derive|analy[sz]e|debug|refactor|implement|design|"
+    r"compare|trade-?offs?|explain why|write (a|an|the) (program|function|class|script|essay|report))\b",
+    re.IGNORECASE
+)
+
+class ModelRouter:
+    """Pick the fastest model for prompts that do not need the configured one.
+
+    A prompt is routed when it is at most ``max_prompt_tokens`` long and does
+    not look complex (code, proofs, analysis). It then goes to the candidate
+    with the lowest latency class, cheapest first, whose context window holds
+    the prompt, the history and ``reserve_tokens`` of answer.
+    """
+
+    def __init__(self, candidates: Sequence[ModelSpec], max_prompt_tokens: int = 200, reserve_tokens: int = 1024):
+        self.candidates: List[ModelSpec] = sorted(
+            (spec for spec in candidates if spec.latency_class),
+            key=lambda spec: (spec.latency_rank, spec.input_price if spec.input_price is not None else float("inf"))
+        )
+        self.max_prompt_tokens = max_prompt_tokens
+        self.reserve_tokens = reserve_tokens
+        self.routed: Dict[str, int] = {}
+
+    def is_simple(self, prompt: str) -> bool:
+        return estimate_tokens(prompt) <= self.max_prompt_tokens and not _COMPLEX_PROMPT.search(prompt)
+
+    def choose(self, prompt: str, history_tokens: int = 0) -> Optional[ModelSpec]:
+        """The model for this prompt, or None to keep the configured model"""
+        if not self.is_simple(prompt):
+            return None
+        needed = estimate_tokens(prompt) + history_tokens + self.reserve_tokens
+        for spec in self.candidates:
+            if spec.context_window is None or spec.context_window >= needed:
+                self.routed[spec.id] = self.routed.get(spec.id, 0) + 1
+                return spec
+        return None
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self.routed)
+
+class RoutedAgent(AgentWrapper):
+    """Send each prompt to the model its ModelRouter picks.
+
+    The routed request runs on a copy of the wrapped agent (``with_model``),
+    so it shares the pooled client and concurrent calls do not interfere.
+    """
+
+    def __init__(self, agent: BaseAgent, router: ModelRouter):
+        super().__init__(agent)
+        self.router = router
+
+    async def stream_chat(self, prompt: str, **kwargs) -> AsyncIterator[StreamEvent]:
+        history: List[Dict[str, Any]] = kwargs.get("history") or []
+        spec = self.router.choose(prompt, sum(self.context.count(message) for message in history))
+        agent = self.agent
+        if spec is not None and spec.id != agent.model_name:
+            logger.debug("Routing prompt from %s to %s", agent.model_name, spec.id)
+            agent = agent.with_model(spec)
+        async with aclosing(agent.stream_chat(prompt, **kwargs)) as events:
+            async for event in events:
+                yield event
@@ -0,0 +1,145 @@
+import json
+import logging
+import re
+from json.scanner import make_scanner
+from typing import Any, AsyncIterator, Callable, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # optional fast JSON backend
+    orjson = None
+
+Buffer = Union[bytes, memoryview]
+
+# The scanner json.loads runs after skipping whitespace; it clears its state after every call
+_scan_json = make_scanner(json.JSONDecoder())
+
+def _json_loads(data: Buffer) -> Any:
+    # SSE is always UTF-8; decoding here skips json's encoding detection
+    text = str(data, "utf-8")
+    # Provider events are a bare JSON object, so the scanner alone parses them;
+    # padded or malformed ones take the full json.loads path and its errors
+    try:
+        value, end = _scan_json(text, 0)
+    except StopIteration:
+        return json.loads(text)
+    return value if end == len(text) else json.loads(text)
+
+# orjson parses memoryviews directly, without an intermediate bytes copy
+default_loads: Callable[[Buffer], Any] = orjson.loads if orjson is not None else _json_loads
+
+_DATA = b"data:"
+_DONE = b"[DONE]"
+_NEWLINE = re.compile(b"\n")
+
+class SSEDecoder:
+    """Incremental Server-Sent Events decoder working on raw bytes.
+
+    ``feed`` accepts network chunks of any size and returns the ``data``
+    payload of every event completed by that chunk, as memoryviews into the
+    received bytes (multi-line ``data`` fields are joined with newlines).
+    Only a line that spans two chunks is copied, so a chunk passed as a
+    memoryview must not be overwritten while its events are in use. Lines
+    end with LF or CRLF; comments and non-data fields are skipped.
+    """
+
+    __slots__ = ("_pending", "_data")
+
+    def __init__(self):
+        self._pending = b""
+        self._data: List[memoryview] = []
+
+    def feed(self, chunk: Buffer) -> List[Buffer]:
+        events: List[Buffer] = []
+        start = 0
+        if self._pending:
+            # Complete the line left over from the previous chunk
+            end = _finder(chunk)(b"\n", 0)
+            if end < 0:
+                self._pending += chunk
+                return events
+            line = self._pending + chunk[:end + 1]
+            self._pending = b""
+            self._scan(line, 0, events)
+            start = end + 1
+        self._scan(chunk, start, events)
+        return events
+
+    def _scan(self, chunk: Buffer, start: int, events: List[Buffer]) -> None:
+        data = self._data
+        find = _finder(chunk)
+        if chunk.__class__ is bytes:
+            view = memoryview(chunk)
+            startswith = chunk.startswith
+        else:
+            # Scanned in place: memoryviews have no find() or startswith()
+            chunk = view = memoryview(chunk)
+            startswith = lambda prefix, start: view[start:start + len(prefix)] == prefix
+        while True:
+            end = find(b"\n", start)
+            if end < 0:
+                break
+            line_end = end - 1 if end > start and chunk[end - 1] == 13 else end
+            if line_end == start:
+                # Blank line: dispatch the event
+                if len(data) == 1:
+                    events.append(data[0])
+                elif data:
+                    events.append(b"\n".join(data))
+                data.clear()
+            elif startswith(_DATA, start):
+                value_start = start + 5
+                if value_start < line_end and chunk[value_start] == 32:
+                    value_start += 1
+                data.append(view[value_start:line_end])
+            start = end + 1
+        if start < len(chunk):
+            # bytes() of a bytes slice is that slice; a memoryview's tail is copied
+            self._pending = bytes(chunk[start:])
+
+    def flush(self) -> List[Buffer]:
+        """Dispatch an event left open when the stream ended without a blank line"""
+        if self._pending:
+            return self.feed(b"\n\n")
+        if self._data:
+            return self.feed(b"\n")
+        return []
+
+def _finder(chunk: Buffer) -> Callable[[bytes, int], int]:
+    """``chunk.find`` for bytes, a regular expression search for other buffers"""
+    if chunk.__class__ is bytes:
+        return chunk.find
+    search = _NEWLINE.search
+
+    def find(sub: bytes, start: int) -> int:
+        match = search(chunk, start)
+        return match.start() if match else -1
+    return find
+
+async def iter_sse_json(
+    chunks: AsyncIterator[Buffer],
+    loads: Optional[Callable[[Buffer], Any]] = None
+) -> AsyncIterator[Any]:
+    """Decode an OpenAI-style SSE byte stream into JSON objects, up to ``[DONE]``"""
+    loads = loads or default_loads
+    decoder = SSEDecoder()
+    debug = logger.isEnabledFor(logging.DEBUG)
+    async for chunk in chunks:
+        for data in decoder.feed(chunk):
+            if debug:
+                logger.debug("SSE data: %s", bytes(data))
+            if data == _DONE:
+                return
+            try:
+                yield loads(data)
+            except ValueError as e:
+                logger.warning("Skipping undecodable SSE event: %s", e)
+    for data in decoder.flush():
+        if data == _DONE:
+            return
+        try:
+            yield loads(data)
+        except ValueError as e:
+            logger.warning("Skipping undecodable SSE event: %s", e)
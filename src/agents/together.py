@@ -1,71 +1,34 @@
-from typing import AsyncIterator, Dict
-import aiohttp
-import json
-from .base import BaseAgent
+from typing import Any, AsyncIterator, Dict, Optional
+from .base import StreamEvent, TextDelta
+from .catalog import ModelSpec
+from .compatible import OpenAICompatibleAgent
 
-class TogetherAgent(BaseAgent):
-    def _initialize(self) -> None:
-        self._model = "mistralai/Mixtral-8x7B-Instruct-v0.1"  # Using Mixtral as it's available in serverless
-        self._api_url = "https://api.together.xyz/v1/chat/completions"
-        self._headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
-    async def stream_chat(self, prompt: str, **kwargs) -> AsyncIterator[Dict[str, str]]:
-        thinking = ""
-        response = ""
-        
-        try:
-            data = {
-                "model": self._model,
-                "messages": [
-                    {"role": "system", "content": "You are a helpful, friendly, and knowledgeable assistant."},
-                    {"role": "user", "content": prompt}
-                ],
-                "temperature": 0.7,
-                "max_tokens": 1024,
-                "stream": True
-            }
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.post(self._api_url, headers=self._headers, json=data) as resp:
-                    if resp.status != 200:
-                        error_text = await resp.text()
-                        raise Exception(f"API Error {resp.status}: {error_text}")
-                    
-                    async for line in resp.content:
-                        if line:
-                            try:
-                                line = line.decode('utf-8').strip()
-                                print(f"Raw line: {line}")  # Debug log
-                                
-                                if line.startswith('data: '):
-                                    data = line[6:]  # Remove 'data: ' prefix
-                                    if data != '[DONE]':
-                                        chunk = json.loads(data)
-                                        if chunk.get('choices') and chunk['choices'][0].get('delta', {}).get('content'):
-                                            content = chunk['choices'][0]['delta']['content']
-                                            response += content
-                                            print(f"Added content: {content}")  # Debug log
-                                        yield {
-                                            "thinking": "",
-                                            "response": response.strip()
-                                        }
-                            except json.JSONDecodeError as e:
-                                print(f"JSON decode error: {e}, Line: {line}")
-                                continue
-                            except Exception as e:
-                                print(f"Error processing chunk: {e}, Line: {line}")
-                                continue
-                    
-        except Exception as e:
-            print(f"Error in Together API: {str(e)}")  # Debug log
-            yield {
-                "thinking": f"Error in thinking process: {str(e)}",
-                "response": f"Error generating response: {str(e)}"
-            }
+class TogetherAgent(OpenAICompatibleAgent):
+    system_prompt = "You are a helpful, friendly, and knowledgeable assistant."
+    default_model = "mistralai/Mixtral-8x7B-Instruct-v0.1"  # Using Mixtral as it's available in serverless
+    context_window = 32768
+    base_url = "https://api.together.xyz/v1"
     
-    @property
-    def model_name(self) -> str:
-        return self._model
+    def _listed_spec(self, item: Dict[str, Any]) -> Optional[ModelSpec]:
+        # The list also has embedding, image and rerank models; prices are USD per 1M tokens
+        if item.get("type", "chat") != "chat":
+            return None
+        pricing = item.get("pricing") or {}
+        return ModelSpec(
+            item["id"],
+            context_window=item.get("context_length"),
+            input_price=pricing.get("input"),
+            output_price=pricing.get("output")
+        )
+        
+    async def stream_chat(self, prompt: str, **kwargs) -> AsyncIterator[StreamEvent]:
+        started = False
+        async for event in super().stream_chat(prompt, **kwargs):
+            if not started and event.__class__ is TextDelta:
+                # Leading whitespace used to be stripped from the whole response
+                text = event.text.lstrip()
+                if not text:
+                    continue
+                started = True
+                event = TextDelta(text)
+            yield event
@@ -0,0 +1,231 @@
+"""
+Run a JSONL file of prompts through one or more agents, concurrently and resumably.
+
+Run from the project root:
+    python -m src.batch prompts.jsonl --models "GPT-4 Turbo,Claude 3 Opus" --output results.jsonl
+
+Each input line is a JSON object with an id (``--id-field``, default ``id``)
+and either a prompt (``--prompt-field``, default ``prompt``) or OpenAI-style
+``messages``. Every (row, model) result is appended to the output file as
+soon as it finishes, with latency and token usage. The output doubles as the
+checkpoint: rerunning the same command skips pairs that already succeeded
+and retries the failed ones.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from contextlib import aclosing
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from src.agents.base import BaseAgent, Done, StreamAccumulator, TextDelta, ThinkingDelta
+from src.agents.context import from_openai
+from src.agents.registry import ModelConfig
+from src.utils.config import configure_logging
+from src.utils.factory import build_agent, get_available_models, get_client_pool
+
+try:
+    import orjson
+
+    def dumps(payload: Any) -> str:
+        return orjson.dumps(payload).decode("utf-8")
+except ImportError:  # optional fast JSON backend
+    def dumps(payload: Any) -> str:
+        return json.dumps(payload, ensure_ascii=False)
+
+Job = Tuple[str, str, List[Dict[str, str]], str]
+
+def read_rows(path: str, id_field: str, prompt_field: str) -> Iterator[Tuple[str, str, List[Dict[str, str]]]]:
+    """``(id, prompt, history)`` for every input line"""
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            row_id = str(row.get(id_field, number))
+            if prompt_field in row:
+                yield row_id, row[prompt_field], []
+            elif "messages" in row:
+                prompt, history = from_openai(row["messages"])
+                yield row_id, prompt, history
+            else:
+                raise ValueError(f"{path}:{number}: no {prompt_field!r} or 'messages' field")
+
+def finished_pairs(path: str) -> Set[Tuple[str, str]]:
+    """(id, model) pairs that already have a successful result in the output"""
+    done: Set[Tuple[str, str]] = set()
+    try:
+        f = open(path, encoding="utf-8")
+    except FileNotFoundError:
+        return done
+    with f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                # A line cut short by an interrupted run
+                continue
+            if not isinstance(result, dict) or result.get("id") is None or result.get("model") is None:
+                # Not a result line, e.g. written by another tool
+                continue
+            pair = (result["id"], result["model"])
+            if result.get("error"):
+                done.discard(pair)
+            else:
+                done.add(pair)
+    return done
+
+class BatchRunner:
+    """Fan jobs out over agents with at most ``concurrency`` streams in flight"""
+
+    def __init__(self, agents: Dict[str, BaseAgent], output, concurrency: int = 8, use_cache: bool = False):
+        self.agents = agents
+        self.output = output
+        self.concurrency = concurrency
+        self.use_cache = use_cache
+        self.completed = 0
+        self.failed = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.latencies: List[float] = []
+
+    async def run_one(self, row_id: str, prompt: str, history: List[Dict[str, str]], model: str) -> Dict[str, Any]:
+        stream = StreamAccumulator()
+        error = None
+        first_token = None
+        started = time.perf_counter()
+        try:
+            agent_stream = self.agents[model].stream_chat(
+                prompt, history=history, session="batch", bypass_cache=not self.use_cache
+            )
+            async with aclosing(agent_stream) as events:
+                async for event in events:
+                    stream.feed(event)
+                    cls = event.__class__
+                    if first_token is None and (cls is TextDelta or cls is ThinkingDelta):
+                        first_token = time.perf_counter() - started
+                    elif cls is Done and event.error is not None:
+                        error = event.error
+        except Exception as e:
+            error = e
+        duration = time.perf_counter() - started
+        result: Dict[str, Any] = {
+            "id": row_id,
+            "model": model,
+            "response": stream.response,
+            "latency": {
+                "time_to_first_token": None if first_token is None else round(first_token, 3),
+                "duration": round(duration, 3),
+            },
+            "usage": stream.usage.as_dict() if stream.usage is not None else None,
+            "error": f"{type(error).__name__}: {error}" if error is not None else None,
+            "finished_at": time.time(),
+        }
+        if stream.thinking:
+            result["thinking"] = stream.thinking
+        return result
+
+    def record(self, result: Dict[str, Any]) -> None:
+        # One line per result, flushed at once so an interrupted run loses nothing finished
+        self.output.write(dumps(result) + "\n")
+        self.output.flush()
+        if result["error"]:
+            self.failed += 1
+            return
+        self.completed += 1
+        self.latencies.append(result["latency"]["duration"])
+        if result["usage"]:
+            self.input_tokens += result["usage"]["input_tokens"]
+            self.output_tokens += result["usage"]["output_tokens"]
+
+    async def _worker(self, jobs: Iterator[Job]) -> None:
+        # Workers pull from a shared iterator, so only ``concurrency`` jobs exist at a time
+        for row_id, prompt, history, model in jobs:
+            self.record(await self.run_one(row_id, prompt, history, model))
+
+    async def run(self, jobs: Iterator[Job]) -> None:
+        workers = [asyncio.ensure_future(self._worker(jobs)) for _ in range(self.concurrency)]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            # When one worker fails, e.g. on a malformed input line, the others
+            # stop too before the caller closes the clients they stream on
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+def _percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+def report(runner: BatchRunner, elapsed: float, skipped: int) -> str:
+    total = runner.completed + runner.failed
+    rps = total / elapsed if elapsed else 0.0
+    tps = runner.output_tokens / elapsed if elapsed else 0.0
+    return (
+        f"{runner.completed} succeeded, {runner.failed} failed, {skipped} already done | "
+        f"{elapsed:.1f}s, {rps:.2f} requests/s, {tps:.1f} output tokens/s "
+        f"({runner.input_tokens} in / {runner.output_tokens} out tokens) | "
+        f"latency p50 {_percentile(runner.latencies, 0.5):.2f}s, p95 {_percentile(runner.latencies, 0.95):.2f}s"
+    )
+
+def resolve_models(names: Optional[str]) -> List[ModelConfig]:
+    available = {model.name: model for model in get_available_models()}
+    if not names:
+        return list(available.values())[:1]
+    models = []
+    for name in (name.strip() for name in names.split(",")):
+        if name not in available:
+            raise SystemExit(f"Model {name!r} is not available (have: {', '.join(available) or 'none'})")
+        models.append(available[name])
+    return models
+
+async def run_batch(args: argparse.Namespace) -> int:
+    models = resolve_models(args.models)
+    agents = {model.name: build_agent(model, failover=args.failover, session="batch") for model in models}
+    for agent in agents.values():
+        # A failed row keeps an empty response; the reason goes in "error"
+        agent.report_errors = False
+    done = finished_pairs(args.output)
+    skipped = 0
+
+    def jobs() -> Iterator[Job]:
+        nonlocal skipped
+        for row_id, prompt, history in read_rows(args.input, args.id_field, args.prompt_field):
+            for model in agents:
+                if (row_id, model) in done:
+                    skipped += 1
+                    continue
+                yield row_id, prompt, history, model
+
+    with open(args.output, "a", encoding="utf-8") as output:
+        runner = BatchRunner(agents, output, concurrency=args.concurrency, use_cache=args.use_cache)
+        started = time.perf_counter()
+        try:
+            await runner.run(jobs())
+        finally:
+            print(report(runner, time.perf_counter() - started, skipped), file=sys.stderr)
+            await get_client_pool().aclose()
+    return 1 if runner.failed else 0
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("input", help="JSONL file of prompts")
+    parser.add_argument("--output", default="results.jsonl", help="append-only JSONL results (and checkpoint)")
+    parser.add_argument("--models", help="comma-separated model names (default: first available)")
+    parser.add_argument("--concurrency", type=int, default=8, help="streams in flight at once")
+    parser.add_argument("--id-field", default="id")
+    parser.add_argument("--prompt-field", default="prompt")
+    parser.add_argument("--use-cache", action="store_true", help="answer repeated prompts from the response cache")
+    parser.add_argument("--failover", action="store_true", help="fall back to FAILOVER_MODELS on errors")
+    args = parser.parse_args()
+    configure_logging()
+    try:
+        return asyncio.run(run_batch(args))
+    except KeyboardInterrupt:
+        print("Interrupted; rerun the same command to resume", file=sys.stderr)
+        return 130
+
+if __name__ == "__main__":
+    sys.exit(main())
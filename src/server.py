@@ -0,0 +1,303 @@
+"""
+OpenAI-compatible HTTP API for every registered model, without Streamlit.
+
+Run from the project root:
+    python -m src.server [--host 127.0.0.1] [--port 8000] [--workers 4]
+
+Endpoints: ``POST /v1/chat/completions`` (with ``"stream": true`` for SSE),
+``GET /v1/models`` and ``GET /metrics`` (Prometheus text). Requests may name
+a registered model or any provider model id in the model catalog; temperature,
+top_p, max_tokens and stop apply to that request only, and other OpenAI
+fields are rejected with a 400. Each worker is a separate process with its
+own connection pool and metrics; set RESPONSE_CACHE_PATH and RATE_LIMIT_DB
+so the workers share the response cache and rate limits.
+"""
+import argparse
+import hmac
+import json
+import time
+import uuid
+from contextlib import aclosing, asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from src.agents.base import BaseAgent, Done, Queued, StreamAccumulator, TextDelta, ThinkingDelta, Usage
+from src.agents.catalog import ModelSpec
+from src.agents.context import from_openai
+from src.agents.registry import ModelConfig
+from src.utils.config import configure_logging, get_setting
+from src.utils.factory import (
+    build_agent, get_available_models, get_client_pool, get_metrics_registry, get_model_catalog, get_model_id
+)
+
+try:
+    import orjson
+
+    def dumps(payload: Any) -> bytes:
+        return orjson.dumps(payload)
+except ImportError:  # optional fast JSON backend
+    def dumps(payload: Any) -> bytes:
+        return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+# One agent stack per model and worker; agents keep no per-conversation state
+_agents: Dict[str, BaseAgent] = {}
+
+def get_agent(model: ModelConfig) -> Optional[BaseAgent]:
+    agent = _agents.get(model.name)
+    if agent is None:
+        agent = build_agent(model)
+        if agent is not None:
+            # Failures reach clients as an error event or a 502, not as answer text
+            agent.report_errors = False
+            _agents[model.name] = agent
+    return agent
+
+def find_model(name: str) -> Tuple[Optional[ModelConfig], Optional[ModelSpec]]:
+    """Registered model by display name or by the provider model id it is configured with.
+
+    Failing that, the first available model whose provider's catalog lists
+    ``name``, with that spec to switch its agent to.
+    """
+    for model in get_available_models():
+        if model.name == name:
+            return model, None
+    for model in get_available_models():
+        if get_model_id(model) == name:
+            return model, None
+    catalog = get_model_catalog()
+    for model in get_available_models():
+        spec = catalog.get(model.provider, name)
+        if spec is not None:
+            return model, spec
+    return None, None
+
+def error_response(status: int, message: str, error_type: str = "invalid_request_error") -> JSONResponse:
+    return JSONResponse({"error": {"message": message, "type": error_type}}, status_code=status)
+
+# Body fields chat_completions reads itself; the sampling ones become agent params
+REQUEST_FIELDS = {"model", "messages", "stream", "stream_options", "user", "bypass_cache"}
+SAMPLING_FIELDS = {"temperature", "top_p", "max_tokens", "max_completion_tokens", "stop"}
+
+def request_params(body: Dict[str, Any]) -> Dict[str, Any]:
+    """Sampling parameters of a request body, named as in agents' ``params``.
+
+    Raises ValueError for fields this server does not support and for
+    malformed values; fields sent as null count as absent.
+    """
+    unsupported = sorted(
+        key for key, value in body.items()
+        if value is not None and key not in REQUEST_FIELDS and key not in SAMPLING_FIELDS
+    )
+    if unsupported:
+        raise ValueError(f"Unsupported fields: {', '.join(unsupported)}")
+    params: Dict[str, Any] = {}
+    for key in ("temperature", "top_p"):
+        value = body.get(key)
+        if value is not None:
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"{key} must be a number")
+            params[key] = value
+    # max_completion_tokens is the newer name for max_tokens
+    max_tokens = body.get("max_completion_tokens")
+    if max_tokens is None:
+        max_tokens = body.get("max_tokens")
+    if max_tokens is not None:
+        if isinstance(max_tokens, bool) or not isinstance(max_tokens, int) or max_tokens < 1:
+            raise ValueError("max_tokens must be a positive integer")
+        params["max_tokens"] = max_tokens
+    stop = body.get("stop")
+    if stop is not None:
+        stop = [stop] if isinstance(stop, str) else stop
+        if not isinstance(stop, list) or not all(isinstance(sequence, str) for sequence in stop):
+            raise ValueError("stop must be a string or a list of strings")
+        params["stop"] = stop
+    return params
+
+def _chunk(completion_id: str, created: int, model: str, delta: Dict[str, Any], finish_reason=None) -> Dict[str, Any]:
+    return {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": created,
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+def _usage(usage: Usage) -> Dict[str, Any]:
+    return {
+        "prompt_tokens": usage.input_tokens,
+        "completion_tokens": usage.output_tokens,
+        "total_tokens": usage.input_tokens + usage.output_tokens,
+        "prompt_tokens_details": {"cached_tokens": usage.cache_read_tokens},
+        "completion_tokens_details": {"reasoning_tokens": usage.reasoning_tokens},
+    }
+
+async def stream_completion(
+    agent: BaseAgent,
+    model: str,
+    prompt: str,
+    kwargs: Dict[str, Any],
+    include_usage: bool
+) -> AsyncIterator[bytes]:
+    """Agent events as OpenAI chat.completion.chunk SSE events"""
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+    usage: Optional[Usage] = None
+    yield b"data: " + dumps(_chunk(completion_id, created, model, {"role": "assistant", "content": ""})) + b"\n\n"
+    # aclosing() stops the provider stream when the client disconnects
+    async with aclosing(agent.stream_chat(prompt, **kwargs)) as events:
+        async for event in events:
+            cls = event.__class__
+            if cls is TextDelta:
+                delta = {"content": event.text}
+            elif cls is ThinkingDelta:
+                delta = {"reasoning_content": event.text}
+            elif cls is Usage:
+                usage = event
+                continue
+            elif cls is Queued:
+                if event.position:
+                    # SSE comment: keeps the connection alive, ignored by clients
+                    yield f": queued {event.position}\n\n".encode()
+                continue
+            elif cls is Done:
+                if event.error is not None:
+                    error = {"error": {"message": str(event.error), "type": "upstream_error"}}
+                    yield b"data: " + dumps(error) + b"\n\n"
+                    break
+                yield b"data: " + dumps(_chunk(completion_id, created, model, {}, "stop")) + b"\n\n"
+                break
+            else:
+                continue
+            yield b"data: " + dumps(_chunk(completion_id, created, model, delta)) + b"\n\n"
+    if include_usage and usage is not None:
+        final = _chunk(completion_id, created, model, {})
+        final["choices"] = []
+        final["usage"] = _usage(usage)
+        yield b"data: " + dumps(final) + b"\n\n"
+    yield b"data: [DONE]\n\n"
+
+async def complete(agent: BaseAgent, model: str, prompt: str, kwargs: Dict[str, Any]) -> Response:
+    """Non-streaming completion: the whole answer in one chat.completion object"""
+    stream = StreamAccumulator()
+    error = None
+    async with aclosing(agent.stream_chat(prompt, **kwargs)) as events:
+        async for event in events:
+            stream.feed(event)
+            if event.__class__ is Done:
+                error = event.error
+    if error is not None:
+        return error_response(502, str(error), "upstream_error")
+    message: Dict[str, Any] = {"role": "assistant", "content": stream.response}
+    if stream.thinking:
+        message["reasoning_content"] = stream.thinking
+    body: Dict[str, Any] = {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+    }
+    if stream.usage is not None:
+        body["usage"] = _usage(stream.usage)
+    return Response(dumps(body), media_type="application/json")
+
+def _authorized(request: Request) -> bool:
+    api_key = get_setting("SERVER_API_KEY")
+    if not api_key:
+        return True
+    return hmac.compare_digest(request.headers.get("authorization", ""), f"Bearer {api_key}")
+
+async def chat_completions(request: Request) -> Response:
+    if not _authorized(request):
+        return error_response(401, "Invalid API key", "authentication_error")
+    try:
+        body = await request.json()
+        if not isinstance(body, dict):
+            raise ValueError("Request body must be a JSON object")
+        messages = body.get("messages") or []
+        if not isinstance(messages, list) or not all(isinstance(message, dict) for message in messages):
+            raise ValueError("messages must be a list of message objects")
+        prompt, history = from_openai(messages)
+        params = request_params(body)
+    except ValueError as e:
+        return error_response(400, str(e))
+    name = body.get("model")
+    model, spec = find_model(name) if name else (None, None)
+    if model is None:
+        return error_response(404, f"Model {name!r} is not available")
+    agent = get_agent(model)
+    if spec is not None:
+        # A per-request copy on the same pooled client
+        agent = agent.with_model(spec)
+    if params:
+        agent = agent.with_params(params)
+
+    # Fair rate-limit queueing per end user (OpenAI's "user" field) or client address
+    session = body.get("user") or (request.client.host if request.client else None)
+    kwargs = {"history": history, "session": session, "bypass_cache": bool(body.get("bypass_cache"))}
+    if body.get("stream"):
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+        return StreamingResponse(
+            stream_completion(agent, name, prompt, kwargs, include_usage),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    return await complete(agent, name, prompt, kwargs)
+
+async def list_models(request: Request) -> Response:
+    """Registered models, then every catalogued model of their providers.
+
+    Only providers whose agent a completion has already built are asked for
+    their model list; the others are listed from the catalog as it stands.
+    """
+    catalog = get_model_catalog()
+    data = [{"id": model.name, "object": "model", "owned_by": model.provider} for model in get_available_models()]
+    seen = {entry["id"] for entry in data}
+    for model in get_available_models():
+        agent = _agents.get(model.name)
+        # Asks the provider at most once per MODEL_CATALOG_TTL
+        specs = await catalog.refresh(model.provider, agent) if agent is not None else catalog.models(model.provider)
+        for model_id in [get_model_id(model)] + [spec.id for spec in specs]:
+            if model_id not in seen:
+                seen.add(model_id)
+                data.append({"id": model_id, "object": "model", "owned_by": model.provider})
+    return JSONResponse({"object": "list", "data": data})
+
+async def metrics(request: Request) -> Response:
+    return PlainTextResponse(get_metrics_registry().to_prometheus(), media_type="text/plain; version=0.0.4")
+
+@asynccontextmanager
+async def lifespan(app: Starlette):
+    yield
+    await get_client_pool().aclose()
+
+def create_app() -> Starlette:
+    configure_logging()
+    return Starlette(
+        routes=[
+            Route("/v1/chat/completions", chat_completions, methods=["POST"]),
+            Route("/v1/models", list_models, methods=["GET"]),
+            Route("/metrics", metrics, methods=["GET"]),
+        ],
+        lifespan=lifespan
+    )
+
+app = create_app()
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default=get_setting("SERVER_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(get_setting("SERVER_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(get_setting("SERVER_WORKERS", "1")))
+    args = parser.parse_args()
+    # Workers import the app by name, each building its own agents
+    uvicorn.run("src.server:app", host=args.host, port=args.port, workers=args.workers)
+
+if __name__ == "__main__":
+    main()
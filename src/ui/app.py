@@ -1,10 +1,15 @@
 import asyncio
 import streamlit as st
-from .components import render_sidebar, render_chat_interface, render_model_info
+from ..utils.config import configure_logging
+from .components import (
+    render_sidebar, render_chat_interface, render_conversations, render_latency_panel, render_model_info,
+    render_model_picker
+)
 from .config import initialize_session_state
 
 async def main():
     """Main application entry point"""
+    configure_logging()
     # Initialize session state
     initialize_session_state()
     
@@ -14,8 +19,14 @@ async def main():
     with agent_col:
         # Render agent selection and get selected model
         selected_model = render_sidebar()
+        # Models of the current agent's provider
+        render_model_picker()
+        # Stored conversations to resume
+        render_conversations()
         # Display model info
         render_model_info(selected_model)
+        # Live per-provider latency
+        render_latency_panel()
     
     with chat_col:
         # Render main chat interface
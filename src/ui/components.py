@@ -1,15 +1,24 @@
 import streamlit as st
-from typing import Optional
-from src.ui.config import ModelConfig, AVAILABLE_MODELS, create_agent
-from src.utils.config import get_api_key
+from contextlib import aclosing
+from typing import Any, Dict, List, Optional
+from src.agents.base import CancellationToken, Done
+from src.agents.catalog import ModelSpec
+from src.agents.context import select_turns
+from src.agents.fanout import FanOut, StreamTiming
+from src.agents.resilience import ResilientAgent
+from src.ui.config import (
+    ModelConfig, AVAILABLE_MODELS, METRICS_PANEL_REFRESH, RENDER_FLUSH_CHARS, RENDER_MAX_FPS,
+    STOP_CHECK_INTERVAL, TRANSCRIPT_PAGE_SIZE, add_message, create_agent, get_available_models, get_client_pool,
+    get_compare_agents, get_history_store, get_metrics_registry, get_model_catalog, get_rate_scheduler,
+    get_response_cache, new_conversation, refresh_models, resume_conversation, switch_model
+)
+from src.ui.rendering import StreamRenderer, format_metrics
+from src.utils.aio import iterate_on_io_loop
 
 def render_sidebar() -> Optional[ModelConfig]:
     """Render sidebar with model selection"""
     # Get available models with valid API keys
-    available_models = [
-        model for model in AVAILABLE_MODELS 
-        if get_api_key(model.api_key_name)
-    ]
+    available_models = get_available_models()
     
     if not available_models:
         st.error("No API keys found. Please add API keys to your .env file.")
@@ -22,6 +31,27 @@ def render_sidebar() -> Optional[ModelConfig]:
     
     selected_model = next(model for model in available_models if model.name == selected_name)
     
+    # Compare mode sends each prompt to several agents at once
+    st.toggle("Compare mode", key="compare_mode")
+    if st.session_state.compare_mode:
+        st.multiselect("Agents to compare", model_names, key="compare_models")
+        st.checkbox(
+            "First responder wins",
+            key="first_wins",
+            help="Stop the other agents as soon as one finishes"
+        )
+    
+    st.checkbox(
+        "Bypass response cache",
+        key="bypass_cache",
+        help="Always ask the provider, even for a prompt that was answered before"
+    )
+    st.checkbox(
+        "Stream reasoning live",
+        key="live_thinking",
+        help="Show a reasoning model's thoughts as they arrive instead of only their length and duration"
+    )
+    
     if st.button("Initialize Agent"):
         with st.spinner("Initializing agent..."):
             try:
@@ -34,73 +64,342 @@ def render_sidebar() -> Optional[ModelConfig]:
     
     return selected_model
 
+def render_model_picker():
+    """Switch the current agent between the models of its provider"""
+    agent = st.session_state.current_agent
+    if agent is None:
+        return
+    specs = {spec.id: spec for spec in get_model_catalog().models(st.session_state.selected_model.provider)}
+    current = agent.model_name
+    if current not in specs:
+        # e.g. set through <PROVIDER>_MODEL and not catalogued
+        specs = {current: ModelSpec(current), **specs}
+    ids = list(specs)
+    selected = st.selectbox("Model", ids, index=ids.index(current), format_func=lambda model_id: specs[model_id].label())
+    if selected != current:
+        switch_model(specs[selected])
+    if st.button("Refresh model list", help="Ask the provider for its current models and prices"):
+        with st.spinner("Fetching models..."):
+            refresh_models()
+        st.rerun()
+
+def render_conversations():
+    """Switch between stored conversations, or start a new one"""
+    conversations = get_history_store().conversations()
+    titles = {conversation.id: f"{conversation.title} ({conversation.messages})" for conversation in conversations}
+    current = st.session_state.conversation_id
+    options = [None] + list(titles)
+    selected = st.selectbox(
+        "Conversation",
+        options,
+        index=options.index(current) if current in titles else 0,
+        format_func=lambda conversation_id: titles.get(conversation_id, "New conversation")
+    )
+    if selected != current and (selected is not None or current is not None):
+        if selected is None:
+            new_conversation()
+        else:
+            resume_conversation(selected)
+        st.rerun()
+
+def render_message(msg: Dict[str, Any]):
+    """Render one completed chat message"""
+    with st.chat_message(msg["role"]):
+        if msg.get("agent"):
+            st.caption(msg["agent"])
+        if msg.get("has_thinking"):
+            # Expander bodies run even when collapsed, so a toggle gates the read from the store
+            key = f"thinking_{st.session_state.conversation_id}_{msg['seq']}"
+            if st.toggle("Thinking Process", key=key):
+                st.markdown(get_history_store().thinking(st.session_state.conversation_id, msg["seq"]))
+        st.markdown(msg["content"])
+        if msg.get("metrics"):
+            st.caption(format_metrics(msg["metrics"]))
+
+def _load_earlier_messages():
+    st.session_state.transcript_limit += TRANSCRIPT_PAGE_SIZE
+
+@st.fragment
+def render_transcript():
+    """Render the most recent messages of the chat history.
+
+    Only the last ``transcript_limit`` messages are emitted; "Load earlier
+    messages" pages further back, reading messages older than the session
+    window from the history store. Being a fragment, paging reruns just the
+    transcript, not the whole script.
+    """
+    history = st.session_state.chat_history
+    limit = st.session_state.transcript_limit
+    shown = history[-limit:]
+    if limit > len(history) and st.session_state.history_total > len(history):
+        before = history[0]["seq"] if history else st.session_state.history_total
+        shown = get_history_store().messages(
+            st.session_state.conversation_id, limit - len(history), before=before
+        ) + shown
+    hidden = st.session_state.history_total - len(shown)
+    if hidden > 0:
+        st.button(
+            f"Load earlier messages ({hidden} hidden)",
+            on_click=_load_earlier_messages,
+            key="load_earlier_messages"
+        )
+    for msg in shown:
+        render_message(msg)
+
+def stop_generating():
+    """"Stop generating" callback; the interrupted run has usually cancelled already"""
+    token = st.session_state.get("cancel_token")
+    if token is not None:
+        token.cancel()
+
+def _start_stream(key: str):
+    """Stop button and heartbeat for a stream about to start.
+
+    Streamlit only stops a script run at its next ``st`` call, so while no
+    event arrives the heartbeat placeholder is touched every
+    STOP_CHECK_INTERVAL seconds to let a click (or a new prompt) through.
+    """
+    token = CancellationToken()
+    st.session_state.cancel_token = token
+    stop_placeholder = st.empty()
+    stop_placeholder.button("⏹ Stop generating", key=key, on_click=stop_generating)
+    heartbeat = st.empty()
+    return token, stop_placeholder, heartbeat
+
 async def render_chat_interface():
     """Render the main chat interface"""
     st.title("🤖 Multi-Agent Thinking Chat")
     
     # Chat history display
-    for msg in st.session_state.chat_history:
-        with st.chat_message(msg["role"]):
-            if msg.get("thinking") and st.session_state.selected_model.supports_thinking:
-                with st.expander("Thinking Process"):
-                    st.write(msg["thinking"])
-            st.write(msg["content"])
+    render_transcript()
     
     # Chat input
     if prompt := st.chat_input("Enter your message"):
         # Add user message to chat history
-        st.session_state.chat_history.append({
+        add_message({
             "role": "user",
             "content": prompt
         })
+        # Earlier turns, sent as conversation context
+        history = st.session_state.chat_history[:-1]
+        
+        compare_models = [
+            model for model in AVAILABLE_MODELS
+            if model.name in st.session_state.compare_models
+        ]
+        if st.session_state.compare_mode and len(compare_models) > 1:
+            await render_compare_response(prompt, compare_models, history)
+            return
         
         # Get response from current agent
         with st.chat_message("assistant"):
             thinking_placeholder = st.empty()
             response_placeholder = st.empty()
+            metrics_placeholder = st.empty()
             
             agent = st.session_state.current_agent
             if agent:
-                message_placeholder = st.empty()
-                thinking = ""
-                response = ""
-                
-                import asyncio
+                renderer = StreamRenderer(
+                    response_placeholder,
+                    thinking_placeholder,
+                    max_fps=RENDER_MAX_FPS,
+                    flush_chars=RENDER_FLUSH_CHARS,
+                    live_thinking=st.session_state.live_thinking
+                )
+                stream = renderer.stream
+                token, stop_placeholder, heartbeat = _start_stream("stop_generating")
                 
                 try:
-                    async def process_stream():
-                        nonlocal thinking, response
-                        async for chunk in agent.stream_chat(prompt):
-                            thinking = chunk["thinking"]
-                            response = chunk["response"]
-                            
-                            if thinking and st.session_state.selected_model.supports_thinking:
-                                with thinking_placeholder:
-                                    with st.expander("Thinking Process"):
-                                        st.write(thinking)
-                            
-                            if response:
-                                response_placeholder.write(response)
-                    
-                    # Run the async stream processing
-                    await process_stream()
-                    
-                    # Add assistant message to chat history
-                    history_entry = {
-                        "role": "assistant",
-                        "content": response
-                    }
-                    if st.session_state.selected_model.supports_thinking:
-                        history_entry["thinking"] = thinking
-                    st.session_state.chat_history.append(history_entry)
-                    
+                    # aclosing() stops the provider stream if the script run is interrupted
+                    async with aclosing(iterate_on_io_loop(
+                        agent.stream_chat(
+                            prompt,
+                            history=select_turns(history, st.session_state.selected_model.name),
+                            bypass_cache=st.session_state.bypass_cache,
+                            cancel=token
+                        ),
+                        STOP_CHECK_INTERVAL,
+                        heartbeat.empty
+                    )) as events:
+                        async for event in events:
+                            renderer.feed(event)
                 except Exception as e:
                     st.error(f"Error generating response: {str(e)}")
+                finally:
+                    # Also reached when Stop, a new prompt or navigation ends this run:
+                    # the answer so far is kept, before anything else touches the page
+                    cancelled = stream.cancelled or not stream.done
+                    token.cancel()
+                    renderer.finish()
+                    metrics = renderer.metrics()
+                    if cancelled:
+                        metrics["cancelled"] = True
+                    if stream.response_buffer or stream.thinking_buffer:
+                        history_entry = {
+                            "role": "assistant",
+                            "content": stream.response,
+                            "metrics": metrics
+                        }
+                        if stream.thinking_buffer:
+                            history_entry["thinking"] = stream.thinking
+                        add_message(history_entry)
+                    stop_placeholder.empty()
+                    renderer.close()
+                    metrics_placeholder.caption(format_metrics(metrics))
+                    st.session_state.render_stats = {
+                        "writes": renderer.writes,
+                        "writes_avoided": renderer.writes_avoided
+                    }
             else:
                 st.warning("Please initialize an agent first")
 
+def _compare_metrics(renderer: StreamRenderer, timing: Optional[StreamTiming]) -> Dict[str, Any]:
+    # Fan-out timings are taken where the events arrive, ahead of rendering
+    metrics = renderer.metrics()
+    if timing is not None:
+        if timing.time_to_first_token is not None:
+            metrics["time_to_first_token"] = round(timing.time_to_first_token, 3)
+        if timing.total is not None:
+            metrics["duration"] = round(timing.total, 3)
+        if timing.cancelled:
+            metrics["cancelled"] = True
+    return metrics
+
+async def render_compare_response(prompt: str, models: List[ModelConfig], history: List[Dict[str, Any]]):
+    """Stream one prompt to several agents side by side"""
+    agents = get_compare_agents(models)
+    with st.chat_message("assistant"):
+        token, stop_placeholder, heartbeat = _start_stream("stop_generating_compare")
+        renderers = {}
+        timing_placeholders = {}
+        for column, name in zip(st.columns(len(agents)), agents):
+            with column:
+                st.caption(name)
+                thinking_placeholder = st.empty()
+                response_placeholder = st.empty()
+                timing_placeholders[name] = st.empty()
+                renderers[name] = StreamRenderer(
+                    response_placeholder,
+                    thinking_placeholder,
+                    max_fps=RENDER_MAX_FPS,
+                    flush_chars=RENDER_FLUSH_CHARS,
+                    live_thinking=st.session_state.live_thinking
+                )
+        
+        fan_out = FanOut(
+            agents,
+            prompt,
+            first_wins=st.session_state.first_wins,
+            agent_kwargs={name: {"history": select_turns(history, name)} for name in agents},
+            bypass_cache=st.session_state.bypass_cache,
+            cancel=token
+        )
+        try:
+            async with aclosing(iterate_on_io_loop(fan_out.events(), STOP_CHECK_INTERVAL, heartbeat.empty)) as events:
+                async for name, event in events:
+                    renderers[name].feed(event)
+                    if isinstance(event, Done):
+                        renderers[name].close()
+                        timing_placeholders[name].caption(
+                            format_metrics(_compare_metrics(renderers[name], fan_out.timings[name]))
+                        )
+        except Exception as e:
+            st.error(f"Error generating response: {str(e)}")
+        finally:
+            # Keep every answer so far, before anything else touches the page (see render_chat_interface)
+            token.cancel()
+            metrics = {}
+            for name, renderer in renderers.items():
+                renderer.finish()
+                metrics[name] = _compare_metrics(renderer, fan_out.timings.get(name))
+                if renderer.stream.cancelled or not renderer.stream.done:
+                    metrics[name]["cancelled"] = True
+                if renderer.stream.response_buffer or renderer.stream.thinking_buffer:
+                    history_entry = {
+                        "role": "assistant",
+                        "content": renderer.stream.response,
+                        "agent": name,
+                        "metrics": metrics[name]
+                    }
+                    if renderer.stream.thinking_buffer:
+                        history_entry["thinking"] = renderer.stream.thinking
+                    add_message(history_entry)
+            stop_placeholder.empty()
+            for name, renderer in renderers.items():
+                renderer.close()
+                timing_placeholders[name].caption(format_metrics(metrics[name]))
+
 def render_model_info(model: Optional[ModelConfig]):
     """Render information about the currently selected model"""
     if model:
         st.write(f"**Provider:** {model.provider}")
         st.write(f"**Description:** {model.description}")
+    
+    cache = get_response_cache()
+    if cache is not None:
+        with st.expander("Response Cache"):
+            st.json(cache.stats())
+    
+    with st.expander("Connection Pool"):
+        st.json(get_client_pool().stats())
+    
+    with st.expander("Model Catalog"):
+        st.json(get_model_catalog().stats())
+    
+    history_stats = get_history_store().stats()
+    if history_stats:
+        with st.expander("History Store"):
+            st.json(history_stats)
+    
+    rate_limits = get_rate_scheduler().stats()
+    if rate_limits:
+        with st.expander("Rate Limits"):
+            st.json(rate_limits)
+    
+    # The resilience layer sits under the response cache wrapper, if any
+    agent = st.session_state.current_agent
+    while agent is not None and not isinstance(agent, ResilientAgent):
+        agent = getattr(agent, "agent", None)
+    if agent is not None:
+        with st.expander("Retries & Failover"):
+            st.json(agent.stats())
+
+
+@st.fragment(run_every=METRICS_PANEL_REFRESH)
+def render_latency_panel():
+    """Live per-provider latency over the recent streams of this process"""
+    st.subheader("Latency")
+    registry = get_metrics_registry()
+    rows = registry.summary()
+    if not rows:
+        st.caption("No requests yet")
+        return
+    for row in rows:
+        counts = f"{row['requests']} requests, {row['errors']} errors"
+        if row["cancelled"]:
+            counts += f", {row['cancelled']} stopped (~{row['tokens_saved']} tokens saved)"
+        if row["hedges_lost"]:
+            counts += f", {row['hedges_lost']} lost to a hedge"
+        st.write(f"**{row['provider']}** · {counts}")
+        figures = []
+        if row["ttft_p50"] is not None:
+            figures.append(f"first token p50 {row['ttft_p50']:.2f}s / p95 {row['ttft_p95']:.2f}s")
+        if row["itl_p50"] is not None:
+            figures.append(f"inter-token p50 {row['itl_p50'] * 1000:.0f}ms")
+        if row["tokens_per_s_p50"] is not None:
+            figures.append(f"{row['tokens_per_s_p50']:.0f} tokens/s")
+        if row["duration_p95"] is not None:
+            figures.append(f"total p95 {row['duration_p95']:.2f}s")
+        if row["reasoning_tokens"]:
+            reasoning = f"{row['reasoning_tokens']} reasoning tokens"
+            if row["reasoning_p50"] is not None:
+                reasoning += f" (p50 {row['reasoning_p50']:.2f}s)"
+            figures.append(reasoning)
+        if figures:
+            st.caption(" · ".join(figures))
+    st.download_button(
+        "Export Prometheus metrics",
+        registry.to_prometheus(),
+        file_name="metrics.prom",
+        mime="text/plain"
+    )
\ No newline at end of file
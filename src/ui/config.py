@@ -1,65 +1,30 @@
-from typing import Dict, List, Optional
-from dataclasses import dataclass
+import asyncio
+import uuid
+from typing import Any, Dict, List, Optional
 import streamlit as st
-from src.utils.config import get_api_key, load_env_config
+from src.utils.aio import get_io_loop
+from src.utils.config import load_env_config
+from src.utils.factory import (
+    build_agent, get_available_models, get_client_pool, get_history_store, get_metrics_registry,
+    get_model_catalog, get_rate_scheduler, get_response_cache
+)
 from src.agents.base import BaseAgent
-from src.agents.openai import OpenAIAgent
-from src.agents.anthropic import AnthropicAgent
-from src.agents.gemini import GeminiAgent
-from src.agents.together import TogetherAgent
-from src.agents.openrouter import OpenRouterAgent
+from src.agents.catalog import ModelSpec
+# Provider SDKs are imported lazily, when an agent is first created
+from src.agents.registry import AVAILABLE_MODELS, ModelConfig
 
-@dataclass
-class ModelConfig:
-    name: str
-    provider: str
-    api_key_name: str
-    description: str
-    agent_class: type[BaseAgent]
-    supports_thinking: bool = False
-
-AVAILABLE_MODELS: List[ModelConfig] = [
-    ModelConfig(
-        name="GPT-4 Turbo",
-        provider="OpenAI",
-        api_key_name="OPENAI_API_KEY",
-        description="Latest GPT-4 model with improved performance",
-        agent_class=OpenAIAgent,
-        supports_thinking=False
-    ),
-    ModelConfig(
-        name="Claude 3 Opus",
-        provider="Anthropic",
-        api_key_name="ANTHROPIC_API_KEY",
-        description="Most capable Claude model for complex tasks",
-        agent_class=AnthropicAgent,
-        supports_thinking=False
-    ),
-    ModelConfig(
-        name="Gemini Pro",
-        provider="Google",
-        api_key_name="GOOGLE_API_KEY",
-        description="Google's latest language model with thinking process",
-        agent_class=GeminiAgent,
-        supports_thinking=True
-    ),
-    ModelConfig(
-        name="Mixtral-8x7B",
-        provider="Together AI",
-        api_key_name="TOGETHER_API_KEY",
-        description="Open source large language model by Meta",
-        agent_class=TogetherAgent,
-        supports_thinking=False
-    ),
-    ModelConfig(
-        name="OpenRouter Hub",
-        provider="OpenRouter",
-        api_key_name="OPENROUTER_API_KEY",
-        description="Access to multiple LLM providers through a single API",
-        agent_class=OpenRouterAgent,
-        supports_thinking=False
-    )
-]
+# Streamed output is flushed to the page at most this often...
+RENDER_MAX_FPS = 15
+# ...or as soon as this many new characters are pending
+RENDER_FLUSH_CHARS = 400
+# Messages shown in the transcript, and added by each "Load earlier messages"
+TRANSCRIPT_PAGE_SIZE = 50
+# Messages kept in session memory; older ones are read back from the history store
+HISTORY_WINDOW = 200
+# Seconds between checks for a Stop click while waiting for the next token
+STOP_CHECK_INTERVAL = 0.25
+# Seconds between refreshes of the live latency panel
+METRICS_PANEL_REFRESH = 2
 
 def initialize_session_state():
     """Initialize Streamlit session state variables"""
@@ -69,16 +34,37 @@ def initialize_session_state():
     if 'selected_model' not in st.session_state:
         st.session_state.selected_model = AVAILABLE_MODELS[0]
     if 'chat_history' not in st.session_state:
+        # The newest HISTORY_WINDOW messages of the conversation, without thinking text
         st.session_state.chat_history = []
+    if 'conversation_id' not in st.session_state:
+        # Created in the history store with the first message
+        st.session_state.conversation_id = None
+    if 'history_total' not in st.session_state:
+        st.session_state.history_total = 0
+    if 'transcript_limit' not in st.session_state:
+        st.session_state.transcript_limit = TRANSCRIPT_PAGE_SIZE
+    if 'compare_mode' not in st.session_state:
+        st.session_state.compare_mode = False
+    if 'compare_models' not in st.session_state:
+        st.session_state.compare_models = []
+    if 'first_wins' not in st.session_state:
+        st.session_state.first_wins = False
+    if 'bypass_cache' not in st.session_state:
+        st.session_state.bypass_cache = False
+    if 'live_thinking' not in st.session_state:
+        # Reasoning is summarised in one status line unless streamed live
+        st.session_state.live_thinking = False
+    if 'compare_agents' not in st.session_state:
+        st.session_state.compare_agents = {}
+    if 'session_id' not in st.session_state:
+        # Rate-limit queues are served fairly per session
+        st.session_state.session_id = uuid.uuid4().hex
     if 'current_agent' not in st.session_state:
         st.session_state.current_agent = None
         # Initialize the first available model with valid API key
-        for model in AVAILABLE_MODELS:
-            api_key = get_api_key(model.api_key_name)
-            if api_key:
-                create_agent(model)
-                st.session_state.selected_model = model
-                break
+        available_models = get_available_models()
+        if available_models:
+            create_agent(available_models[0])
 
 def get_current_agent() -> Optional[BaseAgent]:
     """Get the currently initialized agent"""
@@ -86,10 +72,66 @@ def get_current_agent() -> Optional[BaseAgent]:
 
 def create_agent(model_config: ModelConfig) -> Optional[BaseAgent]:
     """Create and initialize a new agent instance"""
-    api_key = get_api_key(model_config.api_key_name)
-    if not api_key:
+    agent = build_agent(model_config, session=st.session_state.session_id)
+    if agent is None:
         return None
         
-    agent = model_config.agent_class(api_key=api_key)
     st.session_state.current_agent = agent
+    st.session_state.selected_model = model_config
+    # Fetch the provider's model list in the background, unless it is still fresh
+    asyncio.run_coroutine_threadsafe(get_model_catalog().refresh(model_config.provider, agent), get_io_loop())
     return agent
+
+def switch_model(spec: ModelSpec):
+    """Point the current agent at another model of its provider; its pooled client is kept"""
+    st.session_state.current_agent.set_model(spec)
+
+def refresh_models(timeout: float = 30.0) -> List[ModelSpec]:
+    """Fetch the current provider's model list now"""
+    # On the I/O loop, where the agent's pooled client lives
+    future = asyncio.run_coroutine_threadsafe(
+        get_model_catalog().refresh(st.session_state.selected_model.provider, st.session_state.current_agent, force=True),
+        get_io_loop()
+    )
+    return future.result(timeout)
+
+def get_compare_agents(model_configs: List[ModelConfig]) -> Dict[str, BaseAgent]:
+    """Agents for compare mode, created once per session and model"""
+    agents = {}
+    for model_config in model_configs:
+        agent = st.session_state.compare_agents.get(model_config.name)
+        if agent is None:
+            # Compare mode shows each model's own answer, so no failover
+            agent = build_agent(model_config, failover=False, session=st.session_state.session_id)
+            if agent is None:
+                continue
+            st.session_state.compare_agents[model_config.name] = agent
+        agents[model_config.name] = agent
+    return agents
+
+def add_message(message: Dict[str, Any]) -> Dict[str, Any]:
+    """Store a chat message and keep only the newest HISTORY_WINDOW in the session"""
+    store = get_history_store()
+    if st.session_state.conversation_id is None:
+        st.session_state.conversation_id = store.create_conversation(message["content"])
+    stored = store.append(st.session_state.conversation_id, message)
+    history = st.session_state.chat_history
+    history.append(stored)
+    if len(history) > HISTORY_WINDOW:
+        del history[:len(history) - HISTORY_WINDOW]
+    st.session_state.history_total += 1
+    return stored
+
+def new_conversation():
+    st.session_state.conversation_id = None
+    st.session_state.chat_history = []
+    st.session_state.history_total = 0
+    st.session_state.transcript_limit = TRANSCRIPT_PAGE_SIZE
+
+def resume_conversation(conversation_id: str):
+    """Load the newest messages of a stored conversation into the session"""
+    store = get_history_store()
+    st.session_state.conversation_id = conversation_id
+    st.session_state.chat_history = store.messages(conversation_id, HISTORY_WINDOW)
+    st.session_state.history_total = store.count(conversation_id)
+    st.session_state.transcript_limit = TRANSCRIPT_PAGE_SIZE
@@ -0,0 +1,171 @@
+import time
+from typing import Any, Callable, Dict, Optional
+import streamlit as st
+from src.agents.base import Queued, StreamAccumulator, StreamEvent, TextDelta, ThinkingDelta
+
+class StreamRenderer:
+    """Merge streamed deltas and flush them to placeholders at a capped rate.
+
+    A flush happens when at least ``1 / max_fps`` seconds have passed since the
+    previous one or ``flush_chars`` new characters are pending, and always on
+    ``close()``. Every delta that did not cause its own write counts as avoided.
+
+    Reasoning traces can be far longer than the answer, so unless
+    ``live_thinking`` is set only a one-line status (time and token count) is
+    written for them; the text is kept in ``stream`` for the history.
+    """
+
+    def __init__(
+        self,
+        response_placeholder,
+        thinking_placeholder=None,
+        max_fps: float = 15,
+        flush_chars: int = 400,
+        clock: Callable[[], float] = time.monotonic,
+        live_thinking: bool = False
+    ):
+        self.stream = StreamAccumulator()
+        self._response_placeholder = response_placeholder
+        self._thinking_placeholder = thinking_placeholder
+        self._live_thinking = live_thinking
+        self._thinking_body = None
+        self._thinking_settled = False
+        self._min_interval = 1.0 / max_fps if max_fps > 0 else 0.0
+        self._flush_chars = flush_chars
+        self._clock = clock
+        self._last_flush: Optional[float] = None
+        self._pending_thinking = 0
+        self._pending_response = 0
+        self.deltas = 0
+        self.writes = 0
+        self.started = clock()
+        self.first_token_at: Optional[float] = None
+        self.first_thinking_at: Optional[float] = None
+        self.first_text_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def writes_avoided(self) -> int:
+        return max(0, self.deltas - self.writes)
+
+    def feed(self, event: StreamEvent) -> None:
+        """Record an event and flush if the frame budget allows it"""
+        self.stream.feed(event)
+        cls = event.__class__
+        if cls is TextDelta:
+            if self.first_text_at is None:
+                self.first_text_at = self._clock()
+                if self.first_token_at is None:
+                    self.first_token_at = self.first_text_at
+            self._pending_response += len(event.text)
+        elif cls is ThinkingDelta:
+            if self.first_thinking_at is None:
+                self.first_thinking_at = self._clock()
+                if self.first_token_at is None:
+                    self.first_token_at = self.first_thinking_at
+            if self._thinking_placeholder is None:
+                return
+            self._pending_thinking += len(event.text)
+        elif cls is Queued:
+            # Shown where the answer will appear until the request is let through
+            if event.position:
+                self._response_placeholder.caption(f"⏳ Waiting for a free slot (position {event.position} in queue)")
+            else:
+                self._response_placeholder.empty()
+            return
+        else:
+            return
+        self.deltas += 1
+        if self._due():
+            self.flush()
+
+    def _due(self) -> bool:
+        if self._last_flush is None:
+            return True
+        if self._pending_response + self._pending_thinking >= self._flush_chars:
+            return True
+        return self._clock() - self._last_flush >= self._min_interval
+
+    def _thinking_status(self) -> str:
+        tokens = f"~{(len(self.stream.thinking_buffer) + 3) // 4} tokens"
+        if self.first_text_at is None:
+            return f"🧠 Thinking… {tokens}"
+        return f"🧠 Thought for {self.first_text_at - self.first_thinking_at:.1f}s · {tokens}"
+
+    def flush(self) -> None:
+        """Write everything pending to the placeholders"""
+        if self._live_thinking:
+            if self._pending_thinking:
+                if self._thinking_body is None:
+                    # Build the expander once and only update its body afterwards
+                    with self._thinking_placeholder:
+                        with st.expander("Thinking Process", expanded=True):
+                            self._thinking_body = st.empty()
+                self._thinking_body.write(self.stream.thinking)
+                self.writes += 1
+        elif self._pending_thinking or (
+            self.first_text_at is not None and self.stream.thinking_buffer
+            and self._thinking_placeholder is not None and not self._thinking_settled
+        ):
+            # Once the answer has started the status is final
+            self._thinking_settled = self.first_text_at is not None
+            self._thinking_placeholder.caption(self._thinking_status())
+            self.writes += 1
+        if self._pending_response:
+            self._response_placeholder.write(self.stream.response)
+            self.writes += 1
+        self._pending_thinking = 0
+        self._pending_response = 0
+        self._last_flush = self._clock()
+
+    def finish(self) -> None:
+        """Record the end of the stream, without touching the page"""
+        if self.finished_at is None:
+            self.finished_at = self._clock()
+
+    def close(self) -> None:
+        """Final flush once the stream has ended"""
+        self.flush()
+        self.finish()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Timing and token usage of the rendered message"""
+        metrics: Dict[str, Any] = {}
+        if self.first_token_at is not None:
+            metrics["time_to_first_token"] = round(self.first_token_at - self.started, 3)
+        if self.finished_at is not None:
+            metrics["duration"] = round(self.finished_at - self.started, 3)
+        if self.stream.usage is not None:
+            metrics.update(self.stream.usage.as_dict())
+        if self.first_thinking_at is not None and self.first_text_at is not None:
+            metrics["reasoning_time"] = round(self.first_text_at - self.first_thinking_at, 3)
+        if not metrics.get("reasoning_tokens") and self.stream.thinking_buffer:
+            # Estimated when the provider does not count them
+            metrics["reasoning_tokens"] = (len(self.stream.thinking_buffer) + 3) // 4
+        return metrics
+
+def format_metrics(metrics: Dict[str, Any]) -> str:
+    """One-line caption for a message's metrics"""
+    parts = []
+    if "time_to_first_token" in metrics:
+        parts.append(f"first token {metrics['time_to_first_token']:.2f}s")
+    if "duration" in metrics:
+        parts.append(f"total {metrics['duration']:.2f}s")
+    if metrics.get("input_tokens") or metrics.get("output_tokens"):
+        tokens = f"{metrics.get('input_tokens', 0)} in / {metrics.get('output_tokens', 0)} out tokens"
+        cached = []
+        if metrics.get("cache_read_tokens"):
+            cached.append(f"{metrics['cache_read_tokens']} cache read")
+        if metrics.get("cache_write_tokens"):
+            cached.append(f"{metrics['cache_write_tokens']} cache write")
+        if cached:
+            tokens += f" ({', '.join(cached)})"
+        parts.append(tokens)
+    if metrics.get("reasoning_tokens"):
+        reasoning = f"reasoning {metrics['reasoning_tokens']} tokens"
+        if "reasoning_time" in metrics:
+            reasoning += f" / {metrics['reasoning_time']:.2f}s"
+        parts.append(reasoning)
+    if metrics.get("cancelled"):
+        parts.append("stopped")
+    return " · ".join(parts)
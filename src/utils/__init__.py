@@ -1,3 +1,3 @@
-from .config import get_api_key
+from .config import Settings, get_api_key, get_setting, get_settings
 
-__all__ = ['get_api_key']
\ No newline at end of file
+__all__ = ['Settings', 'get_api_key', 'get_setting', 'get_settings']
\ No newline at end of file
@@ -0,0 +1,72 @@
+import asyncio
+import threading
+from typing import AsyncIterator, Callable, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+_io_loop: Optional[asyncio.AbstractEventLoop] = None
+_io_loop_lock = threading.Lock()
+
+def get_io_loop() -> asyncio.AbstractEventLoop:
+    """Return the process-wide event loop that runs all provider I/O.
+
+    Streamlit runs every script rerun in a fresh ``asyncio.run`` loop, while
+    pooled HTTP clients are bound to the loop they first connected on. Running
+    agent streams on one long-lived loop lets those clients be shared across
+    reruns and sessions.
+    """
+    global _io_loop
+    with _io_loop_lock:
+        if _io_loop is None or _io_loop.is_closed():
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="agent-io-loop", daemon=True)
+            thread.start()
+            _io_loop = loop
+        return _io_loop
+
+async def _step(agen: AsyncIterator[T], running: List[asyncio.Task]) -> T:
+    # Remember the task so a close can cancel it and wait for it to unwind
+    running[:] = [asyncio.current_task()]
+    return await agen.__anext__()
+
+async def _aclose_quietly(agen, running: List[asyncio.Task]) -> None:
+    for task in running:
+        if not task.done():
+            task.cancel()
+            await asyncio.wait((task,))
+    try:
+        await agen.aclose()
+    except RuntimeError:
+        # Closed by the cancellation already
+        pass
+
+async def iterate_on_io_loop(
+    agen: AsyncIterator[T],
+    idle_interval: Optional[float] = None,
+    on_idle: Optional[Callable[[], None]] = None
+) -> AsyncIterator[T]:
+    """Drive an async generator on the I/O loop and yield its items here.
+
+    Cancelling or closing this iterator cancels the pending step on the I/O
+    loop and closes the source generator, releasing its connection. While no
+    item arrives, ``on_idle`` is called every ``idle_interval`` seconds; an
+    exception it raises (such as Streamlit stopping the script run) ends the
+    iteration the same way.
+    """
+    loop = get_io_loop()
+    running: List[asyncio.Task] = []
+    try:
+        while True:
+            step = asyncio.wrap_future(asyncio.run_coroutine_threadsafe(_step(agen, running), loop))
+            if on_idle is None:
+                await asyncio.wait((step,))
+            else:
+                while not (await asyncio.wait((step,), timeout=idle_interval))[0]:
+                    on_idle()
+            try:
+                item = step.result()
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        asyncio.run_coroutine_threadsafe(_aclose_quietly(agen, running), loop)
@@ -1,14 +1,89 @@
+import logging
 import os
+import threading
+import time
 from pathlib import Path
-from dotenv import load_dotenv
-from typing import Optional
+from dotenv import dotenv_values
+from typing import Dict, Optional, Set, Tuple
+
+ENV_PATH = Path(__file__).parents[2] / '.env'
+
+class Settings:
+    """Environment configuration loaded once from the .env file.
+
+    The file is re-read only when its modification time or size changes
+    (checked at most every ``check_interval`` seconds), so rotated keys are
+    picked up without a restart. Values are exported to ``os.environ`` as
+    ``load_dotenv`` did; variables set by the real environment take precedence.
+    """
+
+    def __init__(self, path: Path = ENV_PATH, check_interval: float = 1.0):
+        self.path = Path(path)
+        self.check_interval = check_interval
+        self.reads = 0
+        self.version = 0
+        self._signature: Optional[Tuple[int, int]] = None
+        self._checked_at: Optional[float] = None
+        self._exported: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def _file_signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def refresh(self, force: bool = False) -> bool:
+        """Reload the file if it changed; returns True when it was re-read"""
+        now = time.monotonic()
+        with self._lock:
+            if not force and self._checked_at is not None and now - self._checked_at < self.check_interval:
+                return False
+            self._checked_at = now
+            signature = self._file_signature()
+            if not force and self.version and signature == self._signature:
+                return False
+            values: Dict[str, Optional[str]] = dotenv_values(self.path) if signature else {}
+            self.reads += 1
+            self._signature = signature
+            for name in self._exported - values.keys():
+                os.environ.pop(name, None)
+            for name, value in values.items():
+                # Only overwrite variables that came from this file in the first place
+                if value is not None and (name not in os.environ or name in self._exported):
+                    os.environ[name] = value
+                    self._exported.add(name)
+            self.version += 1
+            return True
+
+    def get(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        self.refresh()
+        return os.environ.get(name, default)
+
+_settings: Optional[Settings] = None
+
+def get_settings() -> Settings:
+    """Process-wide settings shared by every session"""
+    global _settings
+    if _settings is None:
+        _settings = Settings()
+    return _settings
 
 def load_env_config() -> None:
-    """Load environment variables from .env file"""
-    env_path = Path(__file__).parents[2] / '.env'
-    load_dotenv(env_path)
+    """Load environment variables from .env file (only if it changed)"""
+    get_settings().refresh()
 
 def get_api_key(key_name: str) -> Optional[str]:
     """Get API key from environment variables"""
-    load_env_config()  # Ensure environment is loaded
-    return os.getenv(key_name)
+    return get_settings().get(key_name)
+
+def get_setting(key_name: str, default: Optional[str] = None) -> Optional[str]:
+    """Get an optional setting from environment variables"""
+    return get_settings().get(key_name, default)
+
+def configure_logging() -> None:
+    """Apply LOG_LEVEL (default WARNING); debug output replaces the old prints"""
+    level = (get_setting("LOG_LEVEL") or "WARNING").upper()
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    logging.getLogger("src").setLevel(getattr(logging, level, logging.WARNING))
@@ -0,0 +1,214 @@
+# Agent construction shared by the Streamlit UI, the API server and the batch
+# runner. The pool, cache, metrics, rate limits, model catalog and chat history
+# store are created once per process.
+import re
+from functools import lru_cache
+from typing import List, Optional, Tuple
+from src.utils.config import get_api_key, get_setting, get_settings
+from src.utils.history import HistoryStore, MemoryHistoryStore, SQLiteHistoryStore
+from src.agents.base import BaseAgent
+from src.agents.cache import CachedAgent, ResponseCache
+from src.agents.catalog import ModelCatalog
+from src.agents.context import SummarizePolicy
+from src.agents.metrics import InstrumentedAgent, MetricsRegistry
+from src.agents.pool import ClientPool, PoolConfig
+from src.agents.ratelimit import RateLimitedAgent, RateLimits, RateScheduler, SQLiteLimitStore
+from src.agents.resilience import ResilientAgent, RetryPolicy
+from src.agents.routing import ModelRouter, RoutedAgent
+# Provider SDKs are imported lazily, when an agent is first created
+from src.agents.registry import AVAILABLE_MODELS, ModelConfig
+
+@lru_cache(maxsize=None)
+def get_client_pool() -> ClientPool:
+    """Client/connection pool shared by every session and request of this process"""
+    return ClientPool(PoolConfig(
+        max_connections=int(get_setting("HTTP_MAX_CONNECTIONS", "100")),
+        max_connections_per_host=int(get_setting("HTTP_MAX_CONNECTIONS_PER_HOST", "20")),
+        keepalive_expiry=float(get_setting("HTTP_KEEPALIVE_EXPIRY", "60")),
+        http2=get_setting("HTTP2", "1") not in ("0", "false", "False"),
+        connect_timeout=float(get_setting("HTTP_CONNECT_TIMEOUT", "10"))
+    ))
+
+@lru_cache(maxsize=None)
+def get_response_cache() -> Optional[ResponseCache]:
+    """Response cache shared by every session, or None when disabled"""
+    if get_setting("RESPONSE_CACHE", "1") in ("0", "false", "False"):
+        return None
+    ttl = float(get_setting("RESPONSE_CACHE_TTL", "86400"))
+    return ResponseCache(
+        max_entries=int(get_setting("RESPONSE_CACHE_MAX_ENTRIES", "256")),
+        ttl=ttl if ttl > 0 else None,
+        path=get_setting("RESPONSE_CACHE_PATH"),
+        max_disk_bytes=int(float(get_setting("RESPONSE_CACHE_MAX_DISK_MB", "64")) * 1024 * 1024)
+    )
+
+@lru_cache(maxsize=None)
+def get_metrics_registry() -> MetricsRegistry:
+    """Stream metrics shared by every session of this process"""
+    return MetricsRegistry(
+        capacity=int(get_setting("METRICS_BUFFER_SIZE", "1000")),
+        otel=get_setting("METRICS_OTEL", "0") in ("1", "true", "True")
+    )
+
+@lru_cache(maxsize=None)
+def get_rate_scheduler() -> RateScheduler:
+    """Rate limits shared by every session; RATE_LIMIT_DB shares them across processes too"""
+    path = get_setting("RATE_LIMIT_DB")
+    return RateScheduler(SQLiteLimitStore(path) if path else None)
+
+@lru_cache(maxsize=None)
+def get_history_store() -> HistoryStore:
+    """Chat history shared by every session; SQLite unless HISTORY_STORE=memory"""
+    if get_setting("HISTORY_STORE", "sqlite") == "memory":
+        return MemoryHistoryStore()
+    return SQLiteHistoryStore(
+        get_setting("HISTORY_DB", ".cache/history.sqlite3"),
+        flush_interval=float(get_setting("HISTORY_FLUSH_INTERVAL", "1"))
+    )
+
+@lru_cache(maxsize=None)
+def get_model_catalog() -> ModelCatalog:
+    """Model specs shared by every session; provider listings are cached in MODEL_CATALOG_PATH"""
+    return ModelCatalog(
+        path=get_setting("MODEL_CATALOG_PATH", ".cache/models.json"),
+        ttl=float(get_setting("MODEL_CATALOG_TTL", "86400"))
+    )
+
+def get_model_router(provider: str) -> Optional[ModelRouter]:
+    """Auto-router over the provider's catalogued models when AUTO_ROUTE is on"""
+    if get_setting("AUTO_ROUTE", "0") not in ("1", "true", "True"):
+        return None
+    candidates = get_model_catalog().models(provider)
+    allowed = [name.strip() for name in (get_setting("AUTO_ROUTE_MODELS") or "").split(",") if name.strip()]
+    if allowed:
+        candidates = [spec for spec in candidates if spec.id in allowed]
+    return ModelRouter(candidates, max_prompt_tokens=int(get_setting("AUTO_ROUTE_MAX_PROMPT_TOKENS", "200")))
+
+def get_rate_limits(provider: str) -> RateLimits:
+    """RATE_LIMIT_<PROVIDER>_{RPM,TPM,CONCURRENCY}, falling back to RATE_LIMIT_{RPM,TPM,CONCURRENCY}"""
+    prefix = "RATE_LIMIT_" + re.sub(r"[^A-Z0-9]+", "_", provider.upper()).strip("_")
+    
+    def limit(name: str) -> Optional[str]:
+        return get_setting(f"{prefix}_{name}") or get_setting(f"RATE_LIMIT_{name}")
+    
+    rpm, tpm, concurrency = limit("RPM"), limit("TPM"), limit("CONCURRENCY")
+    return RateLimits(
+        requests_per_minute=float(rpm) if rpm else None,
+        tokens_per_minute=float(tpm) if tpm else None,
+        max_concurrent=int(concurrency) if concurrency else None
+    )
+
+_available_models: Tuple[int, List[ModelConfig]] = (-1, [])
+
+def get_available_models() -> List[ModelConfig]:
+    """Models with an API key configured, recomputed only when the settings change"""
+    global _available_models
+    settings = get_settings()
+    settings.refresh()
+    version, models = _available_models
+    if version != settings.version:
+        models = [model for model in AVAILABLE_MODELS if get_api_key(model.api_key_name)]
+        _available_models = (settings.version, models)
+    return models
+
+def _setting_prefix(model_config: ModelConfig) -> str:
+    return model_config.api_key_name.replace("_API_KEY", "")
+
+def get_model_id(model_config: ModelConfig) -> str:
+    """Provider model id the model's agent will use, without building the agent"""
+    return (
+        get_setting(f"{_setting_prefix(model_config)}_MODEL")
+        or model_config.model_id
+        or model_config.agent_class.default_model
+    )
+
+def _provider_agent(model_config: ModelConfig, session: Optional[str] = None) -> Optional[BaseAgent]:
+    """Instrumented, rate-limited provider agent with the configured model and context policy"""
+    api_key = get_api_key(model_config.api_key_name)
+    if not api_key:
+        return None
+    
+    # e.g. OPENAI_BASE_URL points the OpenAI agent at a proxy or the mock server,
+    # OPENAI_MODEL picks another model
+    agent = model_config.agent_class(
+        api_key=api_key,
+        pool=get_client_pool(),
+        base_url=get_setting(f"{_setting_prefix(model_config)}_BASE_URL"),
+        model=get_model_id(model_config)
+    )
+    agent.params.update(model_config.params)
+    history_budget = model_config.history_budget or get_setting("HISTORY_TOKEN_BUDGET")
+    if history_budget:
+        agent.max_history_tokens = min(int(history_budget), agent.max_history_tokens)
+    spec = get_model_catalog().get(model_config.provider, agent.model_name)
+    if spec is not None:
+        agent.set_model(spec)
+    else:
+        agent.fit_context()
+    reasoning_budget = get_setting("REASONING_BUDGET")
+    if reasoning_budget:
+        # Thinking tokens per answer, where the provider takes a budget (Anthropic)
+        agent.reasoning_budget = int(reasoning_budget)
+    if get_setting("HISTORY_POLICY", "truncate") == "summarize":
+        agent.context.policy = SummarizePolicy()
+    agent = InstrumentedAgent(agent, get_metrics_registry(), provider=model_config.provider)
+    router = get_model_router(model_config.provider)
+    if router is not None:
+        # Outside the instrumentation, so metrics are labelled with the routed model
+        agent = RoutedAgent(agent, router)
+    limits = get_rate_limits(model_config.provider)
+    if limits != RateLimits():
+        # Outside the instrumentation, so time spent queued is not counted as latency
+        limiter = get_rate_scheduler().limiter(model_config.provider, api_key, limits)
+        agent = RateLimitedAgent(agent, limiter, session=session)
+    return agent
+
+def get_retry_policy() -> RetryPolicy:
+    return RetryPolicy(
+        max_attempts=int(get_setting("RETRY_MAX_ATTEMPTS", "3")),
+        max_delay=float(get_setting("RETRY_MAX_DELAY", "20")),
+        first_token_timeout=float(get_setting("FIRST_TOKEN_TIMEOUT", "30")),
+        idle_timeout=float(get_setting("STREAM_IDLE_TIMEOUT", "60"))
+    )
+
+def build_agent(
+    model_config: ModelConfig,
+    failover: bool = True,
+    session: Optional[str] = None
+) -> Optional[BaseAgent]:
+    """Instantiate the full agent stack for a model.
+
+    With ``failover`` the models named in FAILOVER_MODELS (in that order) take
+    over when this one keeps failing; HEDGE_REQUESTS races the first of them
+    against a slow first token. ``session`` identifies the caller for fair
+    rate-limit queueing (``stream_chat(..., session=...)`` overrides it per call).
+    """
+    agent = _provider_agent(model_config, session)
+    if agent is None:
+        return None
+    
+    fallbacks = []
+    if failover:
+        names = [name.strip() for name in (get_setting("FAILOVER_MODELS") or "").split(",") if name.strip()]
+        by_name = {model.name: model for model in get_available_models()}
+        for name in names:
+            if name in by_name and name != model_config.name:
+                fallback = _provider_agent(by_name[name], session)
+                if fallback is not None:
+                    fallbacks.append(fallback)
+    # Instrumented agents sit inside, so every attempt is measured
+    agent = ResilientAgent(
+        agent,
+        fallbacks,
+        policy=get_retry_policy(),
+        hedge=get_setting("HEDGE_REQUESTS", "0") in ("1", "true", "True"),
+        registry=get_metrics_registry()
+    )
+    cache = get_response_cache()
+    if cache is not None:
+        agent = CachedAgent(
+            agent,
+            cache,
+            replay_delay=float(get_setting("RESPONSE_CACHE_REPLAY_DELAY", "0"))
+        )
+    return agent
@@ -0,0 +1,354 @@
+import atexit
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Message = Dict[str, Any]
+
+# Message fields that are persisted; anything else (e.g. cached token counts) stays in memory
+_FIELDS = ("role", "content", "agent", "metrics")
+
+@dataclass
+class Conversation:
+    id: str
+    title: str
+    created: float
+    updated: float
+    messages: int
+
+def _title(text: str, length: int = 60) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= length else text[:length - 1] + "…"
+
+class HistoryStore(ABC):
+    """Chat transcripts outside session memory.
+
+    Messages are numbered per conversation from 0 (``msg["seq"]``). Their
+    thinking text is kept apart and only returned by ``thinking()``; stored
+    messages carry ``has_thinking`` instead.
+    """
+
+    @abstractmethod
+    def create_conversation(self, title: str) -> str:
+        """Start a conversation; returns its id"""
+        pass
+
+    @abstractmethod
+    def append(self, conversation_id: str, message: Message) -> Message:
+        """Store a message; returns it without its thinking, with ``seq`` and ``has_thinking``"""
+        pass
+
+    @abstractmethod
+    def messages(self, conversation_id: str, limit: int, before: Optional[int] = None) -> List[Message]:
+        """Up to ``limit`` messages in order, the newest ones (or those before seq ``before``)"""
+        pass
+
+    @abstractmethod
+    def thinking(self, conversation_id: str, seq: int) -> str:
+        pass
+
+    @abstractmethod
+    def count(self, conversation_id: str) -> int:
+        pass
+
+    @abstractmethod
+    def conversations(self, limit: int = 20) -> List[Conversation]:
+        """Most recently updated conversations first"""
+        pass
+
+    def flush(self) -> None:
+        """Write out anything buffered"""
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+def _compact(message: Message, seq: int) -> Message:
+    compact = {name: message[name] for name in _FIELDS if message.get(name) is not None}
+    compact["seq"] = seq
+    compact["has_thinking"] = bool(message.get("thinking"))
+    return compact
+
+class MemoryHistoryStore(HistoryStore):
+    """Process-local store: survives reruns and session switches, not restarts"""
+
+    def __init__(self):
+        self._conversations: Dict[str, Conversation] = {}
+        self._messages: Dict[str, List[Message]] = {}
+        self._thinking: Dict[Tuple[str, int], str] = {}
+        self._lock = threading.Lock()
+
+    def create_conversation(self, title: str) -> str:
+        conversation_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conversations[conversation_id] = Conversation(conversation_id, _title(title), now, now, 0)
+            self._messages[conversation_id] = []
+        return conversation_id
+
+    def append(self, conversation_id: str, message: Message) -> Message:
+        with self._lock:
+            messages = self._messages[conversation_id]
+            compact = _compact(message, len(messages))
+            messages.append(compact)
+            if compact["has_thinking"]:
+                self._thinking[(conversation_id, compact["seq"])] = message["thinking"]
+            conversation = self._conversations[conversation_id]
+            conversation.updated = time.time()
+            conversation.messages = len(messages)
+        return dict(compact)
+
+    def messages(self, conversation_id: str, limit: int, before: Optional[int] = None) -> List[Message]:
+        with self._lock:
+            messages = self._messages.get(conversation_id, [])
+            end = len(messages) if before is None else max(0, min(before, len(messages)))
+            return [dict(message) for message in messages[max(0, end - limit):end]]
+
+    def thinking(self, conversation_id: str, seq: int) -> str:
+        return self._thinking.get((conversation_id, seq), "")
+
+    def count(self, conversation_id: str) -> int:
+        return len(self._messages.get(conversation_id, []))
+
+    def conversations(self, limit: int = 20) -> List[Conversation]:
+        with self._lock:
+            recent = sorted(self._conversations.values(), key=lambda c: c.updated, reverse=True)
+            return [Conversation(**vars(conversation)) for conversation in recent[:limit]]
+
+class _Batch:
+    """Rows queued for one transaction"""
+
+    def __init__(self):
+        self.messages: List[Tuple] = []
+        self.thinking: List[Tuple[str, int, str]] = []
+        self.conversations: Dict[str, Conversation] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self.messages or self.conversations)
+
+def _row_message(seq: int, role: str, content: str, agent: Optional[str], metrics: Optional[str], has_thinking: int) -> Message:
+    message: Message = {"role": role, "content": content, "seq": seq, "has_thinking": bool(has_thinking)}
+    if agent:
+        message["agent"] = agent
+    if metrics:
+        message["metrics"] = json.loads(metrics)
+    return message
+
+class SQLiteHistoryStore(HistoryStore):
+    """SQLite store with write-behind batching.
+
+    ``append`` only queues the row; a writer thread commits everything queued
+    every ``flush_interval`` seconds, or sooner once ``max_pending`` rows are
+    waiting, in one transaction. Reads merge the queued rows with what is on
+    disk, so they see every message without forcing a commit, and appends do
+    not wait for one. Thinking text lives in its own table and is read one
+    message at a time.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 1.0, max_pending: int = 256):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.flushes = 0
+        self.rows_written = 0
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS conversations ("
+            "id TEXT PRIMARY KEY, title TEXT, created REAL, updated REAL, messages INTEGER);"
+            "CREATE INDEX IF NOT EXISTS conversations_updated ON conversations (updated);"
+            "CREATE TABLE IF NOT EXISTS messages ("
+            "conversation TEXT, seq INTEGER, role TEXT, content TEXT, agent TEXT, metrics TEXT, "
+            "has_thinking INTEGER, created REAL, PRIMARY KEY (conversation, seq)) WITHOUT ROWID;"
+            "CREATE TABLE IF NOT EXISTS thinking ("
+            "conversation TEXT, seq INTEGER, text TEXT, PRIMARY KEY (conversation, seq)) WITHOUT ROWID;"
+        )
+        self._db.commit()
+        # Guards the connection; taken before _lock, never while holding it
+        self._db_lock = threading.Lock()
+        # Guards the queues and known conversations, only ever briefly
+        self._lock = threading.Lock()
+        self._pending = _Batch()
+        # The batch being committed, still read from memory until it is
+        self._writing = _Batch()
+        self._known: Dict[str, Conversation] = {}
+        self._wake = threading.Event()
+        self._closed = False
+        self._writer = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def _conversation(self, conversation_id: str) -> Conversation:
+        # Caller must not hold the lock
+        with self._lock:
+            conversation = self._known.get(conversation_id)
+        if conversation is None:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT id, title, created, updated, messages FROM conversations WHERE id = ?",
+                    (conversation_id,)
+                ).fetchone()
+            if row is None:
+                raise KeyError(conversation_id)
+            with self._lock:
+                conversation = self._known.setdefault(conversation_id, Conversation(*row))
+        return conversation
+
+    def create_conversation(self, title: str) -> str:
+        conversation_id = uuid.uuid4().hex
+        now = time.time()
+        conversation = Conversation(conversation_id, _title(title), now, now, 0)
+        with self._lock:
+            self._known[conversation_id] = conversation
+            self._pending.conversations[conversation_id] = conversation
+        return conversation_id
+
+    def append(self, conversation_id: str, message: Message) -> Message:
+        now = time.time()
+        conversation = self._conversation(conversation_id)
+        with self._lock:
+            compact = _compact(message, conversation.messages)
+            conversation.messages += 1
+            conversation.updated = now
+            self._pending.conversations[conversation_id] = conversation
+            metrics = compact.get("metrics")
+            self._pending.messages.append((
+                conversation_id, compact["seq"], compact["role"], compact.get("content", ""),
+                compact.get("agent"), json.dumps(metrics, separators=(",", ":")) if metrics else None,
+                int(compact["has_thinking"]), now
+            ))
+            if compact["has_thinking"]:
+                self._pending.thinking.append((conversation_id, compact["seq"], message["thinking"]))
+            if len(self._pending.messages) >= self.max_pending:
+                self._wake.set()
+        return compact
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except sqlite3.Error:
+                logger.exception("Writing chat history failed")
+
+    def flush(self) -> None:
+        with self._db_lock:
+            with self._lock:
+                if not self._pending:
+                    return
+                batch = self._writing = self._pending
+                self._pending = _Batch()
+                conversations = [
+                    (c.id, c.title, c.created, c.updated, c.messages) for c in batch.conversations.values()
+                ]
+            try:
+                with self._db:
+                    self._db.executemany(
+                        "INSERT INTO conversations VALUES (?, ?, ?, ?, ?) ON CONFLICT (id) DO UPDATE "
+                        "SET updated = excluded.updated, messages = excluded.messages",
+                        conversations
+                    )
+                    self._db.executemany("INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?, ?, ?)", batch.messages)
+                    self._db.executemany("INSERT OR REPLACE INTO thinking VALUES (?, ?, ?)", batch.thinking)
+            except sqlite3.Error:
+                with self._lock:
+                    # Queue the batch again, ahead of what arrived meanwhile, for the next flush
+                    batch.messages += self._pending.messages
+                    batch.thinking += self._pending.thinking
+                    batch.conversations.update(self._pending.conversations)
+                    self._pending = batch
+                    self._writing = _Batch()
+                raise
+            with self._lock:
+                self._writing = _Batch()
+                self.flushes += 1
+                self.rows_written += len(batch.messages)
+
+    def _unwritten(self) -> Tuple[_Batch, ...]:
+        # Caller holds the lock; oldest first
+        return self._writing, self._pending
+
+    def messages(self, conversation_id: str, limit: int, before: Optional[int] = None) -> List[Message]:
+        end = before if before is not None else 2 ** 62
+        # Queued rows are read before the table: a batch committed in between is then seen twice, never missed
+        with self._lock:
+            queued = [
+                row for batch in self._unwritten() for row in batch.messages
+                if row[0] == conversation_id and row[1] < end
+            ]
+        with self._db_lock:
+            rows = self._db.execute(
+                "SELECT seq, role, content, agent, metrics, has_thinking FROM messages "
+                "WHERE conversation = ? AND seq < ? ORDER BY seq DESC LIMIT ?",
+                (conversation_id, end, limit)
+            ).fetchall()
+        by_seq = {row[0]: row for row in rows}
+        by_seq.update((row[1], row[1:7]) for row in queued)
+        return [_row_message(*by_seq[seq]) for seq in sorted(by_seq)[-limit:]] if limit > 0 else []
+
+    def thinking(self, conversation_id: str, seq: int) -> str:
+        with self._lock:
+            for batch in self._unwritten():
+                for row in batch.thinking:
+                    if row[0] == conversation_id and row[1] == seq:
+                        return row[2]
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT text FROM thinking WHERE conversation = ? AND seq = ?", (conversation_id, seq)
+            ).fetchone()
+        return row[0] if row else ""
+
+    def count(self, conversation_id: str) -> int:
+        try:
+            conversation = self._conversation(conversation_id)
+        except KeyError:
+            return 0
+        with self._lock:
+            return conversation.messages
+
+    def conversations(self, limit: int = 20) -> List[Conversation]:
+        with self._lock:
+            queued = {
+                conversation.id: Conversation(**vars(conversation))
+                for batch in self._unwritten() for conversation in batch.conversations.values()
+            }
+        with self._db_lock:
+            rows = self._db.execute(
+                "SELECT id, title, created, updated, messages FROM conversations "
+                "ORDER BY updated DESC LIMIT ?", (limit,)
+            ).fetchall()
+        recent = {row[0]: Conversation(*row) for row in rows}
+        recent.update(queued)
+        return sorted(recent.values(), key=lambda c: c.updated, reverse=True)[:limit]
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._writer.join()
+        self.flush()
+        with self._db_lock:
+            self._db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "pending": len(self._pending.messages),
+                "flushes": self.flushes,
+                "rows_written": self.rows_written,
+            }
@@ -0,0 +1,37 @@
+import pytest
+
+from src.utils import factory
+
+FACTORY_CACHES = (
+    factory.get_client_pool,
+    factory.get_response_cache,
+    factory.get_metrics_registry,
+    factory.get_rate_scheduler,
+    factory.get_history_store,
+    factory.get_model_catalog,
+)
+
+
+def _reset_factory():
+    for cached in FACTORY_CACHES:
+        cached.cache_clear()
+    factory._available_models = (-1, [])
+
+
+@pytest.fixture
+def mock_env(monkeypatch, tmp_path):
+    """Only the offline Mock model, answering at once, with no shared state on disk"""
+    for name in ("OPENAI", "ANTHROPIC", "GOOGLE", "TOGETHER", "OPENROUTER"):
+        monkeypatch.delenv(f"{name}_API_KEY", raising=False)
+    monkeypatch.setenv("MOCK_API_KEY", "test")
+    monkeypatch.setenv("MOCK_TIME_TO_FIRST_TOKEN", "0")
+    monkeypatch.setenv("MOCK_TOKENS_PER_SECOND", "0")
+    monkeypatch.setenv("MOCK_ANSWER_TOKENS", "5")
+    monkeypatch.setenv("MOCK_SEED", "1")
+    monkeypatch.setenv("RESPONSE_CACHE", "0")
+    monkeypatch.setenv("RETRY_MAX_ATTEMPTS", "1")
+    monkeypatch.setenv("MODEL_CATALOG_PATH", str(tmp_path / "models.json"))
+    monkeypatch.setenv("HISTORY_STORE", "memory")
+    _reset_factory()
+    yield monkeypatch
+    _reset_factory()
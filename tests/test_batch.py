@@ -0,0 +1,91 @@
+import argparse
+import asyncio
+import json
+
+import pytest
+
+from src.batch import finished_pairs, read_rows, run_batch
+
+
+def batch_args(tmp_path, **overrides):
+    values = dict(
+        input=str(tmp_path / "prompts.jsonl"),
+        output=str(tmp_path / "results.jsonl"),
+        models="Mock",
+        concurrency=2,
+        id_field="id",
+        prompt_field="prompt",
+        use_cache=False,
+        failover=False,
+    )
+    values.update(overrides)
+    return argparse.Namespace(**values)
+
+
+def write_prompts(path, count):
+    with open(path, "w") as f:
+        for index in range(count):
+            f.write(json.dumps({"id": f"row-{index}", "prompt": f"question {index}"}) + "\n")
+
+
+def results(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_read_rows_accepts_messages(tmp_path):
+    path = tmp_path / "prompts.jsonl"
+    path.write_text(
+        json.dumps({"id": 1, "prompt": "a"}) + "\n\n"
+        + json.dumps({"messages": [{"role": "user", "content": "b"}]}) + "\n"
+    )
+    assert list(read_rows(str(path), "id", "prompt")) == [("1", "a", []), ("3", "b", [])]
+
+
+def test_finished_pairs_skips_failures_and_cut_lines(tmp_path):
+    path = tmp_path / "results.jsonl"
+    path.write_text(
+        json.dumps({"id": "a", "model": "m", "error": None}) + "\n"
+        + json.dumps({"id": "b", "model": "m", "error": "boom"}) + "\n"
+        + json.dumps({"summary": "not a result"}) + "\n"
+        + json.dumps(["a", "m"]) + "\n"
+        + '{"id": "c", "mod'
+    )
+    assert finished_pairs(str(path)) == {("a", "m")}
+
+
+def test_batch_runs_and_resumes(mock_env, tmp_path):
+    args = batch_args(tmp_path)
+    write_prompts(args.input, 3)
+    assert asyncio.run(run_batch(args)) == 0
+    assert sorted(result["id"] for result in results(args.output)) == ["row-0", "row-1", "row-2"]
+    # Everything succeeded, so a rerun has nothing left to do
+    assert asyncio.run(run_batch(args)) == 0
+    assert len(results(args.output)) == 3
+
+
+def test_failed_rows_have_no_response_text(mock_env, tmp_path):
+    mock_env.setenv("MOCK_ERROR_RATE", "1")
+    args = batch_args(tmp_path)
+    write_prompts(args.input, 2)
+    assert asyncio.run(run_batch(args)) == 1
+    for result in results(args.output):
+        assert result["error"]
+        assert result["response"] == ""
+        assert "thinking" not in result
+
+
+def test_malformed_input_stops_every_worker(mock_env, tmp_path):
+    mock_env.setenv("MOCK_TIME_TO_FIRST_TOKEN", "0.05")
+    args = batch_args(tmp_path, concurrency=4)
+    write_prompts(args.input, 3)
+    with open(args.input, "a") as f:
+        f.write(json.dumps({"id": "bad"}) + "\n")
+
+    async def run():
+        with pytest.raises(ValueError, match="no 'prompt'"):
+            await run_batch(args)
+        # No worker is left streaming on the closed pool
+        return [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+
+    assert asyncio.run(run()) == []
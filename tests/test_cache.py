@@ -0,0 +1,187 @@
+import asyncio
+import sqlite3
+import threading
+import time
+
+from src.agents.base import BaseAgent, CancellationToken, Done, TextDelta, ThinkingDelta, Usage
+from src.agents.cache import CachedAgent, CachedResponse, ResponseCache, cache_key
+
+
+class CountingAgent(BaseAgent):
+    """Answers with the number of calls so far, so fresh generations differ"""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = 0
+        super().__init__("test")
+
+    def _initialize(self):
+        pass
+
+    @property
+    def model_name(self):
+        return "counting"
+
+    async def stream_chat(self, prompt, **kwargs):
+        self.calls += 1
+        if self.error is not None:
+            yield Done(self.error)
+            return
+        yield ThinkingDelta(f"thinking {self.calls}")
+        yield TextDelta(f"answer {self.calls} to {prompt}")
+        yield Usage(3, 4)
+        yield Done()
+
+
+def collect(agent, prompt, **kwargs):
+    async def run():
+        return [event async for event in agent.stream_chat(prompt, **kwargs)]
+    return asyncio.run(run())
+
+
+def text(events, delta_class=TextDelta):
+    return "".join(event.text for event in events if isinstance(event, delta_class))
+
+
+def test_key_ignores_whitespace_and_unicode_form():
+    key = cache_key("m", "Be brief.", [{"role": "user", "content": "café  ok\n"}], {})
+    assert cache_key("m", " Be  brief. ", [{"role": "user", "content": "café ok"}], {}) == key
+    assert cache_key("m", "Be brief.", [{"role": "user", "content": "cafe ok"}], {}) != key
+    assert cache_key("m", "Be brief.", [{"role": "user", "content": "café ok"}], {"temperature": 0}) != key
+
+
+def test_memory_tier_is_lru_bounded():
+    cache = ResponseCache(max_entries=2)
+    for key in "abc":
+        if key == "c":
+            cache.get("a")
+        cache.put(key, CachedResponse(key, "", time.time()))
+    assert cache.get("b") is None
+    assert cache.get("a").response == "a" and cache.get("c").response == "c"
+    assert cache.stats()["memory_entries"] == 2
+
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = ResponseCache(ttl=60, path=str(tmp_path / "cache.db"))
+    cache.put("old", CachedResponse("stale", "", time.time() - 120))
+    assert cache.get("old") is None
+    assert cache.stats()["disk_entries"] == 0
+
+
+def test_disk_tier_survives_reopen_and_is_trimmed(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = ResponseCache(path=path, max_disk_bytes=12)
+    cache.put("first", CachedResponse("12345", "", time.time()))
+    cache.put("second", CachedResponse("67890", "", time.time()))
+    cache.put("third", CachedResponse("abcde", "", time.time()))
+    reopened = ResponseCache(path=path)
+    assert reopened.get("first") is None
+    assert reopened.get("third").response == "abcde"
+    assert reopened.stats()["disk_entries"] == 2
+    assert reopened.stats()["disk_bytes"] == cache.stats()["disk_bytes"] == 10
+
+
+def test_cached_agent_replays_hits():
+    inner = CountingAgent()
+    agent = CachedAgent(inner, ResponseCache(), replay_chunk_chars=3)
+    first = collect(agent, "hello")
+    second = collect(agent, "hello")
+    assert text(second) == text(first) == "answer 1 to hello"
+    assert text(second, ThinkingDelta) == "thinking 1"
+    assert isinstance(second[-1], Done) and second[-1].error is None
+    assert inner.calls == 1 and agent.cache.stats()["hits"] == 1
+    assert text(collect(agent, "hello", bypass_cache=True)) == "answer 2 to hello"
+
+
+def test_history_is_part_of_the_key():
+    inner = CountingAgent()
+    agent = CachedAgent(inner, ResponseCache())
+    collect(agent, "hello")
+    collect(agent, "hello", history=[{"role": "user", "content": "earlier"}, {"role": "assistant", "content": "yes"}])
+    assert inner.calls == 2 and agent.cache.stats()["hits"] == 0
+
+
+def test_failed_answers_are_not_cached():
+    agent = CachedAgent(CountingAgent(error=RuntimeError("down")), ResponseCache())
+    events = collect(agent, "hello")
+    assert isinstance(events[-1], Done) and events[-1].error is not None
+    assert agent.cache.stats() == {"hits": 0, "misses": 1, "hit_rate": 0.0, "memory_entries": 0}
+
+
+def test_stopped_answers_are_not_cached():
+    class StoppedAgent(CountingAgent):
+        async def stream_chat(self, prompt, **kwargs):
+            yield TextDelta("partial")
+            yield Done(cancelled=True)
+
+    agent = CachedAgent(StoppedAgent(), ResponseCache())
+    assert text(collect(agent, "hello")) == "partial"
+    assert agent.cache.stats()["memory_entries"] == 0
+
+
+def test_usage_is_stored_and_replayed(tmp_path):
+    path = str(tmp_path / "cache.db")
+    collect(CachedAgent(CountingAgent(), ResponseCache(path=path)), "hello")
+    inner = CountingAgent()
+    events = collect(CachedAgent(inner, ResponseCache(path=path)), "hello")
+    assert inner.calls == 0
+    usage = [event for event in events if isinstance(event, Usage)]
+    assert [(u.input_tokens, u.output_tokens) for u in usage] == [(3, 4)]
+
+
+def test_request_settings_are_part_of_the_key():
+    inner = CountingAgent()
+    agent = CachedAgent(inner, ResponseCache())
+    collect(agent, "hello")
+    agent.reasoning = True
+    assert inner.reasoning
+    assert text(collect(agent, "hello")) == "answer 2 to hello"
+    inner.reasoning_budget = 512
+    assert text(collect(agent, "hello")) == "answer 3 to hello"
+    assert text(collect(agent, "hello")) == "answer 3 to hello"
+
+
+def test_stop_ends_a_replay():
+    agent = CachedAgent(CountingAgent(), ResponseCache(), replay_chunk_chars=1, replay_delay=0.01)
+    collect(agent, "hello")
+    token = CancellationToken()
+
+    async def run():
+        asyncio.get_running_loop().call_later(0.03, token.cancel)
+        return [event async for event in agent.stream_chat("hello", cancel=token)]
+
+    events = asyncio.run(asyncio.wait_for(run(), 5))
+    assert isinstance(events[-1], Done) and events[-1].cancelled
+    assert len(text(events)) < len("answer 1 to hello")
+
+
+def test_disk_io_runs_off_the_event_loop(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / "cache.db"))
+    threads = []
+    store, load = cache._store, cache._load
+    cache._store = lambda *args: threads.append(threading.current_thread()) or store(*args)
+    cache._load = lambda *args: threads.append(threading.current_thread()) or load(*args)
+
+    async def run():
+        await cache.aput("key", CachedResponse("answer", "", time.time()))
+        cache._memory.clear()
+        return await cache.aget("key")
+
+    assert asyncio.run(run()).response == "answer"
+    assert len(threads) == 2 and threading.main_thread() not in threads
+
+
+def test_older_cache_files_gain_the_usage_column(tmp_path):
+    path = str(tmp_path / "cache.db")
+    db = sqlite3.connect(path)
+    db.execute(
+        "CREATE TABLE responses (key TEXT PRIMARY KEY, response TEXT, thinking TEXT, "
+        "created REAL, accessed REAL, size INTEGER)"
+    )
+    db.execute("INSERT INTO responses VALUES ('old', 'kept', '', ?, ?, 4)", (time.time(), time.time()))
+    db.commit()
+    db.close()
+    cache = ResponseCache(path=path)
+    assert cache.get("old").usage is None
+    cache.put("new", CachedResponse("fresh", "", time.time(), Usage(1, 2)))
+    assert cache.stats()["disk_bytes"] == 9
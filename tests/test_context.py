@@ -0,0 +1,81 @@
+from src.agents.context import (
+    ContextBuilder,
+    SummarizePolicy,
+    TruncatePolicy,
+    from_openai,
+    select_turns,
+    to_anthropic,
+)
+
+
+def make_history(turns, chars=500):
+    return [
+        {"role": "user" if index % 2 == 0 else "assistant", "content": f"{index:04d}" + "x" * (chars - 4)}
+        for index in range(turns)
+    ]
+
+
+def test_builder_ends_with_prompt_and_counts_once():
+    history = make_history(4, chars=40)
+    builder = ContextBuilder(10_000)
+    messages = builder.build(history, "next")
+    assert messages[-1] == {"role": "user", "content": "next"}
+    assert [m["content"] for m in messages[:-1]] == [m["content"] for m in history]
+    assert all("tokens" in message for message in history)
+
+
+def test_truncate_keeps_newest_within_budget():
+    history = make_history(20)
+    kept = TruncatePolicy().fit(history, 1000, lambda message: 129)
+    assert kept == history[-7:]
+
+
+def test_aligned_truncate_never_keeps_less_than_unaligned():
+    count = lambda message: 129
+    for turns in range(1, 50):
+        history = make_history(turns)
+        unaligned = TruncatePolicy().fit(history, 1000, count)
+        aligned = TruncatePolicy(align=8).fit(history, 1000, count)
+        assert len(aligned) >= len(unaligned)
+        assert sum(count(message) for message in aligned) <= 1000
+
+
+def test_aligned_truncate_through_builder():
+    builder = ContextBuilder(1000, TruncatePolicy(align=8))
+    for turns in (24, 32, 40):
+        messages = builder.build(make_history(turns), "next")
+        assert len(messages) > 1
+
+
+def test_aligned_truncate_keeps_boundary_when_it_fits():
+    history = make_history(20)
+    # Turns 16-19 fit, and 16 is already a step boundary
+    assert TruncatePolicy(align=8).fit(history, 4 * 129, lambda message: 129) == history[16:]
+
+
+def test_summarize_replaces_dropped_turns():
+    history = make_history(20, chars=400)
+    kept = SummarizePolicy(summary_tokens=100).fit(history, 1000, lambda message: 100)
+    assert kept[0]["content"].startswith("Summary of the earlier conversation:")
+    assert kept[1:] == history[-9:]
+
+
+def test_select_turns_filters_other_agents():
+    history = [
+        {"role": "user", "content": "q"},
+        {"role": "assistant", "content": "a", "agent": "A"},
+        {"role": "assistant", "content": "b", "agent": "B"},
+        {"role": "assistant", "content": "shared"},
+    ]
+    assert [m["content"] for m in select_turns(history, "A")] == ["q", "a", "shared"]
+
+
+def test_from_openai_and_anthropic_roles():
+    prompt, history = from_openai([
+        {"role": "system", "content": "be brief"},
+        {"role": "assistant", "content": "hello"},
+        {"role": "user", "content": [{"type": "text", "text": "hi"}]},
+        {"role": "user", "content": "again"},
+    ])
+    assert prompt == "again"
+    assert to_anthropic(history) == [{"role": "user", "content": "hi"}]
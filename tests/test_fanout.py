@@ -0,0 +1,45 @@
+import asyncio
+
+from src.agents.base import Done, TextDelta
+from src.agents.fanout import FanOut
+from src.agents.mock import MockAgent, MockProfile
+
+
+def mock_agent(**profile):
+    profile = {"time_to_first_token": 0, "tokens_per_second": 0, "jitter": 0, "answer_tokens": 3, "seed": 1, **profile}
+    return MockAgent(profile=MockProfile(**profile))
+
+
+def collect(fan_out):
+    async def run():
+        return [item async for item in fan_out.events()]
+    return asyncio.run(asyncio.wait_for(run(), 5))
+
+
+def test_events_from_every_agent():
+    events = collect(FanOut({"a": mock_agent(), "b": mock_agent()}, "hi"))
+    for name in "ab":
+        mine = [event for other, event in events if other == name]
+        assert any(isinstance(event, TextDelta) for event in mine)
+        assert isinstance(mine[-1], Done) and mine[-1].error is None
+
+
+def test_first_wins_cancels_the_slower_streams():
+    fan_out = FanOut({"fast": mock_agent(), "slow": mock_agent(time_to_first_token=5)}, "hi", first_wins=True)
+    events = collect(fan_out)
+    assert fan_out.winner == "fast"
+    assert [event for name, event in events if name == "slow"][-1].cancelled
+    assert fan_out.timings["slow"].cancelled
+
+
+def test_a_failing_agent_does_not_win():
+    failing = mock_agent(error_rate=1)
+    failing.report_errors = False
+    fan_out = FanOut({"failing": failing, "healthy": mock_agent(time_to_first_token=0.05)}, "hi", first_wins=True)
+    events = collect(fan_out)
+    assert fan_out.winner == "healthy"
+    assert [event for name, event in events if name == "failing"][-1].error is not None
+    healthy = [event for name, event in events if name == "healthy"]
+    assert any(isinstance(event, TextDelta) for event in healthy)
+    assert healthy[-1].error is None and not healthy[-1].cancelled
+    assert not fan_out.timings["healthy"].cancelled
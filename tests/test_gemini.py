@@ -0,0 +1,104 @@
+import asyncio
+
+import httpx
+import pytest
+
+genai_types = pytest.importorskip("google.genai.types")
+from benchmarks.mock_server import server_url, start_server
+from src.agents.base import Done, TextDelta, ThinkingDelta, Usage
+from src.agents.gemini import GeminiAgent
+from src.agents.mock import MockProfile
+from src.agents.pool import ClientPool
+
+
+class FakeModels:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def generate_content_stream(self, model, contents, config):
+        async def stream():
+            for chunk in self.chunks:
+                yield genai_types.GenerateContentResponse.model_validate(chunk)
+        return stream()
+
+
+class FakeClient:
+    def __init__(self, chunks):
+        self.aio = type("Aio", (), {"models": FakeModels(chunks)})()
+
+
+def text_chunk(text, thought=False):
+    return {"candidates": [{"content": {"role": "model", "parts": [{"text": text, "thought": thought}]}}]}
+
+
+async def collect(agent, prompt="hi"):
+    return [event async for event in agent.stream_chat(prompt)]
+
+
+def test_thoughts_answer_and_usage_only_chunk():
+    agent = GeminiAgent(api_key="test", pool=ClientPool())
+    agent.client = FakeClient([
+        text_chunk("Let me see", thought=True),
+        text_chunk("Hello"),
+        {"candidates": [{"finishReason": "STOP"}]},
+        {"usageMetadata": {"promptTokenCount": 3, "candidatesTokenCount": 2, "thoughtsTokenCount": 4}},
+    ])
+    events = asyncio.run(collect(agent))
+    assert [event.text for event in events if isinstance(event, ThinkingDelta)] == ["Let me see"]
+    assert [event.text for event in events if isinstance(event, TextDelta)] == ["Hello"]
+    usage = next(event for event in events if isinstance(event, Usage))
+    assert (usage.input_tokens, usage.output_tokens, usage.reasoning_tokens) == (3, 6, 4)
+    assert isinstance(events[-1], Done) and events[-1].error is None
+
+
+def mock_profile(**overrides):
+    return MockProfile(**{"time_to_first_token": 0, "tokens_per_second": 0, "answer_tokens": 4, "seed": 1, **overrides})
+
+
+def test_agents_keep_their_own_key_and_endpoint():
+    async def run():
+        runner = await start_server(mock_profile())
+        pool = ClientPool()
+        try:
+            agent = GeminiAgent(api_key="first", pool=pool, base_url=server_url(runner))
+            # Used to reconfigure the process-wide SDK and redirect the first agent
+            other = GeminiAgent(api_key="second", pool=pool, base_url="http://127.0.0.1:9")
+            assert other.client is not agent.client
+            return await collect(agent)
+        finally:
+            await pool.aclose()
+            await runner.cleanup()
+
+    events = asyncio.run(run())
+    assert isinstance(events[-1], Done) and events[-1].error is None
+    assert any(isinstance(event, TextDelta) for event in events)
+
+
+def test_closing_the_stream_ends_the_http_response():
+    responses = []
+
+    async def run():
+        runner = await start_server(mock_profile(tokens_per_second=20, answer_tokens=200))
+        pool = ClientPool()
+        try:
+            url = server_url(runner)
+            agent = GeminiAgent(api_key="test", pool=pool, base_url=url)
+
+            async def record(response):
+                responses.append(response)
+
+            http_client = pool.httpx_client(url, httpx.AsyncClient)
+            http_client.event_hooks = {
+                **http_client.event_hooks, "response": http_client.event_hooks["response"] + [record]
+            }
+            events = agent.stream_chat("hi")
+            async for event in events:
+                if isinstance(event, TextDelta):
+                    break
+            await events.aclose()
+            return [response.is_closed for response in responses]
+        finally:
+            await pool.aclose()
+            await runner.cleanup()
+
+    assert asyncio.run(asyncio.wait_for(run(), 5)) == [True]
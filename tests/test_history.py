@@ -0,0 +1,80 @@
+import pytest
+
+from src.utils.history import MemoryHistoryStore, SQLiteHistoryStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        yield MemoryHistoryStore()
+        return
+    # A long interval: nothing is committed unless a test flushes
+    store = SQLiteHistoryStore(str(tmp_path / "history.sqlite3"), flush_interval=3600)
+    yield store
+    store.close()
+
+
+def fill(store, count, thinking_every=3):
+    conversation = store.create_conversation("A question about streaming")
+    for index in range(count):
+        message = {"role": "user" if index % 2 == 0 else "assistant", "content": f"message {index}"}
+        if index % thinking_every == 1:
+            message["thinking"] = f"thought {index}"
+            message["metrics"] = {"duration": index}
+        store.append(conversation, message)
+    return conversation
+
+
+def test_messages_and_paging(store):
+    conversation = fill(store, 10)
+    assert store.count(conversation) == 10
+    newest = store.messages(conversation, 4)
+    assert [m["seq"] for m in newest] == [6, 7, 8, 9]
+    earlier = store.messages(conversation, 4, before=newest[0]["seq"])
+    assert [m["content"] for m in earlier] == ["message 2", "message 3", "message 4", "message 5"]
+    assert earlier[2]["has_thinking"] and earlier[2]["metrics"] == {"duration": 4}
+    assert store.thinking(conversation, 4) == "thought 4"
+    assert store.thinking(conversation, 5) == ""
+
+
+def test_conversations_newest_first(store):
+    first = fill(store, 2)
+    second = fill(store, 2)
+    store.append(first, {"role": "user", "content": "again"})
+    assert [c.id for c in store.conversations()] == [first, second]
+    assert store.conversations()[0].messages == 3
+
+
+def test_sqlite_reads_do_not_commit(tmp_path):
+    store = SQLiteHistoryStore(str(tmp_path / "history.sqlite3"), flush_interval=3600)
+    conversation = fill(store, 6)
+    store.messages(conversation, 10)
+    store.thinking(conversation, 1)
+    store.conversations()
+    assert store.stats()["flushes"] == 0
+    store.close()
+
+
+def test_sqlite_reads_merge_committed_and_queued(tmp_path):
+    store = SQLiteHistoryStore(str(tmp_path / "history.sqlite3"), flush_interval=3600)
+    conversation = fill(store, 5)
+    store.flush()
+    store.append(conversation, {"role": "assistant", "content": "queued", "thinking": "queued thought"})
+    assert [m["seq"] for m in store.messages(conversation, 3)] == [3, 4, 5]
+    assert store.thinking(conversation, 5) == "queued thought"
+    assert store.thinking(conversation, 1) == "thought 1"
+    assert store.conversations()[0].messages == 6
+    store.close()
+
+
+def test_sqlite_survives_reopen(tmp_path):
+    path = str(tmp_path / "history.sqlite3")
+    store = SQLiteHistoryStore(path, flush_interval=3600)
+    conversation = fill(store, 4)
+    store.close()
+    reopened = SQLiteHistoryStore(path, flush_interval=3600)
+    assert reopened.count(conversation) == 4
+    reopened.append(conversation, {"role": "user", "content": "after restart"})
+    assert reopened.messages(conversation, 1)[0]["seq"] == 4
+    assert reopened.conversations()[0].title == "A question about streaming"
+    reopened.close()
@@ -0,0 +1,80 @@
+import asyncio
+import importlib
+import warnings
+
+import pytest
+
+pytest.importorskip("aiohttp")
+from benchmarks.mock_server import PROVIDER_KEY, MockProvider, create_app, server_url, start_server
+from src.agents.base import Done, TextDelta
+from src.agents.mock import MockProfile
+from src.agents.pool import ClientPool
+
+# agent, SDK it needs, path on the mock server
+AGENTS = [
+    ("src.agents.openai:OpenAIAgent", "openai", "/v1"),
+    ("src.agents.openrouter:OpenRouterAgent", "openai", "/v1"),
+    ("src.agents.anthropic:AnthropicAgent", "anthropic", ""),
+    ("src.agents.together:TogetherAgent", None, "/v1"),
+    ("src.agents.gemini:GeminiAgent", "google.genai", ""),
+]
+
+
+@pytest.mark.parametrize("agent_path, sdk, path", AGENTS, ids=[entry[0].rpartition(":")[2] for entry in AGENTS])
+def test_agent_streams_from_mock_server(agent_path, sdk, path):
+    if sdk is not None:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", FutureWarning)
+            pytest.importorskip(sdk)
+    module_path, _, class_name = agent_path.partition(":")
+    agent_class = getattr(importlib.import_module(module_path), class_name)
+    profile = MockProfile(time_to_first_token=0.01, tokens_per_second=500, answer_tokens=8, seed=1)
+
+    async def run():
+        runner = await start_server(profile)
+        pool = ClientPool()
+        try:
+            agent = agent_class(api_key="test", pool=pool, base_url=server_url(runner) + path)
+            events = [event async for event in agent.stream_chat("hi", history=[
+                {"role": "user", "content": "earlier"}, {"role": "assistant", "content": "answer"}
+            ])]
+        finally:
+            await pool.aclose()
+            await runner.cleanup()
+        return events
+
+    events = asyncio.run(run())
+    assert isinstance(events[-1], Done) and events[-1].error is None, events[-1]
+    assert "".join(event.text for event in events if isinstance(event, TextDelta))
+
+
+@pytest.mark.parametrize("agent_path", ["src.agents.openai:OpenAIAgent", "src.agents.openrouter:OpenRouterAgent"])
+def test_configured_stream_options_keep_usage(agent_path):
+    pytest.importorskip("openai")
+    from src.agents.base import Usage
+
+    module_path, _, class_name = agent_path.partition(":")
+    agent_class = getattr(importlib.import_module(module_path), class_name)
+
+    async def run():
+        runner = await start_server(MockProfile(time_to_first_token=0, tokens_per_second=0, answer_tokens=5, seed=1))
+        pool = ClientPool()
+        try:
+            agent = agent_class(api_key="test", pool=pool, base_url=server_url(runner) + "/v1")
+            agent.reasoning = True
+            agent.params.update(stream_options={"include_usage": False}, extra_body={"user": "test"})
+            return [event async for event in agent.stream_chat("hi")]
+        finally:
+            await pool.aclose()
+            await runner.cleanup()
+
+    events = asyncio.run(run())
+    assert isinstance(events[-1], Done) and events[-1].error is None, events[-1]
+    assert any(isinstance(event, Usage) for event in events)
+
+
+def test_app_stores_its_provider_under_a_typed_key():
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        app = create_app(MockProfile())
+    assert isinstance(app[PROVIDER_KEY], MockProvider)
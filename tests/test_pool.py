@@ -0,0 +1,52 @@
+import importlib
+import threading
+
+import pytest
+
+from src.agents.pool import ClientPool
+
+
+def test_get_creates_client_once():
+    pool = ClientPool()
+    calls = []
+    factory = lambda: calls.append(1) or object()
+    first = pool.get("openai", "key", "https://api.example.com/v1", factory)
+    assert pool.get("openai", "key", "https://api.example.com/v1", factory) is first
+    assert len(calls) == 1
+    assert pool.stats()["clients"]["openai"] == {"hits": 1, "misses": 1}
+
+
+def test_factory_may_use_the_pool():
+    pool = ClientPool()
+    result = []
+    # A factory asking the pool for its HTTP client used to deadlock
+    thread = threading.Thread(
+        target=lambda: result.append(pool.get("test", "key", "https://a", lambda: pool.stats())),
+        daemon=True
+    )
+    thread.start()
+    thread.join(5)
+    assert result
+
+
+@pytest.mark.parametrize("module_name, agent_path", [
+    ("openai", "src.agents.openai:OpenAIAgent"),
+    ("anthropic", "src.agents.anthropic:AnthropicAgent"),
+])
+def test_builds_sdk_agents(module_name, agent_path):
+    sdk = pytest.importorskip(module_name)
+    module_path, _, class_name = agent_path.partition(":")
+    agent_class = getattr(importlib.import_module(module_path), class_name)
+
+    pool = ClientPool()
+    agents = []
+    thread = threading.Thread(
+        target=lambda: agents.extend(agent_class(api_key="key", pool=pool) for _ in range(2)),
+        daemon=True
+    )
+    thread.start()
+    thread.join(10)
+    assert len(agents) == 2
+    assert agents[0].client is agents[1].client
+    # The SDK's own httpx flavour, shared per origin
+    assert agents[0].client._client is pool.httpx_client(agents[0].base_url, sdk.DefaultAsyncHttpxClient)
@@ -0,0 +1,131 @@
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+
+from src.agents.base import Done, Queued, TextDelta
+from src.agents.catalog import ModelSpec
+from src.agents.mock import MockAgent, MockProfile
+from src.agents.ratelimit import (
+    LocalLimitStore,
+    RateLimitedAgent,
+    RateLimiter,
+    RateLimits,
+    SQLiteLimitStore,
+    TokenBucket,
+)
+
+
+def instant_agent():
+    return MockAgent(profile=MockProfile(time_to_first_token=0, tokens_per_second=0, answer_tokens=3, seed=1))
+
+
+def test_token_bucket_refills_over_time():
+    bucket = TokenBucket(60, now=0.0)
+    bucket.take(60)
+    assert bucket.wait_time(1, now=0.0) == pytest.approx(1.0)
+    assert bucket.wait_time(1, now=1.0) == 0.0
+    # More than the capacity waits for a full bucket, not forever
+    assert bucket.wait_time(600, now=1.0) == pytest.approx(59.0)
+
+
+def test_local_store_caps_concurrency():
+    store = LocalLimitStore(clock=lambda: 0.0)
+    limits = RateLimits(max_concurrent=2)
+    assert store.try_acquire("k", limits, 10)[0] == 0.0
+    assert store.try_acquire("k", limits, 10)[0] == 0.0
+    assert store.try_acquire("k", limits, 10)[0] == float("inf")
+    store.release("k", None)
+    assert store.try_acquire("k", limits, 10)[0] == 0.0
+
+
+def test_sqlite_store_leases(tmp_path):
+    store = SQLiteLimitStore(str(tmp_path / "limits.sqlite3"))
+    limits = RateLimits(requests_per_minute=60, max_concurrent=1)
+    wait, lease = store.try_acquire("k", limits, 1)
+    assert wait == 0.0 and lease is not None
+    assert store.try_acquire("k", limits, 1) == (float("inf"), None)
+    store.release("k", lease)
+    assert store.try_acquire("k", limits, 1)[0] == 0.0
+
+
+def test_sqlite_store_reports_lock_timeouts(tmp_path):
+    path = str(tmp_path / "limits.sqlite3")
+    store = SQLiteLimitStore(path, timeout=0.05)
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    try:
+        with pytest.raises(sqlite3.OperationalError, match="locked"):
+            store.try_acquire("k", RateLimits(requests_per_minute=60), 1)
+    finally:
+        other.execute("ROLLBACK")
+    # The failed BEGIN left no transaction behind
+    assert store.try_acquire("k", RateLimits(requests_per_minute=60), 1)[0] == 0.0
+
+
+def test_sessions_are_served_round_robin():
+    async def run():
+        limiter = RateLimiter("k", RateLimits(max_concurrent=1), LocalLimitStore())
+        a1, a2, b1 = limiter.enqueue("a", 1), limiter.enqueue("a", 1), limiter.enqueue("b", 1)
+        assert [limiter.position(t) for t in (a1, b1, a2)] == [1, 2, 3]
+        limiter.dispatch()
+        assert a1.granted and not b1.granted
+        limiter.release(a1)
+        assert b1.granted and not a2.granted
+
+    asyncio.run(run())
+
+
+def test_rate_limited_agent_queues_and_releases():
+    async def run():
+        limiter = RateLimiter("k", RateLimits(max_concurrent=1), LocalLimitStore())
+        agent = RateLimitedAgent(instant_agent(), limiter)
+
+        async def one(session):
+            return [event async for event in agent.stream_chat("hi", session=session)]
+
+        results = await asyncio.gather(one("a"), one("b"))
+        assert all(isinstance(events[-1], Done) and events[-1].error is None for events in results)
+        assert any(isinstance(event, Queued) for events in results for event in events)
+        assert limiter.store._active["k"] == 0
+        assert limiter.stats()["queued"] == 1
+
+    asyncio.run(run())
+
+
+def test_estimate_reserves_the_model_output_limit():
+    agent = RateLimitedAgent(instant_agent(), RateLimiter("k", RateLimits(), LocalLimitStore()))
+    agent.set_model(ModelSpec("long-answers", context_window=200000, max_output=64000))
+    assert agent.estimate_tokens("", []) == 64000
+    agent.params["max_tokens"] = 100
+    assert agent.estimate_tokens("", []) == 100
+
+
+def test_blocking_store_does_not_stall_the_loop(tmp_path):
+    path = str(tmp_path / "limits.sqlite3")
+    store = SQLiteLimitStore(path)
+    agent = RateLimitedAgent(instant_agent(), RateLimiter("k", RateLimits(requests_per_minute=600), store))
+    other = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    other.execute("BEGIN IMMEDIATE")
+    # Another process holds the database for a moment
+    threading.Timer(0.3, lambda: other.execute("ROLLBACK")).start()
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        events = [event async for event in agent.stream_chat("hi")]
+        task.cancel()
+        return ticks, events
+
+    ticks, events = asyncio.run(run())
+    assert ticks >= 10
+    assert "".join(event.text for event in events if isinstance(event, TextDelta))
+    assert isinstance(events[-1], Done) and events[-1].error is None
@@ -0,0 +1,184 @@
+import asyncio
+
+import pytest
+
+from src.agents.base import BaseAgent, CancellationToken, Done, ProviderError, TextDelta
+from src.agents.metrics import InstrumentedAgent, MetricsRegistry
+from src.agents.resilience import RESUME_PROMPT, ResilientAgent, RetryPolicy, is_retryable, retry_after_seconds
+
+
+class ScriptedAgent(BaseAgent):
+    """Plays one script per call: text pieces, optionally ending in an exception"""
+
+    def __init__(self, *scripts, delay=0.0):
+        self.scripts = list(scripts)
+        self.delay = delay
+        self.calls = []
+        super().__init__("test")
+
+    def _initialize(self):
+        pass
+
+    @property
+    def model_name(self):
+        return "scripted"
+
+    async def stream_chat(self, prompt, history=None, **kwargs):
+        self.calls.append((prompt, history))
+        script = self.scripts.pop(0) if self.scripts else ["ok"]
+        try:
+            await asyncio.sleep(self.delay)
+            for step in script:
+                if isinstance(step, Exception):
+                    raise step
+                yield TextDelta(step)
+            yield Done()
+        except Exception as e:
+            for event in self._error_events(e):
+                yield event
+
+
+def resilient(*agents, **kwargs):
+    delays = []
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    agent = ResilientAgent(agents[0], agents[1:], sleep=sleep, **kwargs)
+    return agent, delays
+
+
+def collect(agent, prompt="hi", **kwargs):
+    async def run():
+        return [event async for event in agent.stream_chat(prompt, **kwargs)]
+    return asyncio.run(run())
+
+
+def answer(events):
+    return "".join(event.text for event in events if isinstance(event, TextDelta))
+
+
+def test_retry_after_parsing():
+    assert retry_after_seconds(ProviderError(429, "slow down", "2.5")) == 2.5
+    assert retry_after_seconds(ProviderError(429, "slow down", "soon")) is None
+    assert retry_after_seconds(ProviderError(500, "oops")) is None
+    assert is_retryable(ProviderError(503, "busy")) and is_retryable(ConnectionError())
+    assert not is_retryable(ProviderError(400, "bad request"))
+
+
+def test_retries_transient_failures_then_succeeds():
+    primary = ScriptedAgent([ProviderError(500, "oops")], [ProviderError(429, "later", "1")], ["fine"])
+    agent, delays = resilient(primary)
+    events = collect(agent)
+    assert answer(events) == "fine"
+    assert isinstance(events[-1], Done) and events[-1].error is None
+    assert agent.retries == 2 and len(delays) == 2 and delays[1] == 1.0
+
+
+def test_fails_over_on_permanent_errors_and_long_retry_after():
+    primary = ScriptedAgent([ProviderError(400, "bad request")])
+    limited = ScriptedAgent([ProviderError(429, "later", "3600")])
+    fallback = ScriptedAgent(["from fallback"])
+    agent, delays = resilient(primary, limited, fallback)
+    assert answer(collect(agent)) == "from fallback"
+    assert agent.failovers == 2 and agent.retries == 0 and delays == []
+
+
+def test_broken_stream_is_continued_not_repeated():
+    primary = ScriptedAgent(["Hello", " wor", ConnectionError("reset")], ["ld"])
+    agent, _ = resilient(primary)
+    events = collect(agent, "greet me")
+    assert answer(events) == "Hello world"
+    assert agent.resumes == 1
+    prompt, history = primary.calls[1]
+    assert prompt == RESUME_PROMPT
+    assert history[-2:] == [{"role": "user", "content": "greet me"}, {"role": "assistant", "content": "Hello wor"}]
+
+
+@pytest.mark.parametrize("report_errors", [True, False])
+def test_reports_the_last_error_once(report_errors):
+    failing = [ProviderError(500, "oops")]
+    agent, _ = resilient(ScriptedAgent(failing, failing), policy=RetryPolicy(max_attempts=2))
+    agent.report_errors = report_errors
+    events = collect(agent)
+    assert isinstance(events[-1], Done) and "oops" in str(events[-1].error)
+    assert bool(answer(events)) is report_errors
+    assert len(events) == (3 if report_errors else 1)
+
+
+def test_hedge_keeps_the_faster_stream():
+    slow = ScriptedAgent(["slow"], delay=5)
+    fast = ScriptedAgent(["fast"])
+    agent, _ = resilient(slow, fast, hedge=True, policy=RetryPolicy(hedge_default_delay=0.01))
+    assert answer(collect(agent)) == "fast"
+    assert agent.hedges == 1
+
+
+def test_first_token_timeout_fails_over():
+    slow = ScriptedAgent(["slow"], delay=5)
+    agent, _ = resilient(slow, ScriptedAgent(["fallback"]), policy=RetryPolicy(max_attempts=1, first_token_timeout=0.01))
+    assert answer(collect(agent)) == "fallback"
+
+
+def instrumented(registry, name, agent):
+    return InstrumentedAgent(agent, registry, provider=name)
+
+
+def test_given_up_attempts_are_not_recorded_as_stops():
+    registry = MetricsRegistry()
+    slow = instrumented(registry, "slow", ScriptedAgent(["slow"], delay=5))
+    agent, _ = resilient(slow, instrumented(registry, "fallback", ScriptedAgent(["fallback"])),
+                         policy=RetryPolicy(max_attempts=1, first_token_timeout=0.01))
+    assert answer(collect(agent)) == "fallback"
+    [timed_out] = registry.recent("slow")
+    assert (timed_out.error, timed_out.cancelled, timed_out.tokens_saved) == ("TimeoutError", False, 0)
+
+
+def test_lost_hedges_are_recorded_as_such():
+    registry = MetricsRegistry()
+    slow = instrumented(registry, "slow", ScriptedAgent(["slow"], delay=5))
+    agent, _ = resilient(slow, instrumented(registry, "fast", ScriptedAgent(["fast"])),
+                         hedge=True, policy=RetryPolicy(hedge_default_delay=0.01))
+    assert answer(collect(agent)) == "fast"
+    [lost] = registry.recent("slow")
+    assert (lost.hedge_lost, lost.cancelled, lost.error) == (True, False, None)
+    assert registry.summary()[1]["hedges_lost"] == 1
+
+
+def test_user_stops_are_still_recorded_as_stops():
+    registry = MetricsRegistry()
+    token = CancellationToken()
+
+    async def run():
+        agent = ResilientAgent(instrumented(registry, "slow", ScriptedAgent(["slow"], delay=5)))
+        events = agent.stream_chat("hi", cancel=token)
+        waiting = asyncio.ensure_future(events.__anext__())
+        await asyncio.sleep(0.01)
+        token.cancel()
+        return await waiting
+
+    assert asyncio.run(run()).cancelled
+    [stopped] = registry.recent("slow")
+    assert (stopped.cancelled, stopped.hedge_lost, stopped.error) == (True, False, None)
+
+
+def test_cancel_stops_a_backoff_wait():
+    token = CancellationToken()
+    agent = ResilientAgent(ScriptedAgent(*[[ProviderError(500, "oops")]] * 3), policy=RetryPolicy(base_delay=60, max_delay=60))
+    agent.retry_delay = lambda error, attempt: 60.0
+
+    async def run():
+        asyncio.get_running_loop().call_later(0.05, token.cancel)
+        return [event async for event in agent.stream_chat("hi", cancel=token)]
+
+    events = asyncio.run(asyncio.wait_for(run(), 5))
+    assert isinstance(events[-1], Done) and events[-1].cancelled
+
+
+def test_request_params_reach_fallbacks_without_changing_the_agent():
+    primary, fallback = ScriptedAgent(), ScriptedAgent()
+    agent, _ = resilient(primary, fallback)
+    copy = agent.with_params({"temperature": 0})
+    assert [chained.params for chained in copy.chain] == [{"temperature": 0}] * 2
+    assert copy.agent is copy.chain[0]
+    assert primary.params == fallback.params == {}
@@ -0,0 +1,68 @@
+import asyncio
+
+from src.agents.base import TextDelta
+from src.agents.catalog import ModelSpec
+from src.agents.mock import MockAgent, MockProfile
+from src.agents.routing import ModelRouter, RoutedAgent
+
+FAST_CHEAP = ModelSpec("fast-cheap", context_window=4096, input_price=0.1, latency_class="fast")
+FAST_PRICEY = ModelSpec("fast-pricey", context_window=200000, input_price=1.0, latency_class="fast")
+STANDARD = ModelSpec("standard", context_window=200000, input_price=0.05, latency_class="standard")
+UNCLASSED = ModelSpec("unclassed", input_price=0.01)
+
+
+def router(**kwargs):
+    return ModelRouter([STANDARD, UNCLASSED, FAST_PRICEY, FAST_CHEAP], **kwargs)
+
+
+def test_candidates_fastest_then_cheapest():
+    assert [spec.id for spec in router().candidates] == ["fast-cheap", "fast-pricey", "standard"]
+
+
+def test_simple_prompts_go_to_the_fastest_model_that_fits():
+    models = router()
+    assert models.choose("What is the capital of France?").id == "fast-cheap"
+    # History that overflows the small window moves on to the next candidate
+    assert models.choose("And of Spain?", history_tokens=4000).id == "fast-pricey"
+    assert models.stats() == {"fast-cheap": 1, "fast-pricey": 1}
+
+
+def test_complex_or_long_prompts_stay_on_the_configured_model():
+    models = router(max_prompt_tokens=20)
+    assert models.choose("Please explain why the sky is blue, step by step") is None
+    assert models.choose("```python\nprint(1)\n```") is None
+    assert models.choose("word " * 100) is None
+    assert models.stats() == {}
+
+
+def test_routed_agent_switches_a_copy():
+    inner = MockAgent(profile=MockProfile(time_to_first_token=0, tokens_per_second=0, answer_tokens=2, seed=1))
+    seen = []
+    original_with_model = inner.with_model
+
+    def with_model(spec):
+        copy = original_with_model(spec)
+        seen.append(copy)
+        return copy
+
+    inner.with_model = with_model
+    agent = RoutedAgent(inner, router())
+
+    async def run(prompt):
+        return [event async for event in agent.stream_chat(prompt)]
+
+    events = asyncio.run(run("hello there"))
+    assert any(isinstance(event, TextDelta) for event in events)
+    assert [copy.model_name for copy in seen] == ["fast-cheap"]
+    assert inner.model_name == "mock-model"
+    asyncio.run(run("Refactor this function for me"))
+    assert len(seen) == 1
+
+
+def test_with_model_copies_params():
+    agent = MockAgent(profile=MockProfile(seed=1))
+    agent.params["temperature"] = 0.7
+    copy = agent.with_model(FAST_CHEAP)
+    copy.params["max_tokens"] = 100
+    assert agent.params == {"temperature": 0.7}
+    assert copy.params == {"temperature": 0.7, "max_tokens": 100}
@@ -0,0 +1,110 @@
+import json
+
+import pytest
+
+pytest.importorskip("starlette")
+from starlette.testclient import TestClient
+
+from src import server
+
+
+@pytest.fixture
+def client(mock_env):
+    server._agents.clear()
+    with TestClient(server.create_app()) as client:
+        yield client
+    server._agents.clear()
+
+
+def chat(client, **body):
+    body.setdefault("model", "Mock")
+    body.setdefault("messages", [{"role": "user", "content": "hi"}])
+    return client.post("/v1/chat/completions", json=body)
+
+
+def sse_events(response):
+    return [
+        line[len("data: "):] for line in response.text.splitlines()
+        if line.startswith("data: ")
+    ]
+
+
+def test_completion(client):
+    response = chat(client)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["choices"][0]["message"]["content"]
+    assert body["usage"]["completion_tokens"] == 5
+
+
+def test_streamed_completion(client):
+    events = sse_events(chat(client, stream=True, stream_options={"include_usage": True}))
+    assert events[-1] == "[DONE]"
+    chunks = [json.loads(event) for event in events[:-1]]
+    assert "".join(c["choices"][0]["delta"].get("content", "") for c in chunks if c["choices"])
+    assert chunks[-1]["usage"]["completion_tokens"] == 5
+
+
+def test_upstream_failure_is_a_502_without_answer_text(client, mock_env):
+    mock_env.setenv("MOCK_ERROR_RATE", "1")
+    response = chat(client)
+    assert response.status_code == 502
+    assert response.json()["error"]["type"] == "upstream_error"
+
+
+def test_streamed_failure_sends_only_the_error(client, mock_env):
+    mock_env.setenv("MOCK_ERROR_RATE", "1")
+    events = sse_events(chat(client, stream=True))
+    chunks = [json.loads(event) for event in events[:-1]]
+    deltas = [c["choices"][0]["delta"] for c in chunks if "choices" in c]
+    assert deltas == [{"role": "assistant", "content": ""}]
+    assert chunks[-1]["error"]["type"] == "upstream_error"
+
+
+def test_unknown_model(client):
+    assert chat(client, model="no-such-model").status_code == 404
+
+
+def test_messages_must_end_with_user(client):
+    assert chat(client, messages=[{"role": "assistant", "content": "hi"}]).status_code == 400
+
+
+@pytest.mark.parametrize("body", [[], ["hi"], {"model": "Mock", "messages": ["hi"]}])
+def test_malformed_body(client, body):
+    response = client.post("/v1/chat/completions", json=body)
+    assert response.status_code == 400
+    assert response.json()["error"]["type"] == "invalid_request_error"
+
+
+def test_find_model_by_provider_model_id_builds_no_agent(client):
+    model, spec = server.find_model("mock-model")
+    assert model.name == "Mock" and spec is None
+    assert server._agents == {}
+    assert chat(client, model="mock-model").status_code == 200
+
+
+def test_sampling_fields_apply_to_the_request_only(client, monkeypatch):
+    seen = []
+
+    async def complete(agent, model, prompt, kwargs):
+        seen.append(dict(agent.params))
+        return server.Response(b"{}", media_type="application/json")
+
+    monkeypatch.setattr(server, "complete", complete)
+    assert chat(client, temperature=0.2, max_completion_tokens=50, stop="\n", top_p=None).status_code == 200
+    assert chat(client).status_code == 200
+    assert seen[0] == {"temperature": 0.2, "max_tokens": 50, "stop": ["\n"]}
+    assert seen[1] == {}
+
+
+@pytest.mark.parametrize("fields", [{"tools": []}, {"n": 2}, {"temperature": "hot"}, {"max_tokens": 0}, {"stop": [1]}])
+def test_unsupported_or_malformed_fields_are_rejected(client, fields):
+    response = chat(client, **fields)
+    assert response.status_code == 400
+    assert response.json()["error"]["type"] == "invalid_request_error"
+
+
+def test_list_models_builds_no_agent(client):
+    ids = [entry["id"] for entry in client.get("/v1/models").json()["data"]]
+    assert ids[:1] == ["Mock"] and "mock-model" in ids
+    assert server._agents == {}
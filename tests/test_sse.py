@@ -0,0 +1,89 @@
+import asyncio
+import json
+
+import pytest
+
+from src.agents.sse import SSEDecoder, _json_loads, iter_sse_json
+
+STREAM = (
+    b': keep-alive\r\n\r\n'
+    b'data: {"text": "h\xc3\xa9"}\r\n\r\n'
+    b'event: message\ndata: {"text":\ndata: "two lines"}\n\n'
+    b'data:{"text": "no space"}\n\n'
+    b'data: [DONE]\n\n'
+)
+
+
+def decode(chunks):
+    decoder = SSEDecoder()
+    events = [bytes(data) for chunk in chunks for data in decoder.feed(chunk)]
+    return events + [bytes(data) for data in decoder.flush()]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, len(STREAM)])
+@pytest.mark.parametrize("view", [False, True])
+def test_decoder_is_independent_of_chunking(size, view):
+    chunks = [STREAM[i:i + size] for i in range(0, len(STREAM), size)]
+    if view:
+        chunks = [memoryview(chunk) for chunk in chunks]
+    assert decode(chunks) == [
+        b'{"text": "h\xc3\xa9"}',
+        b'{"text":\n"two lines"}',
+        b'{"text": "no space"}',
+        b'[DONE]',
+    ]
+
+
+def test_flush_dispatches_an_unterminated_event():
+    assert decode([b'data: {"a": 1}']) == [b'{"a": 1}']
+    assert decode([b'data: {"a": 1}\n']) == [b'{"a": 1}']
+    assert decode([b'data: {"a": 1}\n\n']) == [b'{"a": 1}']
+
+
+async def _chunks(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def collect(*chunks, loads=None):
+    async def run():
+        return [item async for item in iter_sse_json(_chunks(*chunks), loads)]
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("loads", [None, _json_loads])
+def test_iter_sse_json_stops_at_done(loads):
+    assert collect(STREAM, b'data: {"after": true}\n\n', loads=loads) == [
+        {"text": "hé"}, {"text": "two lines"}, {"text": "no space"}
+    ]
+
+
+def test_iter_sse_json_skips_undecodable_events(caplog):
+    assert collect(b'data: {bad\n\ndata: {"ok": 1}\n\n', b'data: {also bad') == [{"ok": 1}]
+    assert len([r for r in caplog.records if "undecodable" in r.getMessage()]) == 2
+
+
+def test_iter_sse_json_honours_done_left_open():
+    assert collect(b'data: {"ok": 1}\n\ndata: [DONE]') == [{"ok": 1}]
+
+
+def test_std_json_loads_accepts_memoryviews():
+    assert _json_loads(memoryview(json.dumps({"a": [1]}).encode())) == {"a": [1]}
+
+
+def test_memoryview_chunks_are_not_copied():
+    buffer = bytearray(b'data: {"a": 1}\n\n')
+    [event] = SSEDecoder().feed(memoryview(buffer))
+    buffer[12] = ord("2")
+    assert bytes(event) == b'{"a": 2}'
+
+
+@pytest.mark.parametrize("text", ['  {"a": 1} ', '{"a": 1}\r', "[1, 2]", "3"])
+def test_std_json_loads_matches_json_loads(text):
+    assert _json_loads(text.encode()) == json.loads(text)
+
+
+@pytest.mark.parametrize("text", ['{"a": 1} x', "{bad", ""])
+def test_std_json_loads_raises_json_errors(text):
+    with pytest.raises(json.JSONDecodeError):
+        _json_loads(text.encode())